@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -11,11 +11,47 @@ DB_HOST = os.getenv("DATABASE_HOST", "localhost")
 DB_PORT = os.getenv("DATABASE_PORT", "5432")
 DB_NAME = os.getenv("DATABASE_NAME")
 
-SQLALCHEMY_DATABASE_URL = (
-    f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-)
+# DATABASE_BACKEND=sqlite -> jeden plik bazy w trybie WAL (instalacje na jednej płytce, bez Postgresa)
+DB_BACKEND = os.getenv("DATABASE_BACKEND", "postgresql").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "drinkmachine.db")
+
+if os.getenv("DATABASE_URL"):
+    SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+elif DB_BACKEND == "sqlite":
+    SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLITE_PATH}"
+else:
+    SQLALCHEMY_DATABASE_URL = (
+        f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+if IS_SQLITE:
+    # Połączenia są używane przez wątki threadpoola FastAPI -> check_same_thread=False.
+    # Pula o rozmiarze zbliżonym do liczby równoległych requestów; w WAL czytelnicy nie
+    # blokują pisarza, a pisarze czekają na siebie do busy_timeout zamiast dostać SQLITE_BUSY.
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_size=int(os.getenv("SQLITE_POOL_SIZE", "8")),
+        max_overflow=int(os.getenv("SQLITE_MAX_OVERFLOW", "8")),
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # NORMAL w WAL: commit bez fsync, trwałość zapewnia checkpoint — bezpieczne przy awarii aplikacji
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+        cursor.execute(f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_KB', '16384'))}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_BYTES', str(64 * 1024 * 1024)))}")
+        cursor.close()
+else:
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 Base = declarative_base()
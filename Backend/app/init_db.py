@@ -0,0 +1,50 @@
+"""
+Tworzy schemat bazy z modeli SQLAlchemy (PostgreSQL i SQLite) i opcjonalnie
+ładuje dane przykładowe.
+
+    python -m app.init_db
+    python -m app.init_db --sample-data [--sql ../db-init/sample_data.sql]
+
+Dla PostgreSQL w Dockerze schemat zakłada też db-init/01_schema.sql;
+dla SQLite to jedyna droga (01_schema.sql używa SERIAL/TIMESTAMPTZ).
+"""
+import argparse
+from pathlib import Path
+
+from .database import engine, Base, IS_SQLITE
+from . import models  # noqa: F401 — rejestruje tabele w Base.metadata
+
+DEFAULT_SAMPLE_SQL = Path(__file__).resolve().parents[2] / "db-init" / "sample_data.sql"
+
+
+def load_sql(path: Path) -> None:
+    script = path.read_text(encoding="utf-8")
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if IS_SQLITE:
+            cursor.executescript(script)
+        else:
+            cursor.execute(script)
+        # zapis z pominięciem hooków ORM: nowy numer zmiany, żeby snapshot katalogu i /sync go zauważyły
+        cursor.execute("UPDATE sync_state SET last_seq = last_seq + 1 WHERE id = 1")
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create DrinkMachine tables")
+    parser.add_argument("--sample-data", action="store_true", help="load db-init/sample_data.sql")
+    parser.add_argument("--sql", type=Path, default=DEFAULT_SAMPLE_SQL, help="path to the sample data script")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    print(f"Schema ready: {engine.url.render_as_string(hide_password=True)}")
+    if args.sample_data:
+        load_sql(args.sql)
+        print(f"Loaded {args.sql}")
+
+
+if __name__ == "__main__":
+    main()
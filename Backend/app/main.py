@@ -1,16 +1,32 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from .routers import users, drinks, ingredients, favorite_drinks, drink_frame, wifi
-from fastapi.staticfiles import StaticFiles
+from .database import engine, Base, SessionLocal
+from .routers import users, drinks, ingredients, favorite_drinks, drink_frame, wifi, stats, sync, photos, machines, machine_state, traces, profile
+from .services import change_tracking, drink_stats, ingredients as ingredient_refs
+from .services.compression import CompressionMiddleware
+from .services.profiler import ProfilingMiddleware
+from .services.tracing import TracingMiddleware, install_sql
+from .services.wifi_jobs import wifi_jobs
 
-app = FastAPI(title="DrinkMachine API")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # każdy worker pilnuje wspólnego terminu rozłączenia WiFi (wifi_schedule)
+    wifi_jobs.start()
+    yield
+    await wifi_jobs.stop()
 
-Base.metadata.create_all(bind=engine)
 
-app.mount("/drinkPhotos", StaticFiles(directory="drinkPhotos"), name="drink_photos")
+app = FastAPI(title="DrinkMachine API", lifespan=lifespan)
+
+
+Base.metadata.create_all(bind=engine)
+ingredient_refs.install(SessionLocal)
+drink_stats.install(SessionLocal)
+change_tracking.install(SessionLocal)
+install_sql(engine)
 
 default_origins = [
     "http://localhost:5173",
@@ -36,6 +52,11 @@ app.add_middleware(
     allow_methods=["*"],         
     allow_headers=["*"],        
 )
+app.add_middleware(CompressionMiddleware)
+# X-Profile: profil obejmuje też serializację i kompresję odpowiedzi
+app.add_middleware(ProfilingMiddleware)
+# najbardziej zewnętrzny: span requestu obejmuje też kompresję i CORS
+app.add_middleware(TracingMiddleware)
 # -----------------------------
 
 # Dodanie routerów
@@ -45,6 +66,14 @@ app.include_router(ingredients.router, prefix="/ingredients", tags=["ingredients
 app.include_router(favorite_drinks.router, prefix="/favorite_drinks", tags=["favorite_drinks"])
 app.include_router(drink_frame.router, prefix="/frame", tags=["UART"])
 app.include_router(wifi.router, prefix="/wifi", tags=["wifi"])
+app.include_router(machines.router, prefix="/machines", tags=["machines"])
+app.include_router(machine_state.router, prefix="/machine", tags=["machines"])
+app.include_router(stats.router, prefix="/stats", tags=["stats"])
+app.include_router(sync.router, prefix="/sync", tags=["sync"])
+app.include_router(traces.router, prefix="/traces", tags=["traces"])
+app.include_router(profile.router, prefix="/profile", tags=["profile"])
+# /drinkPhotos/{name}?w=320 — oryginały i miniatury z cache na dysku
+app.include_router(photos.router, tags=["photos"])
 
 @app.get("/")
 def read_root():
@@ -1,10 +1,12 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, ForeignKey, Text, Enum, DECIMAL, DateTime
+    Column, Integer, BigInteger, String, Boolean, ForeignKey, Text, Enum, DECIMAL, DateTime, Float,
+    UniqueConstraint, Index, CheckConstraint, DDL, event
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
 import enum
+import uuid
 
 
 class RoleEnum(str, enum.Enum):
@@ -24,6 +26,24 @@ class MixerType(str, enum.Enum):
     other = "other"
 
 
+class PourOutcome(str, enum.Enum):
+    done = "done"
+    failed = "failed"
+    busy = "busy"
+
+
+class RollupPeriod(str, enum.Enum):
+    hour = "hour"
+    day = "day"
+
+
+class WifiJobStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    connected = "connected"
+    failed = "failed"
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -41,6 +61,9 @@ class Alcohol(Base):
     abv = Column(DECIMAL(4, 1))
     available = Column(Boolean, default=True)
     volume_ml = Column(Integer)
+    # śledzenie zmian dla /sync (ustawiane w services/change_tracking.py)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class Mixer(Base):
@@ -50,6 +73,43 @@ class Mixer(Base):
     type = Column(Enum(MixerType), default=MixerType.other)
     available = Column(Boolean, default=True)
     volume_ml = Column(Integer)
+    # śledzenie zmian dla /sync (ustawiane w services/change_tracking.py)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Ingredient(Base):
+    """
+    Wspólny rejestr składników: jeden wiersz na alkohol albo mixer. Przepisy
+    i sloty wskazują go kluczem obcym (ingredient_ref_id), więc składnik
+    w użyciu nie zniknie, a nazwa/ABV/typ są dostępne jednym joinem.
+    name/abv/mixer_type utrzymuje hook w services/ingredients.py.
+    """
+    __tablename__ = "ingredients"
+    id = Column(Integer, primary_key=True)
+    ingredient_type = Column(Enum(IngredientType), nullable=False)
+    alcohol_id = Column(Integer, ForeignKey("alcohols.id", ondelete="CASCADE"), unique=True)
+    mixer_id = Column(Integer, ForeignKey("mixers.id", ondelete="CASCADE"), unique=True)
+    name = Column(String, nullable=False)
+    abv = Column(Float)
+    mixer_type = Column(Enum(MixerType))
+
+    alcohol = relationship("Alcohol")
+    mixer = relationship("Mixer")
+
+    __table_args__ = (
+        CheckConstraint(
+            "(ingredient_type = 'alcohol' AND alcohol_id IS NOT NULL AND mixer_id IS NULL)"
+            " OR (ingredient_type = 'mixer' AND mixer_id IS NOT NULL AND alcohol_id IS NULL)",
+            name="ck_ingredients_source",
+        ),
+    )
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """(ingredient_type, id w alcohols/mixers) — klucz używany w API i mapach slotów."""
+        type_value = self.ingredient_type.value if hasattr(self.ingredient_type, "value") else self.ingredient_type
+        return type_value, self.alcohol_id if type_value == "alcohol" else self.mixer_id
 
 
 class Drink(Base):
@@ -60,6 +120,16 @@ class Drink(Base):
     author_id = Column(Integer, ForeignKey("users.id"))
     is_public = Column(Boolean, default=False)
     image_url = Column(Text)
+    # podbijana przy każdej edycji — klucz cache ramek UART
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # denormalizowane statystyki przepisu (services/drink_stats.py) — filtrowanie i sortowanie /drinks/
+    total_ml = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    alcohol_ml = Column(Float, nullable=False, default=0.0, server_default="0", index=True)
+    abv = Column(Float, nullable=False, default=0.0, server_default="0", index=True)
+    standard_drinks = Column(Float, nullable=False, default=0.0, server_default="0")
+    # śledzenie zmian dla /sync (ustawiane w services/change_tracking.py)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
 
     author = relationship("User")
     ingredients = relationship(
@@ -75,11 +145,14 @@ class DrinkIngredient(Base):
     drink_id = Column(Integer, ForeignKey("drinks.id"))
     ingredient_type = Column(Enum(IngredientType), nullable=False)
     ingredient_id = Column(Integer, nullable=False)
+    # ustawiane z (ingredient_type, ingredient_id) w services/ingredients.py
+    ingredient_ref_id = Column(Integer, ForeignKey("ingredients.id"), nullable=False, index=True)
     amount_ml = Column(Integer, nullable=False)
     order_index = Column(Integer)
     note = Column(Text)
 
     drink = relationship("Drink", back_populates="ingredients")
+    ingredient = relationship("Ingredient", lazy="joined", innerjoin=True)
 
 
 
@@ -89,20 +162,183 @@ class FavoriteDrink(Base):
     drink_id = Column(Integer, ForeignKey("drinks.id"), primary_key=True)
 
 
+class Machine(Base):
+    """Jedna maszyna (ESP32) z własnym portem UART i własnym zestawem slotów."""
+    __tablename__ = "machines"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    port = Column(String, unique=True)  # NULL -> UART_PORT z env (maszyna domyślna)
+    baudrate = Column(Integer)  # NULL -> UART_BAUD
+    active = Column(Boolean, default=True)
+    note = Column(Text)
+    # śledzenie zmian dla /sync (ustawiane w services/change_tracking.py)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # usuwane przez ORM (nie tylko ON DELETE CASCADE), żeby /sync dostał tombstones slotów
+    slots = relationship("MachineSlot", cascade="all, delete-orphan")
+    fillers = relationship("MachineFiller", cascade="all, delete-orphan")
+
+
+# maszyna domyślna (id=1) — do niej należą sloty sprzed wprowadzenia rejestru maszyn
+event.listen(
+    Machine.__table__,
+    "after_create",
+    DDL("INSERT INTO machines (name, active) VALUES ('default', TRUE)"),
+)
+
+
 class MachineSlot(Base):
     __tablename__ = "machine_slots"
     id = Column(Integer, primary_key=True)
-    slot_number = Column(Integer, nullable=False, unique=True)
+    machine_id = Column(
+        Integer, ForeignKey("machines.id", ondelete="CASCADE"),
+        nullable=False, default=1, server_default="1", index=True,
+    )
+    slot_number = Column(Integer, nullable=False)
     ingredient_type = Column(Enum(IngredientType), nullable=False)
     ingredient_id = Column(Integer, nullable=False)
+    # NULL tylko dla nieaktywnego, pustego slotu (ingredient_id bez składnika)
+    ingredient_ref_id = Column(Integer, ForeignKey("ingredients.id"), index=True)
     volume_ml = Column(Integer)
     active = Column(Boolean, default=True)
+    note = Column(Text)
+    # śledzenie zmian dla /sync (ustawiane w services/change_tracking.py)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    ingredient = relationship("Ingredient", lazy="joined")
+
+    __table_args__ = (
+        UniqueConstraint("machine_id", "slot_number", name="uq_machine_slots_machine_slot"),
+        CheckConstraint("NOT active OR ingredient_ref_id IS NOT NULL", name="ck_machine_slots_active_ref"),
+    )
 
 
 class MachineFiller(Base):
     __tablename__ = "machine_fillers"
     id = Column(Integer, primary_key=True)
-    slot_number = Column(Integer, nullable=False, unique=True)
+    machine_id = Column(
+        Integer, ForeignKey("machines.id", ondelete="CASCADE"),
+        nullable=False, default=1, server_default="1", index=True,
+    )
+    slot_number = Column(Integer, nullable=False)
     mixer_id = Column(Integer, ForeignKey("mixers.id"))
+    # pusty filler (mixer_id NULL) nie wskazuje składnika
+    ingredient_ref_id = Column(Integer, ForeignKey("ingredients.id"), index=True)
     volume_ml = Column(Integer)
     active = Column(Boolean, default=True)
+    note = Column(Text)
+    # śledzenie zmian dla /sync (ustawiane w services/change_tracking.py)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0", index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    ingredient = relationship("Ingredient", lazy="joined")
+
+    __table_args__ = (
+        UniqueConstraint("machine_id", "slot_number", name="uq_machine_fillers_machine_slot"),
+    )
+
+
+class PourEvent(Base):
+    __tablename__ = "pour_events"
+    id = Column(Integer, primary_key=True)
+    drink_id = Column(Integer, ForeignKey("drinks.id", ondelete="SET NULL"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    machine_id = Column(Integer, ForeignKey("machines.id", ondelete="SET NULL"))
+    frame = Column(Text)  # JSON lista bajtów
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    received_at = Column(DateTime(timezone=True))
+    done_at = Column(DateTime(timezone=True))
+    outcome = Column(Enum(PourOutcome), nullable=False)
+    error = Column(Text)
+
+    __table_args__ = (
+        Index("ix_pour_events_started_at", "started_at"),
+    )
+
+
+class PourRollup(Base):
+    """Liczniki nalań per (godzina|dzień, drink) aktualizowane przy każdym nalaniu."""
+    __tablename__ = "pour_rollups"
+    id = Column(Integer, primary_key=True)
+    period = Column(Enum(RollupPeriod), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    drink_id = Column(Integer, nullable=False)  # bez FK — statystyki przeżywają usunięcie drinka
+    pours = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    busy = Column(Integer, nullable=False, default=0)  # odrzucone, bo maszyna zajęta — nie awarie
+    total_seconds = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "drink_id", name="uq_pour_rollups_bucket"),
+    )
+
+
+class UserDrinkStat(Base):
+    __tablename__ = "user_drink_stats"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    drink_id = Column(Integer, ForeignKey("drinks.id", ondelete="CASCADE"), primary_key=True)
+    pour_count = Column(Integer, nullable=False, default=0)
+    last_poured_at = Column(DateTime(timezone=True), nullable=False)
+
+    drink = relationship("Drink")
+
+    __table_args__ = (
+        Index("ix_user_drink_stats_recent", "user_id", "last_poured_at"),
+    )
+
+
+class SyncState(Base):
+    """Jeden wiersz z globalnym licznikiem zmian (token /sync)."""
+    __tablename__ = "sync_state"
+    id = Column(Integer, primary_key=True)
+    last_seq = Column(BigInteger, nullable=False, default=0)
+    # losowy identyfikator bazy — snapshot katalogu nie pomyli jej z odtworzoną/inną bazą
+    instance_id = Column(String(32))
+
+
+@event.listens_for(SyncState.__table__, "after_create")
+def _insert_sync_state(target, connection, **kw):
+    connection.execute(target.insert().values(id=1, last_seq=0, instance_id=uuid.uuid4().hex))
+
+
+class SyncTombstone(Base):
+    """Ślad po usuniętym wierszu, żeby klienci mogli go usunąć z lokalnego cache."""
+    __tablename__ = "sync_tombstones"
+    id = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    change_seq = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class WifiJob(Base):
+    """Zlecenie połączenia z siecią WiFi wykonywane w tle (hasło nigdy nie trafia do bazy)."""
+    __tablename__ = "wifi_jobs"
+    id = Column(Integer, primary_key=True)
+    ssid = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    status = Column(Enum(WifiJobStatus), nullable=False, default=WifiJobStatus.pending)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        Index("ix_wifi_jobs_status", "status"),
+    )
+
+
+class WifiSchedule(Base):
+    """Jeden wiersz: kiedy rozłączyć WiFi — wspólny dla workerów, przeżywa restart."""
+    __tablename__ = "wifi_schedule"
+    id = Column(Integer, primary_key=True)
+    ssid = Column(String)
+    disconnect_at = Column(DateTime(timezone=True))
+
+
+event.listen(
+    WifiSchedule.__table__,
+    "after_create",
+    DDL("INSERT INTO wifi_schedule (id) VALUES (1)"),
+)
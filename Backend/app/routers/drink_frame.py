@@ -1,94 +1,265 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session, joinedload
 from .. import models
 from ..database import get_db
-from ..services.uart import send_frame
+from ..services.uart import UartError, send_frame
+from ..services.pour_model import pour_model
+from ..services.pour_planner import plan_segments, time_saved
+from ..services.frame_codec import FrameError, encode_frame
+from ..services.machine_lock import MachineBusyError, get_machine_lock
+from ..services.slots import DEFAULT_MACHINE_ID, load_slot_state, load_slot_states, missing_ingredients
+from ..services.machines import machine_load, machine_port, pourable_machines
+from ..services.frame_cache import frame_cache
+from ..services.pour_history import record_pour
+from ..services.rate_limit import concurrency_slot, rate_limit
+from ..services.tracing import span, traced
+from .users import get_optional_user
 
 router = APIRouter()
 
-def build_drink_frame(drink_id: int, db: Session) -> list[int]:
-    drink = (
-        db.query(models.Drink)
-        .options(joinedload(models.Drink.ingredients))
-        .filter(models.Drink.id == drink_id)
-        .first()
-    )
-    if not drink:
-        raise HTTPException(status_code=404, detail="Drink not found")
-
+def _drink_segments(drink: models.Drink, slot_map: dict[tuple[str, int], int]) -> list[tuple[int, int]]:
     slot_list = []
-
     for ing in drink.ingredients:
-        slot_number = None
-
-        if ing.ingredient_type == models.IngredientType.alcohol:
-            slot = (
-                db.query(models.MachineSlot)
-                .filter(
-                    models.MachineSlot.ingredient_type == "alcohol",
-                    models.MachineSlot.ingredient_id == ing.ingredient_id,
-                    models.MachineSlot.active == True
-                )
-                .first()
-            )
-            if slot:
-                slot_number = slot.slot_number
-
-        elif ing.ingredient_type == models.IngredientType.mixer:
-            filler = (
-                db.query(models.MachineFiller)
-                .filter(
-                    models.MachineFiller.mixer_id == ing.ingredient_id,
-                    models.MachineFiller.active == True
-                )
-                .first()
+        type_value = ing.ingredient_type.value if hasattr(ing.ingredient_type, "value") else ing.ingredient_type
+        slot_number = slot_map.get((type_value, ing.ingredient_id))
+        if slot_number is not None:
+            slot_list.append((slot_number, ing.amount_ml or 0, ing.order_index))
+
+    # kolejność wg order_index (warstwy), poza tym najkrótsza trasa karetki
+    return plan_segments(slot_list)
+
+
+def _encode_frame(slot_list: list[tuple[int, int]]) -> list[int]:
+    # objętości ponad pole ramki idą jako kolejne segmenty (FRAME_PROTOCOL: 1 = 0xFF, 2 = CRC)
+    try:
+        return encode_frame(slot_list)
+    except FrameError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+def _cached_frames(
+    db: Session,
+    versions: dict[int, int],
+    slot_map: dict[tuple[str, int], int],
+    machine_version: str,
+) -> dict[int, list[int]]:
+    frames: dict[int, list[int]] = {}
+    misses = []
+    for drink_id, version in versions.items():
+        frame = frame_cache.get((drink_id, version, machine_version))
+        if frame is None:
+            misses.append(drink_id)
+        else:
+            frames[drink_id] = frame
+
+    if misses:
+        with span("frame_cache_miss", drinks=len(misses)):
+            drinks = (
+                db.query(models.Drink)
+                .options(joinedload(models.Drink.ingredients))
+                .filter(models.Drink.id.in_(misses))
+                .all()
             )
-            slot = None
-            if not filler:
-                slot = (
-                    db.query(models.MachineSlot)
-                    .filter(
-                        models.MachineSlot.ingredient_type == "mixer",
-                        models.MachineSlot.ingredient_id == ing.ingredient_id,
-                        models.MachineSlot.active == True
-                    )
-                    .first()
-                )
-
-            if filler:
-                slot_number = filler.slot_number
-            elif slot:
-                slot_number = slot.slot_number
+            for drink in drinks:
+                frame = _encode_frame(_drink_segments(drink, slot_map))
+                frame_cache.put((drink.id, drink.version, machine_version), frame)
+                frames[drink.id] = frame
+
+    return frames
+
+
+def _drink_versions(drink_ids: list[int], db: Session) -> dict[int, int]:
+    return dict(
+        db.query(models.Drink.id, models.Drink.version)
+        .filter(models.Drink.id.in_(drink_ids))
+        .all()
+    )
+
+
+def build_drink_frames(
+    drink_ids: list[int],
+    db: Session,
+    machine_id: int = DEFAULT_MACHINE_ID,
+) -> dict[int, list[int]]:
+    """
+    Ramki dla wielu drinków naraz. Konfiguracja slotów jest czytana raz,
+    a ramki brane z cache (drink_id, drink.version, wersja slotów) —
+    przepisy ładowane są jednym zapytaniem tylko dla brakujących wpisów.
+    Nieistniejące drinki są pomijane w wyniku.
+    """
+    if not drink_ids:
+        return {}
+    with span("build_drink_frames", drinks=len(drink_ids), machine_id=machine_id):
+        versions = _drink_versions(drink_ids, db)
+        slot_map, machine_version = load_slot_state(db, machine_id)
+        return _cached_frames(db, versions, slot_map, machine_version)
 
-        if slot_number is not None:
-            volume_ml = min(ing.amount_ml or 0, 255)
-            slot_list.append((slot_number, volume_ml))
 
-    # sortujemy po slot_number rosnąco
-    slot_list.sort(key=lambda x: x[0])
+def build_drink_frame(drink_id: int, db: Session, machine_id: int = DEFAULT_MACHINE_ID) -> list[int]:
+    frame = build_drink_frames([drink_id], db, machine_id).get(drink_id)
+    if frame is None:
+        raise HTTPException(status_code=404, detail="Drink not found")
+    return frame
+
 
-    # generujemy ramkę z 0xFF jako separatory
-    frame_bytes = bytearray()
-    for slot_number, volume_ml in slot_list:
-        frame_bytes.extend([slot_number, volume_ml, 0xFF])
+@traced("route_drink")
+def route_drink(
+    drink_id: int,
+    db: Session,
+    machine_id: int | None = None,
+) -> tuple[models.Machine, list[int]]:
+    """
+    Wybiera maszynę do nalania: spośród aktywnych maszyn z portem tylko te,
+    które mają w slotach wszystkie składniki drinka, a z nich ta z najkrótszą
+    kolejką (stan blokad portów, wspólny dla workerów). machine_id wymusza
+    konkretną maszynę. Gdy żadna nie ma kompletu — 409 z brakującymi składnikami.
+    """
+    versions = _drink_versions([drink_id], db)
+    if drink_id not in versions:
+        raise HTTPException(status_code=404, detail="Drink not found")
 
-    frame_bytes.append(0xFF)
+    machines = pourable_machines(db)
+    if machine_id is not None:
+        machines = [m for m in machines if m.id == machine_id]
+    if not machines:
+        raise HTTPException(status_code=503, detail="No active machine with a UART port")
+    requirements = [
+        (t.value if hasattr(t, "value") else t, i)
+        for t, i in db.query(models.DrinkIngredient.ingredient_type, models.DrinkIngredient.ingredient_id)
+        .filter(models.DrinkIngredient.drink_id == drink_id)
+        .order_by(models.DrinkIngredient.order_index, models.DrinkIngredient.id)
+    ]
+    states = load_slot_states(db, [m.id for m in machines])
 
-    return list(frame_bytes)
+    candidates = []
+    closest = None
+    for machine in machines:
+        slot_map, machine_version = states[machine.id]
+        missing = missing_ingredients(requirements, slot_map)
+        if missing:
+            if closest is None or len(missing) < len(closest[1]):
+                closest = (machine, missing)
+            continue
+        frame = _cached_frames(db, versions, slot_map, machine_version)[drink_id]
+        candidates.append((machine_load(machine), machine.id, machine, frame))
+    if not candidates:
+        machine, missing = closest
+        raise HTTPException(status_code=409, detail={
+            "message": "No machine has all ingredients of this drink",
+            "machine_id": machine.id,
+            "missing": [{"ingredient_type": t, "ingredient_id": i} for t, i in missing],
+        })
+    _, _, machine, frame = min(candidates, key=lambda c: c[:2])
+    return machine, frame
 
 
 @router.get("/drink_frame/{drink_id}")
-def get_drink_frame(drink_id: int, db: Session = Depends(get_db)):
-    frame = build_drink_frame(drink_id, db)
-    return {"frame": frame}
+def get_drink_frame(
+    drink_id: int,
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
+    db: Session = Depends(get_db)
+):
+    frame = build_drink_frame(drink_id, db, machine_id)
+    eta = pour_model.estimate(frame)
+    return {
+        "frame": frame,
+        "eta_seconds": round(eta, 1),
+        "saved_seconds": round(time_saved(frame), 1),
+        # ile najdłużej może trwać POST .../send (kolejka + nalewanie) — timeout klienta
+        "max_wait_seconds": round(pour_model.max_wait(eta), 1),
+    }
 
 
-@router.post("/drink_frame/{drink_id}/send")
-def send_drink_frame(drink_id: int, db: Session = Depends(get_db)):
-    frame = build_drink_frame(drink_id, db)
-    try:
-        send_frame(bytes(frame))
-    except RuntimeError as exc:
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+@router.get("/drink_frames")
+def get_drink_frames(
+    ids: str = Query(..., description="Comma-separated list of drink IDs"),
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
+    db: Session = Depends(get_db)
+):
+    id_list = list(dict.fromkeys(int(x) for x in ids.split(",") if x.isdigit()))
+    frames = build_drink_frames(id_list, db, machine_id)
+    return {
+        "frames": [
+            {
+                "drink_id": drink_id,
+                "frame": frames[drink_id],
+                "eta_seconds": round(pour_model.estimate(frames[drink_id]), 1),
+                "saved_seconds": round(time_saved(frames[drink_id]), 1),
+            }
+            for drink_id in id_list
+            if drink_id in frames
+        ],
+        "missing": [drink_id for drink_id in id_list if drink_id not in frames],
+    }
+
+
+@router.post("/drink_frame/{drink_id}/send", dependencies=[Depends(rate_limit("pour", "6/60"))])
+def send_drink_frame(
+    drink_id: int,
+    request: Request,
+    machine_id: int | None = Query(None, description="Wymuś maszynę; domyślnie najmniej zajęta, która zrobi drinka"),
+    db: Session = Depends(get_db),
+    current_user: models.User | None = Depends(get_optional_user)
+):
+    machine, frame = route_drink(drink_id, db, machine_id)
+    eta = pour_model.estimate(frame)
+    client_host = request.client.host if request.client else "unknown"
+    user_id = current_user.id if current_user else None
+    started_at = datetime.now(timezone.utc)
+    history = dict(drink_id=drink_id, user_id=user_id, frame=frame, machine_id=machine.id, started_at=started_at)
+    # limit współbieżności per maszyna (blokada portu i tak szereguje nalania):
+    # zajęta maszyna daje 429 od razu, nie blokuje wątków ani innych maszyn
+    with concurrency_slot("pour", 1, retry_after=eta, key=f"machine:{machine.id}"):
+        try:
+            timing = send_frame(
+                bytes(frame),
+                done_timeout=pour_model.deadline(eta),
+                holder=f"drink {drink_id} ({client_host})",
+                port=machine_port(machine),
+                baudrate=machine.baudrate,
+            )
+        except MachineBusyError as exc:
+            record_pour(db, **history, outcome=models.PourOutcome.busy, error=str(exc))
+            raise HTTPException(status_code=409, detail={"message": str(exc), **exc.status}) from exc
+        except RuntimeError as exc:
+            timing = exc.timing if isinstance(exc, UartError) else None
+            record_pour(db, **history, outcome=models.PourOutcome.failed, timing=timing, error=str(exc))
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+    record_pour(db, **history, outcome=models.PourOutcome.done, timing=timing)
+
+    pour_duration = timing.done_after - timing.received_after
+    pour_model.observe(frame, pour_duration)
+    return {
+        "sent": True,
+        "machine_id": machine.id,
+        "machine_name": machine.name,
+        "frame": frame,
+        "length": len(frame),
+        "eta_seconds": round(eta, 1),
+        "saved_seconds": round(time_saved(frame), 1),
+        "duration_seconds": round(pour_duration, 1),
+        "waited_seconds": round(timing.lock_waited, 1),
+    }
+
+
+@router.get("/machine/lock")
+def get_machine_lock_status(
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
+    db: Session = Depends(get_db)
+):
+    """Kto aktualnie trzyma maszynę i kto czeka w kolejce (wszystkie workery)."""
+    machine = db.get(models.Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    port = machine_port(machine)
+    if not port:
+        raise HTTPException(status_code=503, detail="Machine has no UART port (UART_PORT is not set)")
+    return get_machine_lock(port).status()
+
 
-    return {"sent": True, "frame": frame, "length": len(frame)}
+@router.get("/pour_model")
+def get_pour_model():
+    """Aktualne współczynniki kalibracji przepływu per slot."""
+    return pour_model.status()
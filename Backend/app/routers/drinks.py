@@ -1,27 +1,48 @@
 import os
-import shutil
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, Form, Query, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from .. import models, schemas
 from ..database import get_db
 from .users import get_current_user
-from PIL import Image
-from io import BytesIO
+from ..services.search import drink_index
+from ..services.catalog_snapshot import catalog_snapshot
+from ..services.coalesce import coalesced_json
+from ..services.makeable import makeable_index
+from ..services.recommend import drink_recommender
+from ..services.drink_payload import parse_expand, parse_fields, render_drinks
+from ..services.photos import DRINK_PHOTOS_DIR, save_upload
+from ..services.rate_limit import rate_limit
+from ..services.slots import DEFAULT_MACHINE_ID, load_slot_map
+from ..services.streaming import stream_drinks, wants_ndjson
 
 router = APIRouter()
 
-def resize_to_1280x720(image: Image.Image):
-    target_size = (1280, 720)
-    image.thumbnail(target_size, Image.Resampling.LANCZOS)
-    new_image = Image.new("RGB", target_size, (0, 0, 0))
-    paste_x = (target_size[0] - image.width) // 2
-    paste_y = (target_size[1] - image.height) // 2
-    new_image.paste(image, (paste_x, paste_y))
-    return new_image
-
-# Folder do przechowywania zdjęć drinków
-DRINK_PHOTOS_DIR = "drinkPhotos"
+def _shape(db: Session, drinks, expand: Optional[str], fields: Optional[str], single: bool = False):
+    """Bez expand/fields zwraca obiekty ORM (response_model), inaczej gotowy JSON."""
+    expand_set = parse_expand(expand)
+    field_set = parse_fields(fields)
+    if not expand_set and field_set is None:
+        return drinks
+    payload = render_drinks(db, [drinks] if single else drinks, expand_set, field_set)
+    return JSONResponse(payload[0] if single else payload)
+
+
+EXPAND_QUERY = Query(None, description="expand=ingredients: nazwa, ABV, typ mixera i slot każdego składnika")
+FIELDS_QUERY = Query(None, description="Comma-separated list of drink fields to return, e.g. id,name,image_url")
+STREAM_QUERY = Query(False, description="Wysyłaj listę partiami (NDJSON przy Accept: application/x-ndjson)")
+
+
+def _stream(request: Request, build_query, expand: Optional[str], fields: Optional[str]):
+    """Lista czytana kursorem i wysyłana partiami — pamięć nie rośnie z rozmiarem katalogu."""
+    return stream_drinks(
+        build_query,
+        parse_expand(expand),
+        parse_fields(fields),
+        ndjson=wants_ndjson(request.headers.get("accept")),
+    )
+
 os.makedirs(DRINK_PHOTOS_DIR, exist_ok=True)
 
 # --- Tworzenie drinka ---
@@ -41,14 +62,7 @@ async def create_drink(
     # zapis zdjęcia
     image_filename = None
     if image:
-        image_filename = image.filename
-        file_path = os.path.join(DRINK_PHOTOS_DIR, image_filename)
-        original_bytes = await image.read()
-        img = Image.open(BytesIO(original_bytes))
-        if img.mode != "RGB":
-            img = img.convert("RGB")
-        resized = resize_to_1280x720(img)
-        resized.save(file_path, format="JPEG")
+        image_filename = await save_upload(image)
 
     # Tworzenie drinka
     drink = models.Drink(
@@ -74,11 +88,15 @@ async def create_drink(
                     order_index=ing.get("order_index"),
                     note=ing.get("note")
                 ))
+            # hook ingredients rozwiązuje klucze przy flushu — nieznany składnik kończy się tu
+            db.flush()
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Błąd składników: {e}")
 
     db.commit()
     db.refresh(drink)
+    drink_index.upsert(drink)
+    makeable_index.invalidate()
     return drink
 
 # --- Aktualizacja drinka ---
@@ -108,6 +126,7 @@ async def update_drink(
 
     drink.name = name
     drink.description = description
+    drink.version = (drink.version or 0) + 1
 
     # Obsługa składników
     import json
@@ -123,80 +142,218 @@ async def update_drink(
                     order_index=ing.get("order_index"),
                     note=ing.get("note")
                 ))
+            # hook ingredients rozwiązuje klucze przy flushu — nieznany składnik kończy się tu
+            db.flush()
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Błąd składników: {e}")
 
     # Obsługa zdjęcia
     if image:
-        img_bytes = await image.read()
-        img = Image.open(BytesIO(img_bytes))
-        if img.mode != "RGB":
-            img = img.convert("RGB")
-        resized = resize_to_1280x720(img)
-        file_path = os.path.join(DRINK_PHOTOS_DIR, image.filename)
-        resized.save(file_path, format="JPEG")
-        drink.image_url = image.filename
+        drink.image_url = await save_upload(image)
 
     db.commit()
     db.refresh(drink)
+    drink_index.upsert(drink)
+    makeable_index.invalidate()
     return drink
 
 # --- Pozostałe endpointy bez zmian ---
+# sort=-volume -> malejąco po objętości; kolumny mają indeksy
+SORT_COLUMNS = {
+    "name": models.Drink.name,
+    "volume": models.Drink.total_ml,
+    "alcohol": models.Drink.alcohol_ml,
+    "abv": models.Drink.abv,
+    "standard_drinks": models.Drink.standard_drinks,
+}
+
+
+def _parse_sort(sort: str):
+    column = SORT_COLUMNS.get(sort.lstrip("-"))
+    if column is None:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort} (allowed: {', '.join(SORT_COLUMNS)})")
+    return column.desc() if sort.startswith("-") else column.asc()
+
+
 @router.get("/", response_model=List[schemas.DrinkOut])
-def list_public_drinks(db: Session = Depends(get_db)):
-    drinks = (
-        db.query(models.Drink)
-        .options(joinedload(models.Drink.ingredients))
-        .filter(models.Drink.is_public == True)
-        .order_by(models.Drink.name)
-        .all()
-    )
-    return drinks
+def list_public_drinks(
+    request: Request,
+    min_abv: Optional[float] = Query(None, ge=0, le=100),
+    max_abv: Optional[float] = Query(None, ge=0, le=100),
+    min_volume: Optional[int] = Query(None, ge=0, description="ml"),
+    max_volume: Optional[int] = Query(None, ge=0, description="ml"),
+    max_standard_drinks: Optional[float] = Query(None, ge=0),
+    sort: str = Query("name", description="name|volume|alcohol|abv|standard_drinks, prefiks '-' = malejąco"),
+    expand: Optional[str] = EXPAND_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    stream: bool = STREAM_QUERY,
+    db: Session = Depends(get_db)
+):
+    Drink = models.Drink
+    order = _parse_sort(sort)
+    filters = [Drink.is_public == True]
+    if min_abv is not None:
+        filters.append(Drink.abv >= min_abv)
+    if max_abv is not None:
+        filters.append(Drink.abv <= max_abv)
+    if min_volume is not None:
+        filters.append(Drink.total_ml >= min_volume)
+    if max_volume is not None:
+        filters.append(Drink.total_ml <= max_volume)
+    if max_standard_drinks is not None:
+        filters.append(Drink.standard_drinks <= max_standard_drinks)
 
-@router.get("/available", response_model=List[schemas.DrinkOut])
-def list_available_drinks(db: Session = Depends(get_db)):
-    drinks = db.query(models.Drink).options(joinedload(models.Drink.ingredients)).filter(models.Drink.is_public == True).all()
-    available_drinks = []
+    def build_query(session: Session):
+        return session.query(Drink).filter(*filters).order_by(order, Drink.name, Drink.id)
 
-    # Pobranie wszystkich aktywnych slotów
-    active_alcohol_slots = {s.ingredient_id for s in db.query(models.MachineSlot).filter(models.MachineSlot.ingredient_type == "alcohol", models.MachineSlot.active == True).all()}
-    active_mixer_slots = {f.mixer_id for f in db.query(models.MachineFiller).filter(models.MachineFiller.active == True).all()}
+    if stream or wants_ndjson(request.headers.get("accept")):
+        return _stream(request, build_query, expand, fields)
+    expand_set, field_set = parse_expand(expand), parse_fields(fields)
 
-    for drink in drinks:
-        all_available = True
-        for ing in drink.ingredients:
-            type_value = ing.ingredient_type.value if hasattr(ing.ingredient_type, "value") else ing.ingredient_type
+    def compute():
+        drinks = build_query(db).options(joinedload(Drink.ingredients)).all()
+        return render_drinks(db, drinks, expand_set, field_set)
 
-            if type_value == "alcohol" and ing.ingredient_id not in active_alcohol_slots:
-                all_available = False
-                break
-            elif type_value == "mixer" and ing.ingredient_id not in active_mixer_slots:
-                all_available = False
-                break
+    # kiosk i telefony odświeżają listę naraz — jedno zapytanie na wszystkich
+    return coalesced_json("drinks_list", request, compute)
 
-        if all_available:
-            available_drinks.append(drink)
+@router.get("/available", response_model=List[schemas.DrinkOut], dependencies=[Depends(rate_limit("available", "30/60"))])
+def list_available_drinks(
+    request: Request,
+    expand: Optional[str] = EXPAND_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
+    expand_set, field_set = parse_expand(expand), parse_fields(fields)
 
-    return available_drinks
+    def compute():
+        # katalog z pliku mapowanego w pamięć — wspólny dla wszystkich workerów
+        snapshot = catalog_snapshot.get(db)
+        return snapshot.render(snapshot.available_indexes(), expand_set, field_set)
 
+    return coalesced_json("available", request, compute)
 
 
-@router.get("/my", response_model=List[schemas.DrinkOut])
-def list_my_drinks(
+@router.get("/makeable", response_model=schemas.MakeableDrinksOut)
+def list_makeable_drinks(
+    alcohol_ids: Optional[str] = Query(None, description="Comma-separated list of alcohol IDs"),
+    mixer_ids: Optional[str] = Query(None, description="Comma-separated list of mixer IDs"),
+    max_missing: int = Query(2, ge=0, le=2, description="Pokaż też drinki, którym brakuje do N składników"),
+    db: Session = Depends(get_db)
+):
+    available = set()
+    if alcohol_ids:
+        available |= {("alcohol", int(x)) for x in alcohol_ids.split(",") if x.isdigit()}
+    if mixer_ids:
+        available |= {("mixer", int(x)) for x in mixer_ids.split(",") if x.isdigit()}
+
+    makeable_ids, almost = makeable_index.query(db, available, max_missing=max_missing)
+
+    wanted = set(makeable_ids) | {drink_id for drink_id, _ in almost}
+    drinks = (
+        db.query(models.Drink)
+        .options(joinedload(models.Drink.ingredients))
+        .filter(models.Drink.id.in_(wanted))
+        .all()
+    ) if wanted else []
+    by_id = {d.id: d for d in drinks}
+
+    almost.sort(key=lambda item: (len(item[1]), by_id[item[0]].name if item[0] in by_id else ""))
+    return {
+        "makeable": sorted((by_id[i] for i in makeable_ids if i in by_id), key=lambda d: d.name),
+        "almost": [
+            {
+                "drink": by_id[drink_id],
+                "missing": [{"ingredient_type": t, "ingredient_id": i} for t, i in missing],
+            }
+            for drink_id, missing in almost
+            if drink_id in by_id
+        ],
+    }
+
+
+@router.get("/recommended", response_model=List[schemas.DrinkOut])
+def list_recommended_drinks(
+    limit: int = Query(20, ge=1, le=100),
+    makeable: bool = Query(False, description="Tylko drinki możliwe do zrobienia z bieżących slotów maszyny"),
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
+    expand: Optional[str] = EXPAND_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    """
+    Drinki podobne (przepisem i wspólnymi ulubionymi) do ulubionych
+    użytkownika, od najlepiej dopasowanych; bez ulubionych — najpopularniejsze.
+    """
+    allowed = None
+    if makeable:
+        allowed = set(makeable_index.query(db, set(load_slot_map(db, machine_id)), max_missing=0)[0])
+
+    ranked = drink_recommender.recommend(db, current_user.id, limit=limit, allowed=allowed)
+    ids = [drink_id for drink_id, _ in ranked]
+    drinks = (
+        db.query(models.Drink)
+        .options(joinedload(models.Drink.ingredients))
+        .filter(models.Drink.id.in_(ids))
+        .all()
+    ) if ids else []
+    by_id = {d.id: d for d in drinks}
+    return _shape(db, [by_id[i] for i in ids if i in by_id], expand, fields)
+
+
+@router.get("/search", response_model=List[schemas.DrinkOut])
+def search_drinks(
+    q: str = Query(..., min_length=1, description="Fraza: nazwa, opis lub składnik (prefiks/literówki)"),
+    limit: int = Query(20, ge=1, le=100),
+    expand: Optional[str] = EXPAND_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
+    ranked_ids = drink_index.search(db, q, limit=limit)
+    if not ranked_ids:
+        return []
     drinks = (
         db.query(models.Drink)
         .options(joinedload(models.Drink.ingredients))
-        .filter(models.Drink.author_id == current_user.id)
-        .order_by(models.Drink.name)
+        .filter(models.Drink.id.in_(ranked_ids), models.Drink.is_public == True)
         .all()
     )
-    return drinks
+    by_id = {d.id: d for d in drinks}
+    return _shape(db, [by_id[drink_id] for drink_id in ranked_ids if drink_id in by_id], expand, fields)
+
+
+@router.get("/my", response_model=List[schemas.DrinkOut])
+def list_my_drinks(
+    request: Request,
+    expand: Optional[str] = EXPAND_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    stream: bool = STREAM_QUERY,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    author_id = current_user.id
+
+    def build_query(session: Session):
+        return (
+            session.query(models.Drink)
+            .filter(models.Drink.author_id == author_id)
+            .order_by(models.Drink.name, models.Drink.id)
+        )
+
+    if stream or wants_ndjson(request.headers.get("accept")):
+        return _stream(request, build_query, expand, fields)
+    drinks = build_query(db).options(joinedload(models.Drink.ingredients)).all()
+    return _shape(db, drinks, expand, fields)
 
 @router.get("/{drink_id}", response_model=schemas.DrinkOut)
-def get_drink(drink_id: int, db: Session = Depends(get_db)):
+def get_drink(
+    drink_id: int,
+    expand: Optional[str] = EXPAND_QUERY,
+    fields: Optional[str] = FIELDS_QUERY,
+    db: Session = Depends(get_db)
+):
+    # z bazy, nie ze snapshotu: szczegóły drinka muszą widzieć też zapisy z pominięciem sync_state
     drink = (
         db.query(models.Drink)
         .options(joinedload(models.Drink.ingredients))
@@ -205,7 +362,7 @@ def get_drink(drink_id: int, db: Session = Depends(get_db)):
     )
     if not drink:
         raise HTTPException(status_code=404, detail="Drink not found")
-    return drink
+    return _shape(db, drink, expand, fields, single=True)
 
 @router.delete("/{drink_id}")
 def delete_drink(
@@ -224,4 +381,6 @@ def delete_drink(
             os.remove(file_path)
     db.delete(drink)
     db.commit()
+    drink_index.remove(drink_id)
+    makeable_index.invalidate()
     return {"detail": "deleted"}
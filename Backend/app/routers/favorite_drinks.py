@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from .. import models, schemas
 from ..database import get_db
 from .users import get_current_user
+from ..services.recommend import drink_recommender
 
 router = APIRouter()
 
@@ -23,6 +24,7 @@ def add_favorite(drink_id: int, db: Session = Depends(get_db), current_user: mod
     fav = models.FavoriteDrink(user_id=current_user.id, drink_id=drink_id)
     db.add(fav)
     db.commit()
+    drink_recommender.mark_dirty(drink_id)
     return {"detail": "Added to favorites"}
 
 @router.delete("/{drink_id}")
@@ -35,4 +37,5 @@ def remove_favorite(drink_id: int, db: Session = Depends(get_db), current_user:
         raise HTTPException(status_code=404, detail="Drink not in favorites")
     db.delete(fav)
     db.commit()
+    drink_recommender.mark_dirty(drink_id)
     return {"detail": "Removed from favorites"}
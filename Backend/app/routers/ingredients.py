@@ -4,6 +4,9 @@ from typing import List, Optional
 from .. import models, schemas
 from ..database import get_db
 from .users import get_current_user
+from ..services.search import drink_index
+from ..services.slots import DEFAULT_MACHINE_ID
+from ..services.machine_state import machine_state_hub
 
 router = APIRouter()
 
@@ -20,6 +23,7 @@ def create_alcohol(
     db.add(obj)
     db.commit()
     db.refresh(obj)
+    drink_index.invalidate()
     return obj
 
 @router.get("/alcohols", response_model=List[schemas.AlcoholOut])
@@ -46,6 +50,7 @@ def create_mixer(
     db.add(obj)
     db.commit()
     db.refresh(obj)
+    drink_index.invalidate()
     return obj
 
 @router.get("/mixers", response_model=List[schemas.MixerOut])
@@ -63,15 +68,28 @@ def list_mixers(
 #  MACHINE SLOTS 1–6 (ALCOHOL / MIXER)
 # ---------------------------------------------------------
 
+def _get_machine(db: Session, machine_id: int) -> models.Machine:
+    machine = db.get(models.Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    return machine
+
+
 @router.get("/machine_slots", response_model=List[schemas.MachineSlotOut])
-def list_slots(db: Session = Depends(get_db)):
-    return db.query(models.MachineSlot).order_by(models.MachineSlot.slot_number).all()
+def list_slots(machine_id: int = Query(DEFAULT_MACHINE_ID), db: Session = Depends(get_db)):
+    return (
+        db.query(models.MachineSlot)
+        .filter(models.MachineSlot.machine_id == machine_id)
+        .order_by(models.MachineSlot.slot_number)
+        .all()
+    )
 
 
 @router.put("/machine_slots/{slot_number}", response_model=schemas.MachineSlotOut)
 def update_slot(
     slot_number: int,
     payload: schemas.MachineSlotUpdate,
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -81,9 +99,12 @@ def update_slot(
     if not (1 <= slot_number <= 6):
         raise HTTPException(status_code=400, detail="Slots 1–6 only")
 
-    slot = db.query(models.MachineSlot).filter_by(slot_number=slot_number).first()
+    _get_machine(db, machine_id)
+    slot = db.query(models.MachineSlot).filter_by(machine_id=machine_id, slot_number=slot_number).first()
     if not slot:
-        raise HTTPException(status_code=404, detail="Slot not found")
+        # nowa maszyna nie ma jeszcze wierszy slotów — tworzymy przy pierwszym przypisaniu
+        slot = models.MachineSlot(machine_id=machine_id, slot_number=slot_number)
+        db.add(slot)
 
     # validate ingredient type
     if payload.ingredient_type not in ("alcohol", "mixer"):
@@ -107,6 +128,7 @@ def update_slot(
 
     db.commit()
     db.refresh(slot)
+    machine_state_hub.notify()
     return slot
 
 # ---------------------------------------------------------
@@ -114,14 +136,20 @@ def update_slot(
 # ---------------------------------------------------------
 
 @router.get("/machine_fillers", response_model=List[schemas.MachineFillerOut])
-def list_fillers(db: Session = Depends(get_db)):
-    return db.query(models.MachineFiller).order_by(models.MachineFiller.slot_number).all()
+def list_fillers(machine_id: int = Query(DEFAULT_MACHINE_ID), db: Session = Depends(get_db)):
+    return (
+        db.query(models.MachineFiller)
+        .filter(models.MachineFiller.machine_id == machine_id)
+        .order_by(models.MachineFiller.slot_number)
+        .all()
+    )
 
 
 @router.put("/machine_fillers/{slot_number}", response_model=schemas.MachineFillerOut)
 def update_filler(
     slot_number: int,
     payload: schemas.MachineFillerUpdate,
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -131,9 +159,11 @@ def update_filler(
     if not (7 <= slot_number <= 10):
         raise HTTPException(status_code=400, detail="Slots 7–10 only")
 
-    filler = db.query(models.MachineFiller).filter_by(slot_number=slot_number).first()
+    _get_machine(db, machine_id)
+    filler = db.query(models.MachineFiller).filter_by(machine_id=machine_id, slot_number=slot_number).first()
     if not filler:
-        raise HTTPException(status_code=404, detail="Filler slot not found")
+        filler = models.MachineFiller(machine_id=machine_id, slot_number=slot_number)
+        db.add(filler)
 
     mixer = db.query(models.Mixer).filter(models.Mixer.id == payload.mixer_id).first()
     if not mixer:
@@ -145,4 +175,5 @@ def update_filler(
 
     db.commit()
     db.refresh(filler)
+    machine_state_hub.notify()
     return filler
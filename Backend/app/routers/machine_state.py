@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal, get_db
+from ..services.machine_state import machine_state_cache, machine_state_hub
+from ..services.slots import DEFAULT_MACHINE_ID
+
+router = APIRouter()
+
+# komentarz SSE co tyle sekund — proxy i przeglądarki nie zamykają bezczynnego połączenia
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+
+def _snapshot(db: Session, machine_id: int) -> tuple[int, bytes]:
+    entry = machine_state_cache.get(db, machine_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    return entry
+
+
+def _snapshot_in_new_session(machine_id: int) -> tuple[int, bytes]:
+    with SessionLocal() as db:
+        return _snapshot(db, machine_id)
+
+
+@router.get("/state")
+def get_machine_state(
+    request: Request,
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
+    db: Session = Depends(get_db)
+):
+    """
+    Wszystkie 10 slotów maszyny (nazwa składnika, ABV/typ mixera, poziom,
+    aktywność) w jednej odpowiedzi. `version` rośnie przy każdej zmianie;
+    ETag pozwala odpytywać bez przesyłania niezmienionego stanu.
+    """
+    version, body = _snapshot(db, machine_id)
+    etag = f'"{machine_id}-{version}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/state/stream")
+async def stream_machine_state(
+    request: Request,
+    machine_id: int = Query(DEFAULT_MACHINE_ID),
+):
+    """
+    Server-Sent Events: od razu bieżący snapshot (`event: state`), potem nowy
+    po każdej zmianie slotów, alkoholi lub mixerów (również z innych workerów).
+    """
+    # 404 przed otwarciem strumienia
+    await asyncio.to_thread(_snapshot_in_new_session, machine_id)
+
+    async def events():
+        queue = machine_state_hub.subscribe()
+        last_version = None
+        try:
+            while not await request.is_disconnected():
+                version, body = await asyncio.to_thread(_snapshot_in_new_session, machine_id)
+                if version != last_version:
+                    last_version = version
+                    yield f"event: state\nid: {version}\ndata: ".encode() + body + b"\n\n"
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            machine_state_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
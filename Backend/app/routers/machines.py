@@ -0,0 +1,91 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from ..database import get_db
+from ..services.machine_state import machine_state_hub
+from ..services.machines import machine_status
+from ..services.slots import DEFAULT_MACHINE_ID
+from .users import require_admin
+
+router = APIRouter()
+
+
+def _with_status(machine: models.Machine) -> schemas.MachineStatusOut:
+    return schemas.MachineStatusOut(
+        **schemas.MachineOut.model_validate(machine).model_dump(),
+        **machine_status(machine),
+    )
+
+
+def _commit(db: Session) -> None:
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Machine name or port already in use")
+
+
+@router.get("/", response_model=List[schemas.MachineStatusOut])
+def list_machines(db: Session = Depends(get_db)):
+    """Maszyny z bieżącym stanem (idle/busy/offline/disabled) i długością kolejki."""
+    machines = db.query(models.Machine).order_by(models.Machine.id).all()
+    return [_with_status(m) for m in machines]
+
+
+@router.get("/{machine_id}", response_model=schemas.MachineStatusOut)
+def get_machine(machine_id: int, db: Session = Depends(get_db)):
+    machine = db.get(models.Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    return _with_status(machine)
+
+
+@router.post("/", response_model=schemas.MachineStatusOut)
+def create_machine(
+    payload: schemas.MachineBase,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    machine = models.Machine(**payload.model_dump())
+    db.add(machine)
+    _commit(db)
+    db.refresh(machine)
+    return _with_status(machine)
+
+
+@router.put("/{machine_id}", response_model=schemas.MachineStatusOut)
+def update_machine(
+    machine_id: int,
+    payload: schemas.MachineBase,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    machine = db.get(models.Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    for key, value in payload.model_dump().items():
+        setattr(machine, key, value)
+    _commit(db)
+    db.refresh(machine)
+    machine_state_hub.notify()
+    return _with_status(machine)
+
+
+@router.delete("/{machine_id}")
+def delete_machine(
+    machine_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    if machine_id == DEFAULT_MACHINE_ID:
+        raise HTTPException(status_code=400, detail="Default machine cannot be deleted")
+    machine = db.get(models.Machine, machine_id)
+    if not machine:
+        raise HTTPException(status_code=404, detail="Machine not found")
+    db.delete(machine)
+    db.commit()
+    return {"detail": "deleted"}
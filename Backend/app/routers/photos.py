@@ -0,0 +1,39 @@
+import mimetypes
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from ..services.photos import photo_etag, photo_path, snap_width, thumbnail_path
+
+router = APIRouter()
+
+PHOTO_MAX_AGE = int(os.getenv("PHOTO_MAX_AGE", "86400"))
+
+
+@router.api_route("/drinkPhotos/{name}", methods=["GET", "HEAD"])
+def get_drink_photo(
+    name: str,
+    request: Request,
+    w: Optional[int] = Query(None, ge=16, le=1280, description="Szerokość miniatury w px"),
+):
+    source = photo_path(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    headers = {"Cache-Control": f"public, max-age={PHOTO_MAX_AGE}"}
+    path, media_type = source, mimetypes.guess_type(source)[0]
+    width = snap_width(w) if w is not None else None
+    etag = photo_etag(source, width)
+    if etag in request.headers.get("if-none-match", ""):
+        # klient ma aktualną wersję — miniatura nie jest nawet otwierana
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    if width is not None:
+        try:
+            path, media_type = thumbnail_path(source, width), "image/jpeg"
+        except (OSError, ValueError):
+            # format, którego Pillow nie dekoduje (np. AVIF bez wtyczki) -> oryginał
+            etag = photo_etag(source)
+    return FileResponse(path, media_type=media_type, headers={**headers, "ETag": etag})
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from .. import models
+from ..services.profiler import PROFILE_MAX_SECONDS, ProfilerBusy, profile_for, profile_store
+from .users import require_admin
+
+router = APIRouter()
+
+FORMAT_QUERY = Query("json", pattern="^(json|collapsed)$", description="json (tabela funkcji) albo collapsed (flamegraph)")
+
+
+def _collapsed(text: str, name: str) -> PlainTextResponse:
+    return PlainTextResponse(text, headers={"Content-Disposition": f'attachment; filename="{name}.folded"'})
+
+
+@router.get("/")
+def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    format: str = FORMAT_QUERY,
+    limit: int = Query(30, ge=1, le=500),
+    current_user: models.User = Depends(require_admin)
+):
+    """
+    Próbkuje stosy wszystkich wątków tego workera przez `seconds` s
+    i zwraca najgorętsze funkcje albo stosy w formacie collapsed.
+    """
+    try:
+        sampler = profile_for(seconds)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if format == "collapsed":
+        return _collapsed(sampler.collapsed(), "worker")
+    return sampler.report(limit)
+
+
+@router.get("/requests")
+def list_request_profiles(current_user: models.User = Depends(require_admin)):
+    """Profile requestów wysłanych z nagłówkiem X-Profile (bufor tego workera)."""
+    return profile_store.recent()
+
+
+@router.get("/requests/{profile_id}")
+def get_request_profile(
+    profile_id: str,
+    format: str = FORMAT_QUERY,
+    current_user: models.User = Depends(require_admin)
+):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (other worker or evicted)")
+    if format == "collapsed":
+        return _collapsed(profile["collapsed"], profile_id)
+    return {k: v for k, v in profile.items() if k != "collapsed"}
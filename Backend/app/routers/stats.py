@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from .. import models, schemas
+from ..database import get_db
+from ..services.coalesce import COALESCE_ENABLED, coalescer
+from .users import get_current_user, require_admin
+
+router = APIRouter()
+
+# Wszystkie odczyty idą po zagregowanych tabelach (pour_rollups, user_drink_stats),
+# aktualizowanych przy każdym nalaniu — nigdy po surowej historii pour_events.
+
+
+@router.get("/top_drinks", response_model=List[schemas.TopDrinkOut])
+def top_drinks(
+    days: int = Query(7, ge=1, le=366),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    since = today - timedelta(days=days - 1)
+    Rollup = models.PourRollup
+    total = func.sum(Rollup.pours).label("pours")
+    rows = (
+        db.query(Rollup.drink_id, models.Drink.name, total)
+        .outerjoin(models.Drink, models.Drink.id == Rollup.drink_id)
+        .filter(Rollup.period == models.RollupPeriod.day, Rollup.bucket_start >= since)
+        .group_by(Rollup.drink_id, models.Drink.name)
+        .having(func.sum(Rollup.pours) > 0)
+        .order_by(total.desc(), Rollup.drink_id)
+        .limit(limit)
+        .all()
+    )
+    return [{"drink_id": drink_id, "name": name, "pours": pours} for drink_id, name, pours in rows]
+
+
+@router.get("/pours_per_hour", response_model=List[schemas.PoursPerHourOut])
+def pours_per_hour(
+    hours: int = Query(24, ge=1, le=24 * 31),
+    db: Session = Depends(get_db)
+):
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    since = now - timedelta(hours=hours - 1)
+    Rollup = models.PourRollup
+    rows = (
+        db.query(
+            Rollup.bucket_start,
+            func.sum(Rollup.pours),
+            func.sum(Rollup.failures),
+            func.sum(Rollup.busy),
+            func.sum(Rollup.total_seconds),
+        )
+        .filter(Rollup.period == models.RollupPeriod.hour, Rollup.bucket_start >= since)
+        .group_by(Rollup.bucket_start)
+        .order_by(Rollup.bucket_start)
+        .all()
+    )
+    return [
+        {
+            "hour": bucket,
+            "pours": pours,
+            "failures": failures,
+            "busy": busy,
+            "avg_seconds": round(seconds / pours, 1) if pours else None,
+        }
+        for bucket, pours, failures, busy, seconds in rows
+    ]
+
+
+@router.get("/my_recent", response_model=List[schemas.RecentDrinkOut])
+def my_recent_drinks(
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    stats = (
+        db.query(models.UserDrinkStat)
+        .options(joinedload(models.UserDrinkStat.drink).joinedload(models.Drink.ingredients))
+        .filter(models.UserDrinkStat.user_id == current_user.id)
+        .order_by(models.UserDrinkStat.last_poured_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"drink": s.drink, "pour_count": s.pour_count, "last_poured_at": s.last_poured_at}
+        for s in stats
+        if s.drink is not None
+    ]
+
+
+@router.get("/coalescing")
+def coalescing_stats(current_user: models.User = Depends(require_admin)):
+    """
+    Liczniki łączenia równoczesnych requestów (per worker): computed — ile razy
+    liczono, coalesced — ile requestów dołączyło do trwającego liczenia,
+    cached — ile obsłużyło okno mikro-cache.
+    """
+    return {"enabled": COALESCE_ENABLED, "endpoints": coalescer.stats()}
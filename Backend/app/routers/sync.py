@@ -0,0 +1,72 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session, joinedload
+
+from .. import models, schemas
+from ..database import get_db
+from ..services.change_tracking import current_seq
+from .users import get_optional_user
+
+router = APIRouter()
+
+
+def _parse_token(since: Optional[str]) -> Optional[int]:
+    if since is None or not since.isdigit():
+        return None
+    return int(since)
+
+
+@router.get("/", response_model=schemas.SyncOut)
+def sync(
+    since: Optional[str] = Query(None, description="Token z poprzedniej odpowiedzi; brak = pełna synchronizacja"),
+    db: Session = Depends(get_db),
+    current_user: Optional[models.User] = Depends(get_optional_user)
+):
+    """
+    Zwraca wiersze zmienione od tokenu `since` oraz ID usuniętych (tombstones).
+    Drinki, które przestały być widoczne dla klienta (np. zmieniono je na
+    prywatne), trafiają do `deleted.drinks`.
+    """
+    last_seen = _parse_token(since)
+    upper = current_seq(db)
+    # token spoza zakresu (np. po odtworzeniu bazy) -> pełna synchronizacja
+    full = last_seen is None or last_seen > upper
+    lower = 0 if full else last_seen
+
+    def changed(model):
+        query = db.query(model).filter(model.change_seq <= upper)
+        if not full:
+            query = query.filter(model.change_seq > lower)
+        return query
+
+    drinks = changed(models.Drink).options(joinedload(models.Drink.ingredients)).all()
+    visible_drinks = [
+        d for d in drinks
+        if d.is_public or (current_user is not None and d.author_id == current_user.id)
+    ]
+
+    deleted = schemas.SyncDeleted()
+    if not full:
+        deleted.drinks = [d.id for d in drinks if d not in visible_drinks]
+        tombstones = (
+            db.query(models.SyncTombstone)
+            .filter(models.SyncTombstone.change_seq > lower, models.SyncTombstone.change_seq <= upper)
+            .all()
+        )
+        for t in tombstones:
+            ids = getattr(deleted, t.entity, None)
+            if ids is not None and t.entity_id not in ids:
+                ids.append(t.entity_id)
+
+    return schemas.SyncOut(
+        token=str(upper),
+        full=full,
+        drinks=visible_drinks,
+        alcohols=changed(models.Alcohol).all(),
+        mixers=changed(models.Mixer).all(),
+        machine_slots=changed(models.MachineSlot).order_by(models.MachineSlot.slot_number).all(),
+        machine_fillers=changed(models.MachineFiller).order_by(models.MachineFiller.slot_number).all(),
+        machines=changed(models.Machine).order_by(models.Machine.id).all(),
+        deleted=deleted,
+    )
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .. import models
+from ..services.tracing import TRACE_SAMPLE_RATE, trace_store
+from .users import require_admin
+
+router = APIRouter()
+
+
+@router.get("/")
+def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_ms: float = Query(0, ge=0, description="Tylko ślady dłuższe niż tyle ms"),
+    path: str | None = Query(None, description="Fragment ścieżki, np. /send"),
+    current_user: models.User = Depends(require_admin)
+):
+    """Ostatnie ślady z bufora tego workera (bez spanów), od najnowszego."""
+    return {
+        "sample_rate": TRACE_SAMPLE_RATE,
+        "traces": trace_store.recent(limit=limit, min_ms=min_ms, path=path),
+    }
+
+
+@router.get("/{trace_id}")
+def get_trace(trace_id: str, current_user: models.User = Depends(require_admin)):
+    """Pełny ślad: spany requestu, zapytań SQL, budowania ramki i faz UART."""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (other worker or evicted)")
+    return trace
@@ -1,18 +1,21 @@
 import os
 import shutil
-import threading
 import re
 import subprocess
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from .. import models, schemas
+from ..database import get_db
+from ..services.coalesce import coalesced_json
+from ..services.rate_limit import acquire_slot, concurrency_slot, rate_limit, release_slot
+from ..services.wifi_jobs import as_utc, connect_supported, create_job, job_out, parse_nmcli_networks, wifi_jobs
 from .users import get_current_user
 
 router = APIRouter()
-DISCONNECT_AFTER_SECONDS = 60 * 60 * 12
-_disconnect_timer: threading.Timer | None = None
 
 
 def _scan_with_nmcli() -> List[schemas.WifiNetwork]:
@@ -29,28 +32,7 @@ def _scan_with_nmcli() -> List[schemas.WifiNetwork]:
         return []
     if result.returncode != 0:
         return []
-
-    networks: List[schemas.WifiNetwork] = []
-    for line in result.stdout.splitlines():
-        if not line.strip():
-            continue
-        parts = re.split(r"(?<!\\):", line)
-        if len(parts) < 5:
-            continue
-        ssid, signal, security, bssid, freq = parts[:5]
-        ssid = ssid.replace("\\:", ":").replace("\\\\", "\\")
-        signal_value = int(signal) if signal.isdigit() else None
-        freq_value = int(freq) if freq.isdigit() else None
-        networks.append(
-            schemas.WifiNetwork(
-                ssid=ssid,
-                signal=signal_value,
-                security=security or None,
-                bssid=bssid or None,
-                frequency=freq_value,
-            )
-        )
-    return networks
+    return parse_nmcli_networks(result.stdout)
 
 
 def _scan_with_netsh() -> List[schemas.WifiNetwork]:
@@ -125,101 +107,72 @@ def scan_wifi_networks() -> List[schemas.WifiNetwork]:
     return sorted(networks, key=lambda n: n.signal or 0, reverse=True)
 
 
-def _choose_key_mgmt(security: str | None) -> str | None:
-    if not security:
-        return None
-    sec = security.upper()
-    if "SAE" in sec or "WPA3" in sec:
-        return "sae"
-    if "WPA" in sec:
-        return "wpa-psk"
-    return None
-
-
-def _run_nmcli(args: list[str]) -> subprocess.CompletedProcess:
-    return subprocess.run(
-        ["nmcli", *args],
-        capture_output=True,
-        text=True,
-        encoding="utf-8",
-        errors="ignore",
-        check=False,
-    )
-
-
-def _get_wifi_device() -> str | None:
-    result = _run_nmcli(["-t", "-f", "DEVICE,TYPE,STATE", "device"])
-    if result.returncode != 0:
-        return None
-    for line in result.stdout.splitlines():
-        parts = line.split(":")
-        if len(parts) < 3:
-            continue
-        device, dev_type, state = parts[:3]
-        if dev_type == "wifi":
-            return device
-    return None
-
-
-def _disconnect_wifi() -> None:
-    device = _get_wifi_device()
-    if not device:
-        return
-    _run_nmcli(["device", "disconnect", device])
-
-
-def _schedule_disconnect() -> None:
-    global _disconnect_timer
-    if _disconnect_timer:
-        _disconnect_timer.cancel()
-    _disconnect_timer = threading.Timer(DISCONNECT_AFTER_SECONDS, _disconnect_wifi)
-    _disconnect_timer.daemon = True
-    _disconnect_timer.start()
-
-
-@router.get("/networks", response_model=List[schemas.WifiNetwork])
+@router.get(
+    "/networks",
+    response_model=List[schemas.WifiNetwork],
+    dependencies=[Depends(rate_limit("wifi_scan", "6/60"))],
+)
 def list_wifi_networks(
+    request: Request,
     current_user: models.User = Depends(get_current_user),
 ):
-    return scan_wifi_networks()
-
-
-@router.post("/connect", response_model=schemas.WifiConnectResponse)
-def connect_wifi(
+    def compute():
+        # limit "wifi" zajmuje tylko request, który faktycznie skanuje —
+        # pozostali czekają na jego wynik zamiast dostawać 429
+        with concurrency_slot("wifi", 1):
+            return [network.model_dump(mode="json") for network in scan_wifi_networks()]
+
+    # wynik skanu nie zależy od użytkownika; krótkie okno cache, bo skan trwa sekundy
+    return coalesced_json("wifi_scan", request, compute, scope="user", default_ttl=5)
+
+
+@router.post(
+    "/connect",
+    response_model=schemas.WifiJobOut,
+    status_code=202,
+    dependencies=[Depends(rate_limit("wifi_connect", "3/60"))],
+)
+async def connect_wifi(
     payload: schemas.WifiConnectRequest,
     current_user: models.User = Depends(get_current_user),
 ):
-    if os.name != "posix" or not shutil.which("nmcli"):
+    """
+    Zleca połączenie w tle i od razu zwraca zadanie (`pending`); postęp:
+    GET /wifi/jobs/{id}. Miejsce w limicie "wifi" trzyma zadanie do końca.
+    """
+    if not connect_supported():
         raise HTTPException(status_code=501, detail="WiFi connect not supported")
 
-    args = ["dev", "wifi", "connect", payload.ssid]
-    if payload.password:
-        args += ["password", payload.password]
-
-    security = None
-    for network in scan_wifi_networks():
-        if network.ssid == payload.ssid:
-            security = network.security
-            break
-
-    key_mgmt = _choose_key_mgmt(security)
-    if key_mgmt:
-        args += ["wifi-sec.key-mgmt", key_mgmt]
-
-    result = _run_nmcli(args)
-    if result.returncode != 0 and key_mgmt:
-        # Retry without forcing key-mgmt to allow NetworkManager auto-detection.
-        fallback_args = ["dev", "wifi", "connect", payload.ssid]
-        if payload.password:
-            fallback_args += ["password", payload.password]
-        result = _run_nmcli(fallback_args)
-    if result.returncode != 0:
-        detail = result.stderr.strip() or "WiFi connection failed"
-        raise HTTPException(status_code=400, detail=detail)
-
-    _schedule_disconnect()
-    return schemas.WifiConnectResponse(
-        ssid=payload.ssid,
-        status="connected",
-        expires_in_seconds=DISCONNECT_AFTER_SECONDS,
+    slot_token = await run_in_threadpool(acquire_slot, "wifi", 1)
+    try:
+        job = await run_in_threadpool(create_job, payload.ssid, current_user.id)
+    except BaseException:
+        await run_in_threadpool(release_slot, "wifi", slot_token)
+        raise
+    wifi_jobs.submit(job.id, payload.ssid, payload.password, slot_token)
+    return job_out(job)
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.WifiJobOut)
+def get_wifi_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    job = db.get(models.WifiJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_out(job, db.get(models.WifiSchedule, 1))
+
+
+@router.get("/status", response_model=schemas.WifiStatusOut)
+def wifi_status(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Sieć połączona przez /wifi/connect i kiedy zostanie rozłączona (wspólne dla workerów)."""
+    schedule = db.get(models.WifiSchedule, 1)
+    return schemas.WifiStatusOut(
+        ssid=schedule.ssid if schedule else None,
+        disconnect_at=as_utc(schedule.disconnect_at) if schedule else None,
     )
@@ -117,6 +117,10 @@ class DrinkOut(BaseModel):
     is_public: bool
     image_url: Optional[str]
     author_id: Optional[int]
+    total_ml: int = 0
+    alcohol_ml: float = 0.0  # czysty etanol
+    abv: float = 0.0
+    standard_drinks: float = 0.0
 
     ingredients: List[DrinkIngredientOut] = Field(default_factory=list)
 
@@ -124,9 +128,68 @@ class DrinkOut(BaseModel):
         from_attributes = True
 
 
+class IngredientRef(BaseModel):
+    ingredient_type: IngredientType
+    ingredient_id: int
+
+
+class AlmostMakeableDrink(BaseModel):
+    drink: DrinkOut
+    missing: List[IngredientRef]
+
+
+class MakeableDrinksOut(BaseModel):
+    makeable: List[DrinkOut] = Field(default_factory=list)
+    almost: List[AlmostMakeableDrink] = Field(default_factory=list)
+
+
+# --- Pour stats ---
+class TopDrinkOut(BaseModel):
+    drink_id: int
+    name: Optional[str] = None
+    pours: int
+
+
+class PoursPerHourOut(BaseModel):
+    hour: datetime
+    pours: int
+    failures: int
+    busy: int
+    avg_seconds: Optional[float] = None
+
+
+class RecentDrinkOut(BaseModel):
+    drink: DrinkOut
+    pour_count: int
+    last_poured_at: datetime
+
+
 # --- Machine ---
+class MachineBase(BaseModel):
+    name: str
+    port: Optional[str] = None
+    baudrate: Optional[int] = None
+    active: bool = True
+    note: Optional[str] = None
+
+
+class MachineOut(MachineBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class MachineStatusOut(MachineOut):
+    # idle | busy | offline (brak portu) | disabled
+    status: str
+    queue_length: int = 0
+    holder: Optional[str] = None
+
+
 class MachineSlotOut(BaseModel):
     id: Optional[int] = None
+    machine_id: Optional[int] = None
     slot_number: Optional[int] = None
 
     # zawsze wymagane → brak null
@@ -151,6 +214,7 @@ class MachineSlotUpdate(BaseModel):
 
 class MachineFillerOut(BaseModel):
     id: int
+    machine_id: Optional[int] = None
     slot_number: int
     mixer_id: Optional[int]
     volume_ml: Optional[int]
@@ -182,8 +246,39 @@ class WifiConnectRequest(BaseModel):
     password: Optional[str] = None
 
 
-class WifiConnectResponse(BaseModel):
+class WifiJobOut(BaseModel):
+    id: int
     ssid: str
-    status: str
-    expires_in_seconds: int
+    status: str  # pending | running | connected | failed
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    expires_in_seconds: Optional[int] = None  # do automatycznego rozłączenia (tylko connected)
+
+
+class WifiStatusOut(BaseModel):
+    ssid: Optional[str] = None
+    disconnect_at: Optional[datetime] = None
+
+
+
+# --- Sync ---
+class SyncDeleted(BaseModel):
+    drinks: List[int] = Field(default_factory=list)
+    alcohols: List[int] = Field(default_factory=list)
+    mixers: List[int] = Field(default_factory=list)
+    machine_slots: List[int] = Field(default_factory=list)
+    machine_fillers: List[int] = Field(default_factory=list)
+    machines: List[int] = Field(default_factory=list)
+
 
+class SyncOut(BaseModel):
+    token: str
+    full: bool
+    drinks: List[DrinkOut] = Field(default_factory=list)
+    alcohols: List[AlcoholOut] = Field(default_factory=list)
+    mixers: List[MixerOut] = Field(default_factory=list)
+    machine_slots: List[MachineSlotOut] = Field(default_factory=list)
+    machine_fillers: List[MachineFillerOut] = Field(default_factory=list)
+    machines: List[MachineOut] = Field(default_factory=list)
+    deleted: SyncDeleted = Field(default_factory=SyncDeleted)
@@ -0,0 +1,427 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models
+from ..database import SQLALCHEMY_DATABASE_URL
+from .change_tracking import current_state
+from .machines import pourable_machines
+from .slots import DEFAULT_MACHINE_ID, missing_ingredients
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# jeden plik na bazę — wszystkie workery mapują ten sam, różne bazy na hoście się nie mieszają
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH") or os.path.join(
+    tempfile.gettempdir(),
+    f"drinkmaster-catalog-{hashlib.sha256(SQLALCHEMY_DATABASE_URL.encode()).hexdigest()[:12]}.snap",
+)
+
+MAGIC = b"DMCS"
+FORMAT_VERSION = 3
+NONE_U32 = 0xFFFFFFFF
+NONE_I32 = -(2 ** 31)
+INGREDIENT_TYPES = ("alcohol", "mixer")
+
+# nagłówek: magic, wersja formatu, seq, tożsamość bazy, liczności sekcji, rozmiar puli napisów
+HEADER = struct.Struct("<4sIQ16sIIIIIII")
+# id, author_id, total_ml, pierwszy składnik, liczba składników, (offset, długość) nazwy/opisu/zdjęcia,
+# alcohol_ml, abv, standard_drinks, is_public
+DRINK = struct.Struct("<iiiIIIIIIIIdddB")
+# id, ingredient_id, amount_ml, order_index, typ, (offset, długość) notatki
+INGREDIENT = struct.Struct("<iiiiBII")
+# id, (offset, długość) nazwy, abv (NaN = brak)
+ALCOHOL = struct.Struct("<iIId")
+# id, (offset, długość) nazwy, (offset, długość) typu
+MIXER = struct.Struct("<iIIII")
+# machine_id, slot_number, typ, filler (7–10), ingredient_id
+SLOT = struct.Struct("<iBBBi")
+# id maszyny, dla której liczona jest dostępność drinków
+MACHINE = struct.Struct("<i")
+
+
+class _Strings:
+    def __init__(self) -> None:
+        self._parts: list[bytes] = []
+        self._size = 0
+        self._offsets: dict[str, int] = {}
+
+    def add(self, text: str | None) -> tuple[int, int]:
+        if text is None:
+            return NONE_U32, 0
+        data = text.encode("utf-8")
+        offset = self._offsets.get(text)
+        if offset is None:
+            offset = self._size
+            self._offsets[text] = offset
+            self._parts.append(data)
+            self._size += len(data)
+        return offset, len(data)
+
+    def blob(self) -> bytes:
+        return b"".join(self._parts)
+
+
+def _type_value(value) -> str:
+    return value.value if hasattr(value, "value") else value
+
+
+def snapshot_key(db: Session) -> tuple[int, bytes]:
+    """
+    (seq, tożsamość bazy). Tożsamość to skrót URL-a bazy i losowego
+    sync_state.instance_id — snapshot innej albo odtworzonej bazy z tym
+    samym seq nie zostanie użyty.
+    """
+    seq, instance_id = current_state(db)
+    url = db.get_bind().url.render_as_string(hide_password=False)
+    return seq, hashlib.sha256(f"{url}\n{instance_id}".encode("utf-8")).digest()[:16]
+
+
+def build_snapshot(db: Session) -> bytes:
+    """Cały katalog (drinki, składniki, alkohole, mixery, aktywne sloty, maszyny do nalewania) w jednym buforze."""
+    # seq przed danymi: zapis w trakcie budowy da najwyżej niepotrzebną przebudowę, nigdy stary katalog
+    seq, database = snapshot_key(db)
+    drinks = db.query(models.Drink).options(selectinload(models.Drink.ingredients)).order_by(models.Drink.id).all()
+    ingredients = db.query(models.Ingredient).order_by(models.Ingredient.id).all()
+    alcohols = sorted((i for i in ingredients if i.alcohol_id is not None), key=lambda i: i.alcohol_id)
+    mixers = sorted((i for i in ingredients if i.mixer_id is not None), key=lambda i: i.mixer_id)
+    slots = db.query(models.MachineSlot).filter(models.MachineSlot.active == True).all()
+    fillers = db.query(models.MachineFiller).filter(models.MachineFiller.active == True).all()
+    # bez żadnej maszyny z portem (dev, kiosk bez sprzętu) dostępność jak dawniej — ze slotów maszyny domyślnej
+    machine_ids = [m.id for m in pourable_machines(db)] or [DEFAULT_MACHINE_ID]
+
+    strings = _Strings()
+    drink_rows = bytearray()
+    ingredient_rows = bytearray()
+    ingredient_count = 0
+    for drink in drinks:
+        ingredients = sorted(drink.ingredients, key=lambda i: i.id)
+        drink_rows += DRINK.pack(
+            drink.id,
+            drink.author_id if drink.author_id is not None else NONE_I32,
+            drink.total_ml or 0,
+            ingredient_count,
+            len(ingredients),
+            *strings.add(drink.name),
+            *strings.add(drink.description),
+            *strings.add(drink.image_url),
+            float(drink.alcohol_ml or 0.0),
+            float(drink.abv or 0.0),
+            float(drink.standard_drinks or 0.0),
+            bool(drink.is_public),
+        )
+        for ing in ingredients:
+            ingredient_rows += INGREDIENT.pack(
+                ing.id,
+                ing.ingredient_id,
+                ing.amount_ml or 0,
+                ing.order_index if ing.order_index is not None else NONE_I32,
+                INGREDIENT_TYPES.index(_type_value(ing.ingredient_type)),
+                *strings.add(ing.note),
+            )
+        ingredient_count += len(ingredients)
+
+    alcohol_rows = b"".join(
+        ALCOHOL.pack(a.alcohol_id, *strings.add(a.name), a.abv if a.abv is not None else float("nan"))
+        for a in alcohols
+    )
+    mixer_rows = b"".join(
+        MIXER.pack(m.mixer_id, *strings.add(m.name), *strings.add(_type_value(m.mixer_type)))
+        for m in mixers
+    )
+    slot_rows = b"".join(
+        [
+            SLOT.pack(s.machine_id, s.slot_number, INGREDIENT_TYPES.index(_type_value(s.ingredient_type)), False, s.ingredient_id)
+            for s in slots
+        ] + [
+            SLOT.pack(f.machine_id, f.slot_number, INGREDIENT_TYPES.index("mixer"), True, f.mixer_id)
+            for f in fillers if f.mixer_id is not None
+        ]
+    )
+    machine_rows = b"".join(MACHINE.pack(machine_id) for machine_id in machine_ids)
+    blob = strings.blob()
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, seq, database,
+        len(drinks), ingredient_count, len(alcohols), len(mixers),
+        len(slot_rows) // SLOT.size, len(machine_ids), len(blob),
+    )
+    return b"".join([header, drink_rows, ingredient_rows, alcohol_rows, mixer_rows, slot_rows, machine_rows, blob])
+
+
+class CatalogSnapshot:
+    """
+    Read-only view over a memory-mapped catalog file. Records are fixed-size
+    and read in place with struct.unpack_from; drinks are sorted by id, so a
+    lookup is a binary search over the mapping. Only the small alcohol/mixer
+    dictionaries are materialised per process.
+    """
+
+    def __init__(self, buffer, identity: tuple[int, int] | None = None) -> None:
+        self._buf = buffer
+        self.identity = identity
+        magic, version, self.seq, self.database, *counts = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a catalog snapshot (or unsupported format)")
+        n_drinks, n_ingredients, n_alcohols, n_mixers, n_slots, n_machines, _ = counts
+        self.drink_count = n_drinks
+        self._drinks_at = HEADER.size
+        self._ingredients_at = self._drinks_at + n_drinks * DRINK.size
+        self._alcohols_at = self._ingredients_at + n_ingredients * INGREDIENT.size
+        self._mixers_at = self._alcohols_at + n_alcohols * ALCOHOL.size
+        self._slots_at = self._mixers_at + n_mixers * MIXER.size
+        self._machines_at = self._slots_at + n_slots * SLOT.size
+        self._strings_at = self._machines_at + n_machines * MACHINE.size
+        self._counts = (n_alcohols, n_mixers, n_slots, n_machines)
+        self._details: dict[tuple[str, int], dict] | None = None
+        self._slot_maps: dict[int, dict[tuple[str, int], int]] | None = None
+        self._available: list[int] | None = None
+
+    def _str(self, offset: int, length: int) -> str | None:
+        if offset == NONE_U32:
+            return None
+        start = self._strings_at + offset
+        return bytes(self._buf[start:start + length]).decode("utf-8")
+
+    def _drink_id(self, index: int) -> int:
+        return struct.unpack_from("<i", self._buf, self._drinks_at + index * DRINK.size)[0]
+
+    def find(self, drink_id: int) -> int | None:
+        lo, hi = 0, self.drink_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._drink_id(mid) < drink_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.drink_count and self._drink_id(lo) == drink_id else None
+
+    def _raw(self, index: int) -> tuple:
+        return DRINK.unpack_from(self._buf, self._drinks_at + index * DRINK.size)
+
+    def is_public(self, index: int) -> bool:
+        return bool(self._raw(index)[-1])
+
+    def author_id(self, index: int) -> int | None:
+        author = self._raw(index)[1]
+        return None if author == NONE_I32 else author
+
+    def requirements(self, index: int) -> list[tuple[str, int]]:
+        """Składniki drinka jako klucze (typ, id) — bez dekodowania napisów."""
+        start, count = self._raw(index)[3:5]
+        result = []
+        for i in range(start, start + count):
+            _, ingredient_id, _, _, kind, _, _ = INGREDIENT.unpack_from(
+                self._buf, self._ingredients_at + i * INGREDIENT.size
+            )
+            result.append((INGREDIENT_TYPES[kind], ingredient_id))
+        return result
+
+    def drink(self, index: int) -> dict:
+        """Drink w kształcie DrinkOut (JSON)."""
+        (drink_id, author_id, total_ml, start, count, name_off, name_len, desc_off, desc_len,
+         img_off, img_len, alcohol_ml, abv, standard_drinks, is_public) = self._raw(index)
+        ingredients = []
+        for i in range(start, start + count):
+            ing_id, ingredient_id, amount_ml, order_index, kind, note_off, note_len = INGREDIENT.unpack_from(
+                self._buf, self._ingredients_at + i * INGREDIENT.size
+            )
+            ingredients.append({
+                "ingredient_type": INGREDIENT_TYPES[kind],
+                "ingredient_id": ingredient_id,
+                "amount_ml": amount_ml,
+                "order_index": None if order_index == NONE_I32 else order_index,
+                "note": self._str(note_off, note_len),
+                "id": ing_id,
+                "drink_id": drink_id,
+            })
+        return {
+            "id": drink_id,
+            "name": self._str(name_off, name_len),
+            "description": self._str(desc_off, desc_len),
+            "is_public": bool(is_public),
+            "image_url": self._str(img_off, img_len),
+            "author_id": None if author_id == NONE_I32 else author_id,
+            "total_ml": total_ml,
+            "alcohol_ml": alcohol_ml,
+            "abv": abv,
+            "standard_drinks": standard_drinks,
+            "ingredients": ingredients,
+        }
+
+    def public_indexes(self):
+        for index in range(self.drink_count):
+            if self.is_public(index):
+                yield index
+
+    def _slots(self) -> list[tuple]:
+        return [SLOT.unpack_from(self._buf, self._slots_at + i * SLOT.size) for i in range(self._counts[2])]
+
+    def slot_map(self, machine_id: int = DEFAULT_MACHINE_ID) -> dict[tuple[str, int], int]:
+        """Jak load_slot_map: mixer najpierw z fillerów 7–10, przy duplikatach najniższy slot."""
+        if self._slot_maps is None:
+            maps: dict[int, dict[tuple[str, int], int]] = {}
+            for machine, slot_number, kind, _, ingredient_id in sorted(self._slots(), key=lambda r: (not r[3], r[1])):
+                maps.setdefault(machine, {}).setdefault((INGREDIENT_TYPES[kind], ingredient_id), slot_number)
+            self._slot_maps = maps
+        return dict(self._slot_maps.get(machine_id, {}))
+
+    def availability_machine_ids(self) -> list[int]:
+        """Aktywne maszyny z portem w chwili budowy snapshotu, a gdy ich brak — maszyna domyślna."""
+        return [
+            MACHINE.unpack_from(self._buf, self._machines_at + i * MACHINE.size)[0]
+            for i in range(self._counts[3])
+        ]
+
+    def available_indexes(self) -> list[int]:
+        """
+        Publiczne drinki, które co najmniej jedna maszyna do nalewania zrobi
+        w całości — reguła missing_ingredients, jak przy wyborze maszyny w /send.
+        Bez maszyn z portem liczone ze slotów maszyny domyślnej. Raz na snapshot.
+        """
+        if self._available is None:
+            slot_maps = [self.slot_map(machine_id) for machine_id in self.availability_machine_ids()]
+            self._available = [
+                index for index in self.public_indexes()
+                if any(not missing_ingredients(self.requirements(index), slot_map) for slot_map in slot_maps)
+            ]
+        return self._available
+
+    def ingredient_details(self) -> dict[tuple[str, int], dict]:
+        """Jak load_ingredient_details (nazwa, ABV, typ mixera, slot) dla wszystkich składników."""
+        if self._details is None:
+            details = {}
+            n_alcohols, n_mixers, _, _ = self._counts
+            for i in range(n_alcohols):
+                alcohol_id, name_off, name_len, abv = ALCOHOL.unpack_from(self._buf, self._alcohols_at + i * ALCOHOL.size)
+                details[("alcohol", alcohol_id)] = {
+                    "name": self._str(name_off, name_len),
+                    "abv": None if abv != abv else abv,
+                    "mixer_type": None,
+                }
+            for i in range(n_mixers):
+                mixer_id, name_off, name_len, type_off, type_len = MIXER.unpack_from(
+                    self._buf, self._mixers_at + i * MIXER.size
+                )
+                details[("mixer", mixer_id)] = {
+                    "name": self._str(name_off, name_len),
+                    "abv": None,
+                    "mixer_type": self._str(type_off, type_len),
+                }
+            slot_map = self.slot_map(DEFAULT_MACHINE_ID)
+            for key, info in details.items():
+                info["slot_number"] = slot_map.get(key)
+            self._details = details
+        return self._details
+
+    def render(self, indexes, expand: set[str], fields: set[str] | None) -> list[dict]:
+        """Jak drink_payload.render_drinks, ale prosto z mapowanego pliku."""
+        details = self.ingredient_details() if "ingredients" in expand else None
+        empty = {"name": None, "abv": None, "mixer_type": None, "slot_number": None}
+        payload = []
+        for index in indexes:
+            item = self.drink(index)
+            if fields is not None:
+                item = {k: v for k, v in item.items() if k in fields}
+            if details is not None and "ingredients" in item:
+                for ing in item["ingredients"]:
+                    ing.update(details.get((ing["ingredient_type"], ing["ingredient_id"]), empty))
+            payload.append(item)
+        return payload
+
+
+class CatalogSnapshotStore:
+    """
+    Keeps the mapped snapshot in sync with the global change counter.
+    The first worker that sees a newer seq (or a file written for another
+    database) rebuilds the file under an exclusive flock and atomically
+    replaces it; the others wait on the lock and just map the fresh file.
+    Old mappings stay valid until dropped.
+
+    Freshness is only as good as sync_state: writes that bypass the ORM
+    hooks must bump sync_state.last_seq to be picked up.
+    """
+
+    def __init__(self, path: str = CATALOG_SNAPSHOT_PATH) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._snapshot: CatalogSnapshot | None = None
+
+    @contextmanager
+    def _writer_lock(self):
+        with open(f"{self._path}.lock", "a+b") as f:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _map_file(self) -> CatalogSnapshot | None:
+        """Mapuje plik, jeśli na dysku jest inny niż aktualnie zmapowany."""
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        current = self._snapshot
+        if current is not None and current.identity == identity:
+            return current
+        try:
+            with open(self._path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            snapshot = CatalogSnapshot(buffer, identity)
+        except (OSError, ValueError, struct.error):
+            return None
+        self._snapshot = snapshot
+        return snapshot
+
+    def _write(self, db: Session) -> None:
+        data = build_snapshot(db)
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".catalog-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        key = snapshot_key(db)
+
+        def fresh(snapshot: CatalogSnapshot | None) -> bool:
+            return snapshot is not None and (snapshot.seq, snapshot.database) == key
+
+        snapshot = self._snapshot
+        if fresh(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._map_file()
+            if fresh(snapshot):
+                return snapshot
+            with self._writer_lock():
+                # inny worker mógł właśnie przebudować plik
+                snapshot = self._map_file()
+                if not fresh(snapshot):
+                    self._write(db)
+                    snapshot = self._map_file()
+            return snapshot
+
+
+catalog_snapshot = CatalogSnapshotStore()
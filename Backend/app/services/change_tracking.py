@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from .. import models
+
+# model -> nazwa encji w odpowiedzi /sync i w sync_tombstones
+TRACKED = {
+    models.Drink: "drinks",
+    models.Alcohol: "alcohols",
+    models.Mixer: "mixers",
+    models.MachineSlot: "machine_slots",
+    models.MachineFiller: "machine_fillers",
+    models.Machine: "machines",
+}
+
+
+def current_seq(db: Session) -> int:
+    return db.execute(select(models.SyncState.last_seq).where(models.SyncState.id == 1)).scalar() or 0
+
+
+def current_state(db: Session) -> tuple[int, str]:
+    """(licznik zmian, losowy identyfikator bazy) jednym zapytaniem."""
+    State = models.SyncState
+    row = db.execute(select(State.last_seq, State.instance_id).where(State.id == 1)).first()
+    if row is None:
+        return 0, ""
+    return row.last_seq or 0, row.instance_id or ""
+
+
+def _next_seq(session: Session) -> int:
+    """
+    Podbija globalny licznik w tej samej transakcji. Blokada wiersza
+    sync_state trzymana do commita szereguje zapisujące transakcje, więc
+    kolejność numerów odpowiada kolejności commitów.
+    """
+    State = models.SyncState
+    result = session.execute(
+        update(State).where(State.id == 1).values(last_seq=State.last_seq + 1)
+    )
+    if result.rowcount == 0:
+        session.execute(insert(State).values(id=1, last_seq=1, instance_id=uuid.uuid4().hex))
+    return session.execute(select(State.last_seq).where(State.id == 1)).scalar_one()
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    changed = set()
+    for obj in list(session.new) + list(session.dirty):
+        if type(obj) in TRACKED and (obj in session.new or session.is_modified(obj)):
+            changed.add(obj)
+
+    # zmiana składnika = zmiana przepisu drinka
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.DrinkIngredient):
+            drink = obj.drink or (session.get(models.Drink, obj.drink_id) if obj.drink_id else None)
+            if drink is not None and drink not in session.deleted:
+                changed.add(drink)
+
+    deleted = [obj for obj in session.deleted if type(obj) in TRACKED]
+    if not changed and not deleted:
+        return
+
+    seq = _next_seq(session)
+    now = datetime.now(timezone.utc)
+    for obj in changed:
+        obj.change_seq = seq
+        obj.updated_at = now
+    for obj in deleted:
+        session.add(models.SyncTombstone(
+            entity=TRACKED[type(obj)],
+            entity_id=obj.id,
+            change_seq=seq,
+            deleted_at=now,
+        ))
+
+
+def install(session_factory: sessionmaker) -> None:
+    event.listen(session_factory, "before_flush", _before_flush)
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+from fastapi import Request, Response
+
+from .tracing import record_span
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "1") != "0"
+# powyżej tylu wpisów mikro-cache wygasłe są usuwane
+COALESCE_CACHE_ENTRIES = 1000
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class Coalescer:
+    """
+    Single-flight per worker: concurrent identical requests wait for the one
+    already computing and get its result (or its exception). Optionally the
+    result is kept for a short window (ttl) so requests arriving right after
+    are served without recomputing. Counters per endpoint show how much
+    work was saved.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self._cache: dict[str, tuple[float, object]] = {}
+        self._stats: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"computed": 0, "coalesced": 0, "cached": 0, "errors": 0}
+        )
+
+    def run(self, name: str, key: str, compute: Callable[[], object], ttl: float = 0.0) -> tuple[object, str]:
+        """
+        Wynik compute() dla klucza i skąd pochodzi:
+        computed (ten request liczył), coalesced (dołączył do trwającego), cached.
+        """
+        if not COALESCE_ENABLED:
+            return compute(), "computed"
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._stats[name]["cached"] += 1
+                return cached[1], "cached"
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            start = time.perf_counter()
+            flight.done.wait()
+            record_span("coalesce.wait", time.perf_counter() - start, endpoint=name)
+            with self._lock:
+                self._stats[name]["coalesced"] += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, "coalesced"
+
+        try:
+            flight.result = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                stats = self._stats[name]
+                stats["computed"] += 1
+                if flight.error is not None:
+                    stats["errors"] += 1
+                elif ttl > 0:
+                    if len(self._cache) >= COALESCE_CACHE_ENTRIES:
+                        self._prune(time.monotonic())
+                    self._cache[key] = (time.monotonic() + ttl, flight.result)
+            flight.done.set()
+        return flight.result, "computed"
+
+    def _prune(self, now: float) -> None:
+        self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+        if len(self._cache) >= COALESCE_CACHE_ENTRIES:
+            self._cache.clear()
+
+    def invalidate(self, name: str | None = None) -> None:
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache = {k: v for k, v in self._cache.items() if not k.startswith(f"{name}|")}
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            result = {}
+            for name, counts in self._stats.items():
+                served = counts["computed"] + counts["coalesced"] + counts["cached"]
+                deduplicated = counts["coalesced"] + counts["cached"]
+                result[name] = {
+                    **counts,
+                    "deduplicated": deduplicated,
+                    "dedup_ratio": round(deduplicated / served, 3) if served else 0.0,
+                }
+            return result
+
+
+coalescer = Coalescer()
+
+
+def request_key(name: str, request: Request, scope: str = "public") -> str:
+    """Trasa + posortowane parametry + zakres autoryzacji (np. public, user:7)."""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{name}|{scope}|{request.url.path}?{params}"
+
+
+def coalesced_json(
+    name: str,
+    request: Request,
+    compute: Callable[[], object],
+    scope: str = "public",
+    default_ttl: float = 0.0,
+) -> Response:
+    """
+    Odpowiedź JSON liczona raz dla wszystkich równoczesnych identycznych
+    requestów. Współdzielone są gotowe bajty, nie obiekty ORM czy sesja.
+    Okno mikro-cache nadpisuje COALESCE_TTL_<NAME> (sekundy, 0 = wyłączone).
+    """
+    ttl = float(os.getenv(f"COALESCE_TTL_{name.upper()}", str(default_ttl)))
+    body, outcome = coalescer.run(
+        name,
+        request_key(name, request, scope),
+        lambda: json.dumps(compute(), ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        ttl=ttl,
+    )
+    return Response(content=body, media_type="application/json", headers={"X-Coalesced": outcome})
@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli jest opcjonalny — bez niego zostaje gzip
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(8 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Najlepsze kodowanie z Accept-Encoding (br > gzip), z uwzględnieniem q=0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class CompressedBodyCache:
+    """
+    LRU skompresowanych ciał odpowiedzi kluczowane skrótem treści.
+    Powtarzające się odpowiedzi (snapshot katalogu, lista dostępnych drinków)
+    są kompresowane raz, a kolejne requesty płacą tylko za SHA-1.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_BYTES) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+        self._bytes = 0
+        self._max_bytes = max_bytes
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        key = (encoding, hashlib.sha1(body).digest())
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                return cached
+
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+        if len(compressed) <= self._max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = compressed
+                    self._bytes += len(compressed)
+                while self._bytes > self._max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return compressed
+
+
+class CompressionMiddleware:
+    """
+    Kompresja gzip/brotli negocjowana przez Accept-Encoding dla odpowiedzi
+    powyżej progu. Odpowiedzi strumieniowe (więcej niż jeden fragment ciała)
+    i już zakodowane przechodzą bez zmian.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedBodyCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers = [(k.lower(), v) for k, v in start_message.get("headers", [])]
+            content_type = next((v for k, v in response_headers if k == b"content-type"), b"").decode("latin-1")
+            already_encoded = any(k == b"content-encoding" for k, _ in response_headers)
+
+            if (
+                message.get("more_body", False)
+                or already_encoded
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self.cache.compress(body, encoding)
+            new_headers = [(k, v) for k, v in response_headers if k not in (b"content-length", b"vary")]
+            vary = [v for k, v in response_headers if k == b"vary"]
+            new_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+            ]
+            await send({**start_message, "headers": new_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
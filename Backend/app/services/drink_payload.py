@@ -0,0 +1,74 @@
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from .slots import load_slot_map
+
+DRINK_FIELDS = frozenset(schemas.DrinkOut.model_fields)
+EXPANDABLE = frozenset({"ingredients"})
+
+
+def parse_fields(fields: Optional[str]) -> Optional[set[str]]:
+    """`fields=id,name,image_url` -> zbiór pól; None = wszystkie pola."""
+    if not fields:
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - DRINK_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return wanted
+
+
+def parse_expand(expand: Optional[str]) -> set[str]:
+    if not expand:
+        return set()
+    wanted = {e.strip() for e in expand.split(",") if e.strip()}
+    unknown = wanted - EXPANDABLE
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot expand: {', '.join(sorted(unknown))}")
+    return wanted
+
+
+def load_ingredient_details(db: Session, drinks: Iterable[models.Drink]) -> dict[tuple[str, int], dict]:
+    """
+    Nazwy, ABV, typ mixera i aktualny slot dla wszystkich składników podanych
+    drinków. Dane składnika przychodzą razem z wierszem przepisu (JOIN
+    ingredients), więc dochodzi tylko jedno zapytanie o sloty.
+    """
+    details: dict[tuple[str, int], dict] = {}
+    for drink in drinks:
+        for line in drink.ingredients:
+            ing = line.ingredient
+            if ing.key in details:
+                continue
+            details[ing.key] = {
+                "name": ing.name,
+                "abv": ing.abv,
+                "mixer_type": ing.mixer_type.value if hasattr(ing.mixer_type, "value") else ing.mixer_type,
+            }
+
+    slot_map = load_slot_map(db) if details else {}
+    for key, info in details.items():
+        info["slot_number"] = slot_map.get(key)
+    return details
+
+
+def render_drinks(
+    db: Session,
+    drinks: list[models.Drink],
+    expand: set[str],
+    fields: Optional[set[str]],
+) -> list[dict]:
+    details = load_ingredient_details(db, drinks) if "ingredients" in expand else None
+    empty = {"name": None, "abv": None, "mixer_type": None, "slot_number": None}
+
+    payload = []
+    for drink in drinks:
+        item = schemas.DrinkOut.model_validate(drink).model_dump(mode="json", include=fields)
+        if details is not None and "ingredients" in item:
+            for ing in item["ingredients"]:
+                ing.update(details.get((ing["ingredient_type"], ing["ingredient_id"]), empty))
+        payload.append(item)
+    return payload
@@ -0,0 +1,97 @@
+import os
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+
+from .. import models
+
+ETHANOL_DENSITY_G_ML = 0.789
+# porcja standardowa: 10 g czystego etanolu (PL/WHO); w USA 14 g
+STANDARD_DRINK_GRAMS = float(os.getenv("STANDARD_DRINK_GRAMS", "10"))
+
+
+def compute_stats(ingredients, abv_by_alcohol: dict[int, float]) -> dict:
+    """total_ml, alcohol_ml (czysty etanol), abv [%] i porcje standardowe przepisu."""
+    total_ml = 0
+    alcohol_ml = 0.0
+    for ing in ingredients:
+        amount = ing.amount_ml or 0
+        total_ml += amount
+        type_value = ing.ingredient_type.value if hasattr(ing.ingredient_type, "value") else ing.ingredient_type
+        if type_value == "alcohol":
+            alcohol_ml += amount * abv_by_alcohol.get(ing.ingredient_id, 0.0) / 100.0
+    return {
+        "total_ml": total_ml,
+        "alcohol_ml": round(alcohol_ml, 1),
+        "abv": round(alcohol_ml * 100.0 / total_ml, 1) if total_ml else 0.0,
+        "standard_drinks": round(alcohol_ml * ETHANOL_DENSITY_G_ML / STANDARD_DRINK_GRAMS, 2),
+    }
+
+
+def _abv_lookup(session: Session, drinks) -> dict[int, float]:
+    alcohol_ids = {
+        ing.ingredient_id
+        for drink in drinks
+        for ing in drink.ingredients
+        if (ing.ingredient_type.value if hasattr(ing.ingredient_type, "value") else ing.ingredient_type) == "alcohol"
+    }
+    if not alcohol_ids:
+        return {}
+    # obiekty z identity map zachowują niezapisane zmiany ABV z bieżącej transakcji
+    alcohols = session.query(models.Alcohol).filter(models.Alcohol.id.in_(alcohol_ids)).all()
+    return {
+        a.id: float(a.abv)
+        for a in alcohols
+        if a.abv is not None and a not in session.deleted
+    }
+
+
+def apply_stats(session: Session, drinks) -> None:
+    drinks = list(drinks)
+    abv_by_alcohol = _abv_lookup(session, drinks)
+    for drink in drinks:
+        for key, value in compute_stats(drink.ingredients, abv_by_alcohol).items():
+            if getattr(drink, key) != value:
+                setattr(drink, key, value)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    drinks = {obj for obj in session.new if isinstance(obj, models.Drink)}
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.DrinkIngredient):
+            drink = obj.drink or (session.get(models.Drink, obj.drink_id) if obj.drink_id else None)
+            if drink is not None and drink not in session.deleted:
+                drinks.add(drink)
+
+    changed_alcohols = [
+        obj.id for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, models.Alcohol) and obj.id is not None
+        and (obj in session.deleted or inspect(obj).attrs.abv.history.has_changes())
+    ]
+    if changed_alcohols:
+        Ingredient = models.DrinkIngredient
+        affected = (
+            session.query(models.Drink)
+            .options(selectinload(models.Drink.ingredients))
+            .join(Ingredient, Ingredient.drink_id == models.Drink.id)
+            .filter(Ingredient.ingredient_type == "alcohol", Ingredient.ingredient_id.in_(changed_alcohols))
+            .all()
+        )
+        drinks.update(d for d in affected if d not in session.deleted)
+
+    if drinks:
+        apply_stats(session, drinks)
+
+
+def recompute_all(db: Session) -> int:
+    """Przelicza statystyki wszystkich drinków (np. po imporcie danych SQL-em)."""
+    drinks = db.query(models.Drink).options(selectinload(models.Drink.ingredients)).all()
+    apply_stats(db, drinks)
+    db.commit()
+    return len(drinks)
+
+
+def install(session_factory: sessionmaker) -> None:
+    # przed change_tracking: przeliczony drink ma trafić do /sync jak każda inna zmiana
+    event.listen(session_factory, "before_flush", _before_flush)
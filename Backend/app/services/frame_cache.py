@@ -0,0 +1,37 @@
+import os
+import threading
+from collections import OrderedDict
+
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", "256"))
+
+FrameKey = tuple[int, int, str]
+
+
+class FrameCache:
+    """
+    LRU cache ramek UART kluczowany (drink_id, drink.version, wersja slotów).
+    Nieaktualne wpisy nigdy nie są trafiane — zmiana przepisu albo slotów
+    zmienia klucz — więc wystarczy je wypierać z końca listy LRU.
+    """
+
+    def __init__(self, max_size: int = FRAME_CACHE_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[FrameKey, list[int]] = OrderedDict()
+        self._max_size = max_size
+
+    def get(self, key: FrameKey) -> list[int] | None:
+        with self._lock:
+            frame = self._entries.get(key)
+            if frame is not None:
+                self._entries.move_to_end(key)
+            return frame
+
+    def put(self, key: FrameKey, frame: list[int]) -> None:
+        with self._lock:
+            self._entries[key] = frame
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,163 @@
+import os
+from typing import NamedTuple
+
+# 1 = format zgodny z obecnym firmware (`slot, ml, 0xFF, ..., 0xFF`),
+# 2 = nagłówek, 16-bitowe objętości, długość i CRC16 (wymaga firmware z obsługą v2)
+FRAME_PROTOCOL = int(os.getenv("FRAME_PROTOCOL", "1"))
+
+SEPARATOR = 0xFF
+SLOTS = range(1, 11)
+OPTIC_SLOTS = range(1, 7)
+
+# v1: jeden bajt na objętość; ESP/main.cpp przyjmuje najwyżej 10 poleceń (PourCmd cmds[10])
+V1_MAX_ML = 255
+V1_MAX_SEGMENTS = 10
+# dozownik nalewa pełne cykle po 35 ml (ml / 35) — kawałki muszą być wielokrotnością 35,
+# inaczej reszty z każdego kawałka przepadają: 7 cykli = 245 ml
+OPTIC_CHUNK_ML = 245
+
+# v2: A5 5A | 02 | LEN | (slot, ml_hi, ml_lo) * n | CRC_hi CRC_lo
+V2_MAGIC = (0xA5, 0x5A)
+V2_VERSION = 0x02
+V2_MAX_ML = 0xFFFF
+V2_MAX_SEGMENTS = 0xFF // 3
+
+
+class FrameError(ValueError):
+    """Ramki nie da się zakodować (za dużo segmentów) albo jest uszkodzona."""
+
+
+class Ack(NamedTuple):
+    """Potwierdzenie z ESP: kind = received / done / nak; crc tylko w v2."""
+    kind: str
+    crc: int | None = None
+    detail: str = ""
+
+
+def _crc_table() -> list[int]:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(data: bytes | list[int]) -> int:
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) — łatwy do policzenia na ESP32."""
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def split_volume(slot: int, ml: int, max_ml: int) -> list[int]:
+    """Dzieli objętość na kawałki mieszczące się w polu ramki."""
+    chunk = min(max_ml, OPTIC_CHUNK_ML) if slot in OPTIC_SLOTS else max_ml
+    if ml <= max_ml:
+        return [ml]
+    parts = [chunk] * (ml // chunk)
+    if ml % chunk:
+        parts.append(ml % chunk)
+    return parts
+
+
+def _split(segments: list[tuple[int, int]], max_ml: int) -> list[tuple[int, int]]:
+    split = []
+    for slot, ml in segments:
+        if slot not in SLOTS:
+            raise FrameError(f"Invalid slot {slot}")
+        # kawałki jednego składnika zostają obok siebie — karetka nie jeździ między nimi
+        split.extend((slot, part) for part in split_volume(slot, max(int(ml), 0), max_ml))
+    return split
+
+
+def encode_frame(segments: list[tuple[int, int]], version: int = FRAME_PROTOCOL) -> list[int]:
+    """[(slot, ml)] -> bajty ramki; objętości ponad limit pola dzielone na kolejne segmenty."""
+    if version == 1:
+        split = _split(segments, V1_MAX_ML)
+        if len(split) > V1_MAX_SEGMENTS:
+            raise FrameError(
+                f"Frame needs {len(split)} segments, firmware accepts {V1_MAX_SEGMENTS}"
+            )
+        frame = []
+        for slot, ml in split:
+            frame.extend((slot, ml, SEPARATOR))
+        frame.append(SEPARATOR)
+        return frame
+
+    if version == 2:
+        split = _split(segments, V2_MAX_ML)
+        if len(split) > V2_MAX_SEGMENTS:
+            raise FrameError(f"Frame needs {len(split)} segments, protocol v2 allows {V2_MAX_SEGMENTS}")
+        payload = []
+        for slot, ml in split:
+            payload.extend((slot, ml >> 8, ml & 0xFF))
+        body = [V2_VERSION, len(payload), *payload]
+        crc = crc16(body)
+        return [*V2_MAGIC, *body, crc >> 8, crc & 0xFF]
+
+    raise FrameError(f"Unknown frame protocol {version}")
+
+
+def frame_version(frame: bytes | list[int]) -> int:
+    return 2 if tuple(frame[:2]) == V2_MAGIC else 1
+
+
+def frame_crc(frame: bytes | list[int]) -> int | None:
+    """CRC ramki v2 (do dopasowania potwierdzeń); None dla v1."""
+    if frame_version(frame) != 2 or len(frame) < 4:
+        return None
+    return (frame[-2] << 8) | frame[-1]
+
+
+def decode_frame(frame: bytes | list[int]) -> list[tuple[int, int]]:
+    """
+    Ramka v1 albo v2 -> [(slot, ml), ...] w kolejności nalewania.
+    v1 czytana jak przez firmware (do pierwszego błędnego separatora),
+    v2 sprawdzana pod kątem długości i CRC (FrameError).
+    """
+    data = list(frame)
+    if frame_version(data) == 2:
+        if len(data) < 6 or data[2] != V2_VERSION:
+            raise FrameError("Truncated or unsupported v2 frame")
+        length = data[3]
+        if length % 3 or len(data) != 4 + length + 2:
+            raise FrameError(f"Length mismatch: header says {length}, got {len(data) - 6}")
+        if crc16(data[2:4 + length]) != frame_crc(data):
+            raise FrameError("CRC mismatch")
+        payload = data[4:4 + length]
+        return [(payload[i], (payload[i + 1] << 8) | payload[i + 2]) for i in range(0, length, 3)]
+
+    segments = []
+    i = 0
+    while i + 2 < len(data) and data[i + 2] == SEPARATOR:
+        segments.append((data[i], data[i + 1]))
+        i += 3
+    return segments
+
+
+def parse_ack(line: str) -> Ack | None:
+    """
+    Linia z UART -> Ack albo None (logi diagnostyczne firmware'u).
+    v1: `received`, `Done`; v2: `ACK <crc>`, `DONE <crc>`, `NAK <crc> <powód>`
+    (crc szesnastkowo, jak policzył go ESP).
+    """
+    words = line.strip().split(maxsplit=2)
+    if not words:
+        return None
+    keyword = words[0].lower()
+    if len(words) == 1 and keyword in ("received", "done"):
+        return Ack(keyword)
+    if keyword not in ("ack", "done", "nak") or len(words) < 2:
+        return None
+    try:
+        crc = int(words[1], 16)
+    except ValueError:
+        return None
+    kind = {"ack": "received", "done": "done", "nak": "nak"}[keyword]
+    return Ack(kind, crc, words[2] if len(words) > 2 else "")
@@ -0,0 +1,113 @@
+from sqlalchemy import event, inspect, or_
+from sqlalchemy.orm import Session, sessionmaker
+
+from .. import models
+
+
+class UnknownIngredientError(ValueError):
+    """Przepis albo slot wskazuje alkohol/mixer, którego nie ma w bazie."""
+
+
+def _type_value(value) -> str:
+    return value.value if hasattr(value, "value") else value
+
+
+def _source(obj: models.Alcohol | models.Mixer) -> dict:
+    if isinstance(obj, models.Alcohol):
+        return {"name": obj.name, "abv": float(obj.abv) if obj.abv is not None else None, "mixer_type": None}
+    return {"name": obj.name, "abv": None, "mixer_type": obj.type}
+
+
+def _reference(obj) -> tuple[str, int] | None:
+    """(typ, id) wskazywane przez wiersz przepisu/slotu; None = pusty filler."""
+    if isinstance(obj, models.MachineFiller):
+        return ("mixer", obj.mixer_id) if obj.mixer_id is not None else None
+    return _type_value(obj.ingredient_type), obj.ingredient_id
+
+
+def _needs_ref(obj) -> bool:
+    if obj.ingredient is None:
+        return True
+    state = inspect(obj)
+    if isinstance(obj, models.MachineFiller):
+        columns = ("mixer_id",)
+    elif isinstance(obj, models.MachineSlot):
+        columns = ("ingredient_type", "ingredient_id", "active")
+    else:
+        columns = ("ingredient_type", "ingredient_id")
+    return any(state.attrs[c].history.has_changes() for c in columns)
+
+
+def _sync_sources(session: Session) -> None:
+    """Nowy alkohol/mixer dostaje wiersz w ingredients, zmiana nazwy/ABV/typu jest przepisywana."""
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, (models.Alcohol, models.Mixer))
+    ]
+    if not changed:
+        return
+    existing = [obj for obj in changed if obj.id is not None]
+    by_source = {}
+    if existing:
+        Ingredient = models.Ingredient
+        alcohol_ids = [o.id for o in existing if isinstance(o, models.Alcohol)]
+        mixer_ids = [o.id for o in existing if isinstance(o, models.Mixer)]
+        for ing in session.query(Ingredient).filter(
+            or_(Ingredient.alcohol_id.in_(alcohol_ids), Ingredient.mixer_id.in_(mixer_ids))
+        ):
+            by_source[ing.key] = ing
+
+    for obj in changed:
+        kind = "alcohol" if isinstance(obj, models.Alcohol) else "mixer"
+        ing = by_source.get((kind, obj.id)) if obj.id is not None else None
+        if ing is None:
+            ing = models.Ingredient(ingredient_type=kind, **{kind: obj})
+            session.add(ing)
+        for key, value in _source(obj).items():
+            if getattr(ing, key) != value:
+                setattr(ing, key, value)
+
+
+def _resolve_refs(session: Session) -> None:
+    """Ustawia ingredient_ref_id przepisów i slotów; nieznany składnik -> UnknownIngredientError."""
+    pending = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, (models.DrinkIngredient, models.MachineSlot, models.MachineFiller))
+        and obj not in session.deleted and _needs_ref(obj)
+    ]
+    if not pending:
+        return
+    wanted = {ref for ref in map(_reference, pending) if ref is not None}
+    alcohol_ids = [i for t, i in wanted if t == "alcohol"]
+    mixer_ids = [i for t, i in wanted if t == "mixer"]
+    Ingredient = models.Ingredient
+    found = {
+        ing.key: ing
+        for ing in session.query(Ingredient).filter(
+            or_(Ingredient.alcohol_id.in_(alcohol_ids), Ingredient.mixer_id.in_(mixer_ids))
+        )
+    } if wanted else {}
+
+    for obj in pending:
+        ref = _reference(obj)
+        if ref is None:
+            obj.ingredient = None
+            continue
+        if ref not in found:
+            if isinstance(obj, models.MachineSlot) and not obj.active:
+                # pusty slot (np. ingredient_id=0) — nic nie nalewa, więc nic nie wskazuje
+                obj.ingredient = None
+                continue
+            raise UnknownIngredientError(f"Unknown {ref[0]} {ref[1]}")
+        obj.ingredient = found[ref]
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    with session.no_autoflush:
+        _sync_sources(session)
+        _resolve_refs(session)
+
+
+def install(session_factory: sessionmaker) -> None:
+    # przed drink_stats i change_tracking: ich zapytania widzą już uzupełnione klucze
+    event.listen(session_factory, "before_flush", _before_flush)
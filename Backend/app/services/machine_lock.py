@@ -0,0 +1,190 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+UART_LOCK_DIR = os.getenv("UART_LOCK_DIR", tempfile.gettempdir())
+UART_LOCK_TIMEOUT = float(os.getenv("UART_LOCK_TIMEOUT", "120"))
+# holder bez żywego procesu albo starszy niż lease jest uznawany za martwy
+UART_LOCK_LEASE = float(os.getenv("UART_LOCK_LEASE", "900"))
+POLL_INTERVAL = 0.1
+# waiter odświeża heartbeat co POLL_INTERVAL; brak heartbeatu = proces padł
+WAITER_STALE_AFTER = 5.0
+
+
+class MachineBusyError(RuntimeError):
+    def __init__(self, message: str, status: dict):
+        super().__init__(message)
+        self.status = status
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) na Windows wysyła CTRL_C_EVENT — polegamy na lease
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MachineLock:
+    """
+    Cross-process FIFO (ticket) lock for one serial port.
+
+    State lives in a small JSON file next to a guard file that is only
+    flock'ed for the few microseconds needed to read/modify it, so waiting
+    never holds an OS lock. Tickets are served strictly in order; waiters
+    that give up or crash are dropped from the queue.
+    """
+
+    def __init__(self, name: str) -> None:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", name).strip("_") or "default"
+        self.name = name
+        self._guard_path = os.path.join(UART_LOCK_DIR, f"drinkmaster-{safe}.lock")
+        self._state_path = f"{self._guard_path}.json"
+
+    @contextmanager
+    def _guard(self):
+        with open(self._guard_path, "a+b") as f:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read(self) -> dict:
+        try:
+            with open(self._state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault("next_ticket", 0)
+        state.setdefault("holder", None)
+        state.setdefault("waiters", {})
+        return state
+
+    def _write(self, state: dict) -> None:
+        tmp_path = f"{self._state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path)
+
+    @staticmethod
+    def _cleanup(state: dict, now: float) -> None:
+        holder = state["holder"]
+        if holder and (not _pid_alive(holder["pid"]) or now - holder["acquired_at"] > UART_LOCK_LEASE):
+            state["holder"] = None
+        state["waiters"] = {
+            ticket: w for ticket, w in state["waiters"].items()
+            if now - w["heartbeat"] <= WAITER_STALE_AFTER and _pid_alive(w["pid"])
+        }
+
+    @contextmanager
+    def acquire(self, label: str = "", timeout: float | None = None):
+        """Blokuje do przejęcia maszyny; yield zwraca czas oczekiwania w sekundach."""
+        timeout = UART_LOCK_TIMEOUT if timeout is None else timeout
+        started = time.time()
+        waiter = {
+            "pid": os.getpid(),
+            "thread": threading.get_ident(),
+            "label": label,
+            "since": started,
+            "heartbeat": started,
+        }
+
+        with self._guard():
+            state = self._read()
+            ticket = str(state["next_ticket"])
+            state["next_ticket"] += 1
+            state["waiters"][ticket] = waiter
+            self._write(state)
+
+        while True:
+            now = time.time()
+            with self._guard():
+                state = self._read()
+                self._cleanup(state, now)
+                waiter["heartbeat"] = now
+                state["waiters"][ticket] = waiter
+                first = min(state["waiters"], key=int)
+                if state["holder"] is None and first == ticket:
+                    del state["waiters"][ticket]
+                    state["holder"] = {**waiter, "ticket": ticket, "acquired_at": now}
+                    self._write(state)
+                    break
+                if now - started >= timeout:
+                    del state["waiters"][ticket]
+                    self._write(state)
+                    raise MachineBusyError(
+                        f"Machine busy: waited {now - started:.0f}s", self._describe(state, now)
+                    )
+                self._write(state)
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            yield time.time() - started
+        finally:
+            with self._guard():
+                state = self._read()
+                if state["holder"] and state["holder"].get("ticket") == ticket:
+                    state["holder"] = None
+                    self._write(state)
+
+    def status(self) -> dict:
+        now = time.time()
+        with self._guard():
+            state = self._read()
+            self._cleanup(state, now)
+        return self._describe(state, now)
+
+    def _describe(self, state: dict, now: float) -> dict:
+        holder = state["holder"]
+        return {
+            "port": self.name,
+            "busy": holder is not None,
+            "holder": {
+                "label": holder["label"],
+                "pid": holder["pid"],
+                "held_seconds": round(now - holder["acquired_at"], 1),
+                "waited_seconds": round(holder["acquired_at"] - holder["since"], 1),
+            } if holder else None,
+            "waiting": [
+                {
+                    "label": w["label"],
+                    "pid": w["pid"],
+                    "waiting_seconds": round(now - w["since"], 1),
+                }
+                for _, w in sorted(state["waiters"].items(), key=lambda item: int(item[0]))
+            ],
+        }
+
+
+_locks: dict[str, MachineLock] = {}
+_locks_guard = threading.Lock()
+
+
+def get_machine_lock(port: str) -> MachineLock:
+    with _locks_guard:
+        if port not in _locks:
+            _locks[port] = MachineLock(port)
+        return _locks[port]
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import threading
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from .change_tracking import current_seq
+from .slots import DEFAULT_MACHINE_ID
+
+# sloty 1–6: dozowniki (alkohol/syrop), 7–10: pompy mixerów — jak w ESP/main.cpp
+OPTIC_SLOTS = range(1, 7)
+PUMP_SLOTS = range(7, 11)
+# jak często (s) sprawdzać licznik zmian — łapie zapisy z innych workerów
+MACHINE_STATE_POLL = float(os.getenv("MACHINE_STATE_POLL", "2"))
+
+
+def _empty_slot(slot_number: int) -> dict:
+    return {
+        "slot_number": slot_number,
+        "kind": "optic" if slot_number in OPTIC_SLOTS else "pump",
+        "ingredient_type": None,
+        "ingredient_id": None,
+        "name": None,
+        "abv": None,
+        "mixer_type": None,
+        "volume_ml": None,
+        "active": False,
+        "note": None,
+    }
+
+
+def build_snapshot(db: Session, machine_id: int) -> dict | None:
+    """Wszystkie 10 slotów maszyny z nazwami składników — 3 zapytania (składnik dochodzi JOIN-em)."""
+    machine = db.get(models.Machine, machine_id)
+    if machine is None:
+        return None
+    slots = db.query(models.MachineSlot).filter(models.MachineSlot.machine_id == machine_id).all()
+    fillers = db.query(models.MachineFiller).filter(models.MachineFiller.machine_id == machine_id).all()
+
+    rows = []
+    for slot in slots:
+        type_value = slot.ingredient_type.value if hasattr(slot.ingredient_type, "value") else slot.ingredient_type
+        rows.append((slot, type_value, slot.ingredient_id))
+    for filler in fillers:
+        rows.append((filler, "mixer", filler.mixer_id))
+
+    by_number = {n: _empty_slot(n) for n in list(OPTIC_SLOTS) + list(PUMP_SLOTS)}
+    for row, type_value, ingredient_id in rows:
+        item = by_number.get(row.slot_number)
+        if item is None:
+            continue
+        item.update({
+            "ingredient_type": type_value,
+            "ingredient_id": ingredient_id,
+            "volume_ml": row.volume_ml,
+            "active": bool(row.active),
+            "note": row.note,
+        })
+        ing = row.ingredient
+        if ing is not None:
+            item["name"] = ing.name
+            item["abv"] = ing.abv
+            item["mixer_type"] = ing.mixer_type.value if hasattr(ing.mixer_type, "value") else ing.mixer_type
+
+    return {
+        "machine": {"id": machine.id, "name": machine.name, "active": bool(machine.active)},
+        "slots": [by_number[n] for n in sorted(by_number)],
+    }
+
+
+class MachineStateCache:
+    """
+    Gotowe JSON-y snapshotów per maszyna, ważne dopóki nie zmieni się
+    globalny licznik zmian (sync_state) — jeden odczyt wiersza po kluczu
+    zamiast kilku zapytań przy każdym żądaniu, spójny między workerami.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[int, tuple[int, bytes]] = {}
+
+    def get(self, db: Session, machine_id: int = DEFAULT_MACHINE_ID) -> tuple[int, bytes] | None:
+        """(wersja, JSON) albo None, gdy maszyna nie istnieje."""
+        seq = current_seq(db)
+        with self._lock:
+            cached = self._entries.get(machine_id)
+        if cached is not None and cached[0] == seq:
+            return cached
+
+        snapshot = build_snapshot(db, machine_id)
+        if snapshot is None:
+            return None
+        snapshot["version"] = seq
+        entry = (seq, json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._entries[machine_id] = entry
+        return entry
+
+
+class MachineStateHub:
+    """
+    Budzi subskrybentów SSE po zmianie slotów. notify() jest wołane z wątków
+    threadpoola po commicie (natychmiast w tym workerze); zmiany z innych
+    workerów wykrywa jedno wspólne odpytywanie licznika zmian co
+    MACHINE_STATE_POLL sekund, działające tylko gdy ktoś słucha.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._poller: asyncio.Task | None = None
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._poller is None or self._poller.done():
+            self._poller = self._loop.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def notify(self) -> None:
+        loop = self._loop
+        if loop is not None and self._subscribers and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        for queue in list(self._subscribers):
+            if queue.empty():
+                queue.put_nowait(None)
+
+    async def _poll(self) -> None:
+        last_seq = None
+        while self._subscribers:
+            seq = await asyncio.to_thread(_read_seq)
+            if last_seq is not None and seq != last_seq:
+                self._wake()
+            last_seq = seq
+            await asyncio.sleep(MACHINE_STATE_POLL)
+
+
+def _read_seq() -> int:
+    with SessionLocal() as db:
+        return current_seq(db)
+
+
+machine_state_cache = MachineStateCache()
+machine_state_hub = MachineStateHub()
@@ -0,0 +1,51 @@
+import os
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from .machine_lock import get_machine_lock
+from .slots import DEFAULT_MACHINE_ID
+
+
+def machine_port(machine: models.Machine) -> str | None:
+    """Port UART maszyny; maszyna domyślna bez portu w bazie używa UART_PORT."""
+    if machine.port:
+        return machine.port
+    if machine.id == DEFAULT_MACHINE_ID:
+        return os.getenv("UART_PORT") or None
+    return None
+
+
+def machine_status(machine: models.Machine) -> dict:
+    """
+    Stan maszyny z blokady portu (wspólnej dla wszystkich workerów):
+    disabled / offline (brak portu) / busy / idle oraz długość kolejki.
+    """
+    if not machine.active:
+        return {"status": "disabled", "queue_length": 0, "holder": None}
+    port = machine_port(machine)
+    if not port:
+        return {"status": "offline", "queue_length": 0, "holder": None}
+    lock = get_machine_lock(port).status()
+    return {
+        "status": "busy" if lock["busy"] else "idle",
+        "queue_length": len(lock["waiting"]),
+        "holder": lock["holder"]["label"] if lock["holder"] else None,
+    }
+
+
+def machine_load(machine: models.Machine) -> int:
+    """Liczba nalań przed nowym zleceniem: trwające + oczekujące w kolejce."""
+    status = machine_status(machine)
+    return (1 if status["status"] == "busy" else 0) + status["queue_length"]
+
+
+def pourable_machines(db: Session) -> list[models.Machine]:
+    """Aktywne maszyny z przypisanym portem, w kolejności ID."""
+    machines = (
+        db.query(models.Machine)
+        .filter(models.Machine.active == True)
+        .order_by(models.Machine.id)
+        .all()
+    )
+    return [m for m in machines if machine_port(m)]
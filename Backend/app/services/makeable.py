@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+MAKEABLE_INDEX_TTL = float(os.getenv("MAKEABLE_INDEX_TTL", "300"))
+
+IngredientKey = tuple[str, int]
+
+
+def ingredient_key(ingredient_type, ingredient_id: int) -> IngredientKey:
+    type_value = ingredient_type.value if hasattr(ingredient_type, "value") else ingredient_type
+    return type_value, ingredient_id
+
+
+class MakeableIndex:
+    """
+    Precomputed ingredient -> drink bitset index over public drinks.
+
+    Each public drink gets a bit position; every ingredient keeps the bitset
+    (a Python int) of drinks that need it. Answering "what can I make with X"
+    is then a handful of bitwise ops per *absent* ingredient instead of a
+    scan over every recipe.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._drinks_by_ingredient: dict[IngredientKey, int] = {}
+        self._drink_ids: list[int] = []
+        self._requirements: list[frozenset[IngredientKey]] = []
+        self._all = 0
+        self._built_at: float | None = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def rebuild(self, db: Session) -> None:
+        rows = (
+            db.query(
+                models.Drink.id,
+                models.DrinkIngredient.ingredient_type,
+                models.DrinkIngredient.ingredient_id,
+            )
+            .outerjoin(models.DrinkIngredient, models.DrinkIngredient.drink_id == models.Drink.id)
+            .filter(models.Drink.is_public == True)
+            .order_by(models.Drink.id)
+            .all()
+        )
+
+        requirements: dict[int, set[IngredientKey]] = {}
+        for drink_id, ingredient_type, ingredient_id in rows:
+            needed = requirements.setdefault(drink_id, set())
+            if ingredient_type is not None:
+                needed.add(ingredient_key(ingredient_type, ingredient_id))
+
+        drinks_by_ingredient: dict[IngredientKey, int] = {}
+        drink_ids = list(requirements)
+        for position, drink_id in enumerate(drink_ids):
+            bit = 1 << position
+            for key in requirements[drink_id]:
+                drinks_by_ingredient[key] = drinks_by_ingredient.get(key, 0) | bit
+
+        with self._lock:
+            self._drinks_by_ingredient = drinks_by_ingredient
+            self._drink_ids = drink_ids
+            self._requirements = [frozenset(requirements[d]) for d in drink_ids]
+            self._all = (1 << len(drink_ids)) - 1
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self, db: Session) -> None:
+        with self._lock:
+            built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > MAKEABLE_INDEX_TTL:
+            self.rebuild(db)
+
+    def query(
+        self,
+        db: Session,
+        available: set[IngredientKey],
+        max_missing: int = 2,
+    ) -> tuple[list[int], list[tuple[int, list[IngredientKey]]]]:
+        """
+        Zwraca (ID drinków do zrobienia, [(ID drinka, brakujące składniki)])
+        dla drinków, którym brakuje od 1 do max_missing składników.
+        """
+        self._ensure_fresh(db)
+        with self._lock:
+            # Liczniki bit-sliced: ones/twos/threes = drinki, którym brakuje >=1/>=2/>=3 składników
+            ones = twos = threes = 0
+            for key, drinks in self._drinks_by_ingredient.items():
+                if key in available:
+                    continue
+                threes |= twos & drinks
+                twos |= ones & drinks
+                ones |= drinks
+
+            makeable_bits = self._all & ~ones
+            missing_bits = {1: ones & ~twos, 2: twos & ~threes}
+
+            makeable = self._ids_from_bits(makeable_bits)
+            almost: list[tuple[int, list[IngredientKey]]] = []
+            for count in range(1, min(max_missing, 2) + 1):
+                for position in self._positions(missing_bits[count]):
+                    missing = sorted(self._requirements[position] - available)
+                    almost.append((self._drink_ids[position], missing))
+            return makeable, almost
+
+    @staticmethod
+    def _positions(bits: int):
+        while bits:
+            low = bits & -bits
+            yield low.bit_length() - 1
+            bits ^= low
+
+    def _ids_from_bits(self, bits: int) -> list[int]:
+        return [self._drink_ids[position] for position in self._positions(bits)]
+
+
+makeable_index = MakeableIndex()
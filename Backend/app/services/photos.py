@@ -0,0 +1,171 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, UnidentifiedImageError
+
+# Folder do przechowywania zdjęć drinków
+DRINK_PHOTOS_DIR = "drinkPhotos"
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", os.path.join(DRINK_PHOTOS_DIR, ".thumbs"))
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# szerokości są zaokrąglane w górę do tych wartości, żeby dowolne ?w= nie rozdmuchało cache
+THUMB_WIDTHS = (160, 320, 480, 640, 960, 1280)
+THUMB_QUALITY = int(os.getenv("PHOTO_THUMB_QUALITY", "80"))
+# limity uploadu: bajty pliku i piksele (sprawdzane z nagłówka, zanim cokolwiek zostanie zdekodowane)
+PHOTO_MAX_UPLOAD_BYTES = int(os.getenv("PHOTO_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+PHOTO_MAX_PIXELS = int(os.getenv("PHOTO_MAX_PIXELS", str(40_000_000)))
+PHOTO_SIZE = (1280, 720)
+UPLOAD_CHUNK = 256 * 1024
+
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def photo_path(name: str) -> str | None:
+    """Ścieżka oryginału albo None dla nazw spoza katalogu / nieistniejących plików."""
+    if not name or name != os.path.basename(name) or name.startswith("."):
+        return None
+    path = os.path.join(DRINK_PHOTOS_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def resize_to_1280x720(image: Image.Image):
+    target_size = PHOTO_SIZE
+    image.thumbnail(target_size, Image.Resampling.LANCZOS)
+    new_image = Image.new("RGB", target_size, (0, 0, 0))
+    paste_x = (target_size[0] - image.width) // 2
+    paste_y = (target_size[1] - image.height) // 2
+    new_image.paste(image, (paste_x, paste_y))
+    return new_image
+
+
+def _convert_photo(source: str, target: str) -> None:
+    try:
+        with Image.open(source) as img:
+            if img.width * img.height > PHOTO_MAX_PIXELS:
+                raise HTTPException(status_code=413, detail=f"Image exceeds {PHOTO_MAX_PIXELS} pixels")
+            if img.format == "JPEG":
+                # dekodowanie w skali 1/2..1/8 — najmniejszej nadal >= 1280x720
+                img.draft("RGB", PHOTO_SIZE)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            resized = resize_to_1280x720(img)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid image") from exc
+
+    tmp_path = f"{target}.{threading.get_ident()}.tmp"
+    resized.save(tmp_path, format="JPEG")
+    os.replace(tmp_path, target)
+
+
+async def save_upload(upload: UploadFile) -> str:
+    """
+    Zapisuje zdjęcie drinka jako JPEG 1280x720 i zwraca nazwę pliku.
+    Upload jest kopiowany kawałkami do pliku tymczasowego (przerywane po
+    PHOTO_MAX_UPLOAD_BYTES), a dekodowanie działa w threadpoolu, żeby nie
+    blokować pętli zdarzeń.
+    """
+    name = os.path.basename(upload.filename or "")
+    if not name or name.startswith("."):
+        raise HTTPException(status_code=400, detail="Invalid image filename")
+
+    os.makedirs(DRINK_PHOTOS_DIR, exist_ok=True)
+    # ukryta nazwa: photo_path() nie serwuje niedokończonych plików
+    fd, tmp_path = tempfile.mkstemp(prefix=".upload-", dir=DRINK_PHOTOS_DIR)
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(UPLOAD_CHUNK):
+                size += len(chunk)
+                if size > PHOTO_MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Image exceeds {PHOTO_MAX_UPLOAD_BYTES} bytes")
+                out.write(chunk)
+        await run_in_threadpool(_convert_photo, tmp_path, os.path.join(DRINK_PHOTOS_DIR, name))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return name
+
+
+def photo_etag(source: str, width: int | None = None) -> str:
+    """
+    ETag z mtime/rozmiaru oryginału (i szerokości miniatury) — stały, dopóki
+    zdjęcie nie zostanie podmienione, niezależnie od stanu cache miniatur.
+    """
+    stat = os.stat(source)
+    suffix = f"-w{width}" if width is not None else ""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def snap_width(width: int) -> int:
+    for candidate in THUMB_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return THUMB_WIDTHS[-1]
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def thumbnail_path(source: str, width: int) -> str:
+    """
+    Zwraca ścieżkę pomniejszonej wersji (JPEG) tworząc ją przy pierwszym
+    użyciu. Klucz zawiera mtime oryginału, więc podmiana zdjęcia przy edycji
+    drinka automatycznie omija stare warianty (wypadną z LRU).
+    """
+    stat = os.stat(source)
+    digest = hashlib.sha1(os.path.basename(source).encode("utf-8")).hexdigest()[:12]
+    target = os.path.join(PHOTO_CACHE_DIR, f"{digest}-{stat.st_mtime_ns:x}-w{width}.jpg")
+
+    try:
+        # atime = ostatnie użycie (LRU); mtime zostaje czasem utworzenia miniatury
+        os.utime(target, ns=(time.time_ns(), os.stat(target).st_mtime_ns))
+        return target
+    except FileNotFoundError:
+        pass
+
+    with _key_lock(target):
+        if os.path.exists(target):
+            return target
+        os.makedirs(PHOTO_CACHE_DIR, exist_ok=True)
+        with Image.open(source) as img:
+            if img.format == "JPEG":
+                img.draft("RGB", (width, width))
+            img = img.convert("RGB")
+            if img.width > width:
+                img.thumbnail((width, img.height * width // img.width or 1), Image.Resampling.LANCZOS)
+            tmp_path = f"{target}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, format="JPEG", quality=THUMB_QUALITY, optimize=True)
+        os.replace(tmp_path, target)
+
+    _enforce_cache_limit()
+    return target
+
+
+def _enforce_cache_limit() -> None:
+    try:
+        entries = [
+            entry for entry in os.scandir(PHOTO_CACHE_DIR)
+            if entry.is_file() and entry.name.endswith(".jpg")
+        ]
+    except FileNotFoundError:
+        return
+    # kolejność LRU po atime ustawianym przy każdym trafieniu w thumbnail_path()
+    stats = [(entry.stat().st_atime_ns, entry.stat().st_size, entry.path) for entry in entries]
+    total = sum(size for _, size, _ in stats)
+    if total <= PHOTO_CACHE_MAX_BYTES:
+        return
+    for _, size, path in sorted(stats):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= PHOTO_CACHE_MAX_BYTES * 0.9:
+            break
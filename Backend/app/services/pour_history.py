@@ -0,0 +1,117 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+from .uart import UartTiming
+
+
+def _bucket(moment: datetime, period: models.RollupPeriod) -> datetime:
+    if period == models.RollupPeriod.hour:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# licznik w pour_rollups per wynik; `busy` (maszyna zajęta) to nie awaria
+_ROLLUP_COUNTERS = {
+    models.PourOutcome.done: "pours",
+    models.PourOutcome.failed: "failures",
+    models.PourOutcome.busy: "busy",
+}
+
+
+def _bump_rollup(
+    db: Session,
+    period: models.RollupPeriod,
+    bucket_start: datetime,
+    drink_id: int,
+    outcome: models.PourOutcome,
+    seconds: float,
+) -> None:
+    """Atomowy UPDATE licznika; przy pierwszym nalaniu w kubełku INSERT (z obsługą wyścigu)."""
+    Rollup = models.PourRollup
+    counter = _ROLLUP_COUNTERS[outcome]
+    values = {
+        getattr(Rollup, counter): getattr(Rollup, counter) + 1,
+        Rollup.total_seconds: Rollup.total_seconds + seconds,
+    }
+    key = (Rollup.period == period, Rollup.bucket_start == bucket_start, Rollup.drink_id == drink_id)
+
+    if db.query(Rollup).filter(*key).update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(Rollup(
+                period=period,
+                bucket_start=bucket_start,
+                drink_id=drink_id,
+                total_seconds=seconds,
+                **{name: int(name == counter) for name in _ROLLUP_COUNTERS.values()},
+            ))
+    except IntegrityError:
+        # inny worker utworzył kubełek w międzyczasie
+        db.query(Rollup).filter(*key).update(values, synchronize_session=False)
+
+
+def _bump_user_stat(db: Session, user_id: int, drink_id: int, poured_at: datetime) -> None:
+    Stat = models.UserDrinkStat
+    key = (Stat.user_id == user_id, Stat.drink_id == drink_id)
+    values = {Stat.pour_count: Stat.pour_count + 1, Stat.last_poured_at: poured_at}
+
+    if db.query(Stat).filter(*key).update(values, synchronize_session=False):
+        return
+    try:
+        with db.begin_nested():
+            db.add(Stat(user_id=user_id, drink_id=drink_id, pour_count=1, last_poured_at=poured_at))
+    except IntegrityError:
+        db.query(Stat).filter(*key).update(values, synchronize_session=False)
+
+
+def record_pour(
+    db: Session,
+    *,
+    drink_id: int,
+    user_id: int | None,
+    frame: list[int],
+    machine_id: int | None = None,
+    started_at: datetime,
+    outcome: models.PourOutcome,
+    timing: UartTiming | None = None,
+    error: str | None = None,
+) -> models.PourEvent:
+    """
+    Zapisuje próbę nalania i w tej samej transakcji aktualizuje agregaty
+    godzinowe/dzienne oraz historię użytkownika (tylko udane nalania).
+    Nieudane nalanie z `timing` (ESP potwierdził ramkę) dostaje received_at.
+    """
+    received_at = done_at = None
+    seconds = 0.0
+    if timing is not None:
+        sent_at = started_at + timedelta(seconds=timing.lock_waited)
+        received_at = sent_at + timedelta(seconds=timing.received_after)
+        if timing.done_after is not None:
+            done_at = sent_at + timedelta(seconds=timing.done_after)
+            seconds = timing.done_after - timing.received_after
+
+    event = models.PourEvent(
+        drink_id=drink_id,
+        user_id=user_id,
+        machine_id=machine_id,
+        frame=json.dumps(frame),
+        started_at=started_at,
+        received_at=received_at,
+        done_at=done_at,
+        outcome=outcome,
+        error=error,
+    )
+    db.add(event)
+
+    for period in models.RollupPeriod:
+        _bump_rollup(db, period, _bucket(started_at, period), drink_id, outcome, seconds)
+    if outcome == models.PourOutcome.done and user_id is not None:
+        _bump_user_stat(db, user_id, drink_id, done_at or started_at)
+
+    db.commit()
+    return event
@@ -0,0 +1,265 @@
+import json
+import math
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from .frame_codec import decode_frame
+from .machine_lock import UART_LOCK_TIMEOUT
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# ================== MECHANIKA (lustro stałych z ESP/main.cpp) ==================
+# pozycje nalewania 1..10 w mm od bazy (7-10 = 0, pompy pod bazą)
+POUR_POSITIONS_MM = (90.0, 140.0, 190.0, 240.0, 290.0, 340.0, 0.0, 0.0, 0.0, 0.0)
+
+# X: 1/4 kroku, śruba 4 mm/obr -> 200 kroków/mm; maxSpeed 2500, accel 1200 (kroki/s)
+X_STEPS_PER_MM = 200 * 4 / 4.0
+X_MAX_SPEED_MM_S = 2500 / X_STEPS_PER_MM
+X_ACCEL_MM_S2 = 1200 / X_STEPS_PER_MM
+X_HOME_SPEED_MM_S = 800 / X_STEPS_PER_MM
+
+# Z: 1/2 kroku, śruba 2 mm/obr -> 200 kroków/mm; maxSpeed 800, accel 250 (kroki/s)
+Z_STEPS_PER_MM = 200 * 2 / 2.0
+Z_MAX_SPEED_MM_S = 800 / Z_STEPS_PER_MM
+Z_ACCEL_MM_S2 = 250 / Z_STEPS_PER_MM
+
+Z_LIFT_MM = 35.0             # jeden cykl dozownika = 35 ml
+Z_CYCLE_PAUSE_S = 5.0
+OPTIC_ML_PER_CYCLE = 35
+FILLER_LIFT_MM = 20.0
+PUMP_S_PER_ML = 0.030        # pumpDurationMs: 2000 ml/min => 30 ms/ml
+SCALE_TARE_S = 1.0           # tare(10 próbek) przy ~10 Hz
+SCALE_CHECK_S = 0.8 + 1.0    # SCALE_SETTLE_MS + odczyt 10 próbek
+
+# ================== KALIBRACJA / DEADLINE ==================
+POUR_MODEL_FILE = os.getenv("POUR_MODEL_FILE", "pour_model.json")
+POUR_MODEL_LEARNING_RATE = float(os.getenv("POUR_MODEL_LEARNING_RATE", "0.3"))
+UART_DEADLINE_FACTOR = float(os.getenv("UART_DEADLINE_FACTOR", "1.5"))
+UART_DEADLINE_MARGIN = float(os.getenv("UART_DEADLINE_MARGIN", "10"))
+
+MIN_FACTOR = 0.25
+MAX_FACTOR = 4.0
+
+
+def move_time(distance_mm: float, max_speed: float, accel: float) -> float:
+    """Czas ruchu z profilem trapezowym (AccelStepper) na dystansie distance_mm."""
+    d = abs(distance_mm)
+    if d == 0:
+        return 0.0
+    if d >= max_speed * max_speed / accel:
+        return d / max_speed + max_speed / accel
+    return 2.0 * math.sqrt(d / accel)
+
+
+def parse_frame(frame: bytes | list[int]) -> list[tuple[int, int]]:
+    """Ramka (v1 `slot, ml, 0xFF, ..., 0xFF` albo v2) -> [(slot, ml), ...]."""
+    return decode_frame(frame)
+
+
+class PourModel:
+    """
+    Estymator czasu nalewania odwzorowujący executeFrame() z firmware'u.
+
+    Ruchy osi X/Z liczone są z profilu trapezowego, dozowanie per slot
+    mnożone przez współczynnik kalibracji uczony z obserwowanych czasów
+    `received` -> `done` (zapisywany w POUR_MODEL_FILE).
+
+    Plik jest wspólny dla workerów: krok kalibracji czyta go pod flock,
+    stosuje się do najnowszych współczynników i podmienia plik atomowo,
+    więc nauka innych workerów nie jest nadpisywana. Estymacja przeładowuje
+    plik, gdy zmienił się na dysku.
+    """
+
+    def __init__(self, path: str = POUR_MODEL_FILE) -> None:
+        self._lock = threading.Lock()
+        self._path = path
+        self._factors = {slot: 1.0 for slot in range(1, 11)}
+        self._samples = 0
+        self._identity: tuple[int, int] | None = None
+        self._load()
+
+    # ---------- model ----------
+
+    def _dispense_time(self, slot: int, ml: int) -> float:
+        if 1 <= slot <= 6:
+            cycles = ml // OPTIC_ML_PER_CYCLE
+            if cycles == 0:
+                return 0.0
+            lift = 2 * move_time(Z_LIFT_MM, Z_MAX_SPEED_MM_S, Z_ACCEL_MM_S2)
+            return cycles * lift + (cycles - 1) * Z_CYCLE_PAUSE_S
+        pump = ml * PUMP_S_PER_ML if ml else 0.0
+        return pump + SCALE_TARE_S + SCALE_CHECK_S
+
+    def _fixed_time(self, slot: int) -> float:
+        if 7 <= slot <= 10:
+            return 2 * move_time(FILLER_LIFT_MM, Z_MAX_SPEED_MM_S, Z_ACCEL_MM_S2)
+        return 0.0
+
+    def _breakdown(self, segments: list[tuple[int, int]]) -> tuple[float, dict[int, float]]:
+        """(czas ruchów, {slot: czas dozowania bez kalibracji})"""
+        travel = 0.0
+        dispense: dict[int, float] = {}
+        position = 0.0
+        for slot, ml in segments:
+            if not 1 <= slot <= 10:
+                continue
+            target = POUR_POSITIONS_MM[slot - 1]
+            travel += move_time(target - position, X_MAX_SPEED_MM_S, X_ACCEL_MM_S2)
+            travel += self._fixed_time(slot)
+            position = target
+            dispense[slot] = dispense.get(slot, 0.0) + self._dispense_time(slot, ml)
+        # powrót do bazy: homeAxisX() ze stałą prędkością
+        travel += position / X_HOME_SPEED_MM_S
+        return travel, dispense
+
+    def travel_time(self, segments: list[tuple[int, int]]) -> float:
+        """Same ruchy osi (X, podnoszenia mixerów, powrót do bazy) — bez dozowania."""
+        return self._breakdown(segments)[0]
+
+    def estimate_segments(self, segments: list[tuple[int, int]]) -> float:
+        travel, dispense = self._breakdown(segments)
+        with self._lock:
+            self._refresh()
+            return travel + sum(t * self._factors[slot] for slot, t in dispense.items())
+
+    def estimate(self, frame: bytes | list[int]) -> float:
+        return self.estimate_segments(parse_frame(frame))
+
+    def deadline(self, eta_seconds: float) -> float:
+        """Deadline na `done` po `received` dla przewidywanego czasu."""
+        return eta_seconds * UART_DEADLINE_FACTOR + UART_DEADLINE_MARGIN
+
+    def max_wait(self, eta_seconds: float) -> float:
+        """
+        Najdłuższa odpowiedź /send: kolejka do maszyny, czekanie na `received`
+        i deadline na `done` — klient ustawia swój timeout powyżej tej wartości.
+        """
+        response_timeout = float(os.getenv("UART_RESPONSE_TIMEOUT", "10"))
+        return UART_LOCK_TIMEOUT + response_timeout + self.deadline(eta_seconds)
+
+    # ---------- kalibracja ----------
+
+    def observe(self, frame: bytes | list[int], observed_seconds: float) -> None:
+        """
+        Rozkłada błąd predykcji na sloty proporcjonalnie do ich udziału
+        w czasie dozowania i przesuwa ich współczynniki (EWMA).
+        """
+        travel, dispense = self._breakdown(parse_frame(frame))
+        total_dispense = sum(dispense.values())
+        if total_dispense <= 0 or observed_seconds <= 0:
+            return
+
+        with self._lock, self._file_lock():
+            # współczynniki mogły się zmienić w innym workerze — krok liczony od najnowszych
+            self._load()
+            predicted = travel + sum(t * self._factors[slot] for slot, t in dispense.items())
+            residual = observed_seconds - predicted
+            for slot, base in dispense.items():
+                if base <= 0:
+                    continue
+                share = base / total_dispense
+                target = self._factors[slot] + residual * share / base
+                updated = (1 - POUR_MODEL_LEARNING_RATE) * self._factors[slot] + POUR_MODEL_LEARNING_RATE * target
+                self._factors[slot] = min(MAX_FACTOR, max(MIN_FACTOR, updated))
+            self._samples += 1
+            self._save()
+
+    def status(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "samples": self._samples,
+                "timeouts": {
+                    "lock_seconds": UART_LOCK_TIMEOUT,
+                    "received_seconds": float(os.getenv("UART_RESPONSE_TIMEOUT", "10")),
+                    "deadline_factor": UART_DEADLINE_FACTOR,
+                    "deadline_margin_seconds": UART_DEADLINE_MARGIN,
+                },
+                "slots": [
+                    {
+                        "slot_number": slot,
+                        "factor": round(factor, 3),
+                        "flow_ml_per_s": (
+                            round(1 / (PUMP_S_PER_ML * factor), 1) if slot >= 7
+                            else round(OPTIC_ML_PER_CYCLE / (self._dispense_time(slot, OPTIC_ML_PER_CYCLE) * factor), 1)
+                        ),
+                    }
+                    for slot, factor in sorted(self._factors.items())
+                ],
+            }
+
+    @contextmanager
+    def _file_lock(self):
+        try:
+            f = open(f"{self._path}.lock", "a+b")
+        except OSError:
+            # katalog tylko do odczytu — kalibracja i tak nie zostanie zapisana
+            yield
+            return
+        with f:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _file_identity(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh(self) -> None:
+        """Przeładowuje plik zapisany przez inny worker (plik jest podmieniany atomowo)."""
+        identity = self._file_identity()
+        if identity is not None and identity != self._identity:
+            self._load()
+
+    def _load(self) -> None:
+        identity = self._file_identity()
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for slot, factor in data.get("factors", {}).items():
+            if int(slot) in self._factors:
+                self._factors[int(slot)] = min(MAX_FACTOR, max(MIN_FACTOR, float(factor)))
+        self._samples = int(data.get("samples", 0))
+        self._identity = identity
+
+    def _save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self._path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".pour_model-", dir=directory)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"factors": self._factors, "samples": self._samples}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+            self._identity = self._file_identity()
+        except OSError:
+            pass
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+pour_model = PourModel()
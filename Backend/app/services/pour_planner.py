@@ -0,0 +1,121 @@
+import os
+
+from .pour_model import (
+    POUR_POSITIONS_MM,
+    X_ACCEL_MM_S2,
+    X_HOME_SPEED_MM_S,
+    X_MAX_SPEED_MM_S,
+    move_time,
+    parse_frame,
+    pour_model,
+)
+
+# powyżej tylu segmentów zamiast pełnego DP (2^n * n^2) planowanie zachłanne
+PLANNER_MAX_EXACT = int(os.getenv("PLANNER_MAX_EXACT", "12"))
+
+Segment = tuple[int, int, int | None]  # (slot, ml, order_index)
+
+
+def _position(slot: int) -> float:
+    return POUR_POSITIONS_MM[slot - 1] if 1 <= slot <= 10 else 0.0
+
+
+def _travel(from_mm: float, to_mm: float) -> float:
+    return move_time(to_mm - from_mm, X_MAX_SPEED_MM_S, X_ACCEL_MM_S2)
+
+
+def _home(from_mm: float) -> float:
+    # homeAxisX() jedzie stałą, wolną prędkością — koniec trasy daleko od bazy jest drogi
+    return from_mm / X_HOME_SPEED_MM_S
+
+
+def _predecessors(segments: list[Segment]) -> list[int]:
+    """Maska segmentów, które muszą być nalane wcześniej (mniejszy order_index)."""
+    masks = []
+    for j, (_, _, order_j) in enumerate(segments):
+        mask = 0
+        if order_j is not None:
+            for i, (_, _, order_i) in enumerate(segments):
+                if order_i is not None and order_i < order_j:
+                    mask |= 1 << i
+        masks.append(mask)
+    return masks
+
+
+def _plan_exact(segments: list[Segment], before: list[int]) -> list[int]:
+    """Held-Karp po podzbiorach: najkrótsza trasa z bazy przez wszystkie segmenty i z powrotem."""
+    n = len(segments)
+    positions = [_position(slot) for slot, _, _ in segments]
+    full = (1 << n) - 1
+    inf = float("inf")
+    cost = [[inf] * n for _ in range(1 << n)]
+    parent = [[-1] * n for _ in range(1 << n)]
+    for j in range(n):
+        if before[j] == 0:
+            cost[1 << j][j] = _travel(0.0, positions[j])
+
+    for mask in range(1, full + 1):
+        for last in range(n):
+            current = cost[mask][last]
+            if current == inf:
+                continue
+            for j in range(n):
+                bit = 1 << j
+                if mask & bit or before[j] & ~mask:
+                    continue
+                candidate = current + _travel(positions[last], positions[j])
+                if candidate < cost[mask | bit][j]:
+                    cost[mask | bit][j] = candidate
+                    parent[mask | bit][j] = last
+
+    last = min(range(n), key=lambda j: cost[full][j] + _home(positions[j]))
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        last, mask = parent[mask][last], mask & ~(1 << last)
+    return order[::-1]
+
+
+def _plan_greedy(segments: list[Segment], before: list[int]) -> list[int]:
+    """Najbliższy dozwolony segment; przy remisie niższy slot."""
+    positions = [_position(slot) for slot, _, _ in segments]
+    done = 0
+    position = 0.0
+    order = []
+    for _ in segments:
+        ready = [j for j in range(len(segments)) if not done & (1 << j) and not before[j] & ~done]
+        j = min(ready, key=lambda k: (_travel(position, positions[k]), segments[k][0]))
+        order.append(j)
+        done |= 1 << j
+        position = positions[j]
+    return order
+
+
+def plan_segments(segments: list[Segment]) -> list[tuple[int, int]]:
+    """
+    Kolejność nalewania segmentów (slot, ml, order_index) minimalizująca
+    przejazdy karetki. order_index jest twardym ograniczeniem: składnik
+    z mniejszym indeksem zawsze idzie przed większym (warstwy); składniki
+    bez order_index mogą trafić w dowolne miejsce.
+    """
+    # kolejność bazowa (rosnące sloty) decyduje o remisach kosztu
+    segments = sorted(segments, key=lambda s: s[0])
+    if len(segments) <= 1:
+        return [(slot, ml) for slot, ml, _ in segments]
+    before = _predecessors(segments)
+    if len(segments) <= PLANNER_MAX_EXACT:
+        order = _plan_exact(segments, before)
+    else:
+        order = _plan_greedy(segments, before)
+    return [(segments[j][0], segments[j][1]) for j in order]
+
+
+def time_saved(frame: bytes | list[int]) -> float:
+    """
+    Sekundy oszczędzone na przejazdach względem nalewania po rosnących
+    slotach (ujemne, gdy order_index wymusza dłuższą trasę).
+    """
+    segments = parse_frame(frame)
+    baseline = sorted(segments, key=lambda s: s[0])
+    return pour_model.travel_time(baseline) - pour_model.travel_time(segments)
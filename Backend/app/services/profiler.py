@@ -0,0 +1,253 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+from starlette.concurrency import run_in_threadpool
+
+# odstęp między próbkami stosów wszystkich wątków
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# ile profili pojedynczych requestów trzyma bufor w pamięci (per worker)
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "20"))
+PROFILE_MAX_DEPTH = 128
+PROFILE_HEADER = "x-profile"
+
+# wątek czekający na pracę albo pętla zdarzeń bez zadań — nie zaśmiecają profilu
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+class ProfilerBusy(RuntimeError):
+    """Inny profil jest już nagrywany w tym workerze."""
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread snapshots the stacks of every
+    other thread (sys._current_frames) at a fixed interval and counts
+    identical stacks. Works across the event loop and threadpool without
+    instrumenting code, so overhead does not depend on call counts.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000, exclude: set[int] | None = None) -> None:
+        self.interval = interval
+        self.exclude = set(exclude or ())
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._names: dict = {}
+
+    def _name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = _frame_name(code)
+        return name
+
+    def _sample(self, own_ident: int) -> None:
+        threads = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident or ident in self.exclude:
+                continue
+            leaf = frame.f_code
+            if (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                stack.append(self._name(frame.f_code))
+                frame = frame.f_back
+            stack.append(threads.get(ident, f"thread-{ident}"))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+
+    def start(self) -> "StackSampler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self) -> str:
+        """Format "collapsed stacks" (flamegraph.pl, speedscope, inferno): `a;b;c liczba`."""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def top(self, limit: int = 30) -> list[dict]:
+        """Funkcje wg czasu własnego (self) i łącznego (total, z wywołanymi)."""
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            # pierwszy element to nazwa wątku
+            own[stack[-1]] += count
+            for name in set(stack[1:]):
+                total[name] += count
+        samples = sum(self.stacks.values()) or 1
+        ranked = sorted(total, key=lambda name: (-own[name], -total[name], name))[:limit]
+        return [
+            {
+                "function": name,
+                "self_samples": own[name],
+                "total_samples": total[name],
+                "self_pct": round(100 * own[name] / samples, 1),
+                "total_pct": round(100 * total[name] / samples, 1),
+            }
+            for name in ranked
+        ]
+
+    def report(self, limit: int = 30) -> dict:
+        return {
+            "duration_s": round(self.duration, 3),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+            "stack_samples": sum(self.stacks.values()),
+            "top": self.top(limit),
+        }
+
+
+# jeden sampler naraz na worker — dwa równoległe tylko by się nawzajem mierzyły
+_active = threading.Lock()
+
+
+def profile_for(seconds: float) -> StackSampler:
+    """Nagrywa cały worker przez `seconds` s (blokuje wywołujący wątek)."""
+    if not _active.acquire(blocking=False):
+        raise ProfilerBusy("Profiler already running in this worker")
+    try:
+        # wątek, który tylko czeka na koniec nagrania, nie jest częścią profilu
+        sampler = StackSampler(exclude={threading.get_ident()}).start()
+        time.sleep(min(seconds, PROFILE_MAX_SECONDS))
+        return sampler.stop()
+    finally:
+        _active.release()
+
+
+class ProfileStore:
+    """Ring buffer of single-request profiles (per worker)."""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._profiles: deque[dict] = deque(maxlen=size)
+
+    def add(self, profile: dict) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def recent(self) -> list[dict]:
+        with self._lock:
+            return [{k: v for k, v in p.items() if k not in ("top", "collapsed")} for p in reversed(self._profiles)]
+
+    def get(self, profile_id: str) -> dict | None:
+        with self._lock:
+            return next((p for p in self._profiles if p["profile_id"] == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+
+def _is_admin(authorization: str) -> bool:
+    from .. import models
+    from ..database import SessionLocal
+    from ..routers.users import JWT_ALGORITHM, JWT_SECRET
+    from jose import JWTError, jwt
+
+    if not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        sub = jwt.decode(authorization[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("sub")
+        user_id = int(sub)
+    except (JWTError, TypeError, ValueError):
+        return False
+    with SessionLocal() as db:
+        role = db.query(models.User.role).filter(models.User.id == user_id).scalar()
+    return role == models.RoleEnum.ADMIN
+
+
+class ProfilingMiddleware:
+    """
+    Request z nagłówkiem `X-Profile: 1` i tokenem admina jest próbkowany
+    od wejścia do wysłania ostatniego bajtu (także kompresja i strumieniowanie).
+    Odpowiedź dostaje `X-Profile-Id`, profil leży w profile_store (/profile/requests).
+    Próbkowane są wszystkie wątki workera — przy równoległym ruchu profil
+    zawiera też inne requesty (pole concurrent_requests to pokazuje).
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        profiled = False
+        if headers.get(PROFILE_HEADER.encode(), b"").strip() in (b"1", b"true"):
+            authorization = headers.get(b"authorization", b"").decode("latin-1")
+            if await run_in_threadpool(_is_admin, authorization):
+                profiled = _active.acquire(blocking=False)
+
+        self._in_flight += 1
+        if not profiled:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._in_flight -= 1
+            return
+
+        profile_id = uuid.uuid4().hex[:16]
+        started_at = datetime.now(timezone.utc)
+        concurrent = self._in_flight - 1
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code, concurrent
+            concurrent = max(concurrent, self._in_flight - 1)
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())],
+                }
+            await send(message)
+
+        sampler = StackSampler().start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            _active.release()
+            self._in_flight -= 1
+            profile_store.add({
+                "profile_id": profile_id,
+                "name": f"{scope['method']} {scope['path']}",
+                "started_at": started_at.isoformat(),
+                "status": status_code,
+                "concurrent_requests": concurrent,
+                **sampler.report(),
+                "collapsed": sampler.collapsed(),
+            })
@@ -0,0 +1,230 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+
+# memory -> stan w procesie; sqlite -> wspólny plik, limity obowiązują wszystkie workery na hoście
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "rate_limit.db")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# za reverse proxy adres klienta jest w X-Forwarded-For — ufamy mu tylko na życzenie
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+# po tylu sekundach miejsce w limicie współbieżności zajęte przez martwy proces wygasa
+CONCURRENCY_LEASE = float(os.getenv("CONCURRENCY_LEASE", "900"))
+
+
+def parse_budget(value: str) -> tuple[int, float]:
+    """'10/60' -> (10 żądań, na 60 s)."""
+    count, _, period = value.partition("/")
+    return int(count), float(period or 1)
+
+
+class MemoryBackend:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._inflight: dict[str, dict[str, float]] = {}
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 10000:
+                self._prune(now)
+            return (1 - tokens) / rate
+
+    def _prune(self, now: float) -> None:
+        # kubełki nieużywane od minuty są i tak prawie pełne
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 60}
+
+    def acquire(self, name: str, limit: int, token: str, now: float) -> bool:
+        with self._lock:
+            slots = self._inflight.setdefault(name, {})
+            for stale in [t for t, expires in slots.items() if expires < now]:
+                del slots[stale]
+            if len(slots) >= limit:
+                return False
+            slots[token] = now + CONCURRENCY_LEASE
+            return True
+
+    def release(self, name: str, token: str) -> None:
+        with self._lock:
+            self._inflight.get(name, {}).pop(token, None)
+
+
+class SqliteBackend:
+    """
+    Wspólny stan w pliku SQLite (stdlib). Każda operacja to krótka transakcja
+    BEGIN IMMEDIATE, więc odczyt i zapis kubełka są atomowe między procesami.
+    Używa zegara ściennego, bo monotonic nie jest porównywalny między procesami.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS inflight (name TEXT NOT NULL, token TEXT NOT NULL, expires REAL NOT NULL, "
+                "PRIMARY KEY (name, token))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def acquire(self, name: str, limit: int, token: str, now: float) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM inflight WHERE name = ? AND expires < ?", (name, now))
+            (count,) = conn.execute("SELECT COUNT(*) FROM inflight WHERE name = ?", (name,)).fetchone()
+            ok = count < limit
+            if ok:
+                conn.execute(
+                    "INSERT INTO inflight (name, token, expires) VALUES (?, ?, ?)",
+                    (name, token, now + CONCURRENCY_LEASE),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ok
+
+    def release(self, name: str, token: str) -> None:
+        self._connect().execute("DELETE FROM inflight WHERE name = ? AND token = ?", (name, token))
+
+
+backend = SqliteBackend(RATE_LIMIT_DB) if RATE_LIMIT_BACKEND == "sqlite" else MemoryBackend()
+
+
+def _now() -> float:
+    return time.time() if isinstance(backend, SqliteBackend) else time.monotonic()
+
+
+def client_key(request: Request) -> str:
+    """ID użytkownika z tokenu (bez zapytania do bazy) albo adres IP klienta."""
+    from ..routers.users import JWT_ALGORITHM, JWT_SECRET  # users sam używa rate_limit
+
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        try:
+            sub = jwt.decode(auth[7:], JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("sub")
+        except JWTError:
+            sub = None
+        if sub:
+            return f"user:{sub}"
+    if RATE_LIMIT_TRUST_PROXY and request.headers.get("x-forwarded-for"):
+        return "ip:" + request.headers["x-forwarded-for"].split(",")[0].strip()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def _too_many(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def rate_limit(name: str, default: str):
+    """
+    Dependency: token bucket per klient dla jednej trasy. Budżet w formacie
+    'N/sekundy' (pojemność N, uzupełnianie N na okres), nadpisywany przez
+    RATE_LIMIT_<NAME>, np. RATE_LIMIT_LOGIN=5/60.
+    """
+    capacity, period = parse_budget(os.getenv(f"RATE_LIMIT_{name.upper()}", default))
+    rate = capacity / period
+
+    def dependency(request: Request) -> None:
+        if not RATE_LIMIT_ENABLED:
+            return
+        retry_after = backend.take(f"{name}:{client_key(request)}", capacity, rate, _now())
+        if retry_after > 0:
+            raise _too_many("Too many requests", retry_after)
+
+    return dependency
+
+
+def _slot_bucket(name: str, key: str | None) -> str:
+    return f"{name}:{key}" if key is not None else name
+
+
+def acquire_slot(name: str, default: int, retry_after: float = 5, key: str | None = None) -> str | None:
+    """
+    Zajmuje miejsce w limicie równoległych wywołań albo rzuca 429. Bez key
+    limit jest globalny, z key — osobny dla każdej wartości (np. maszyny).
+    Zwraca token dla release_slot — miejsce może zwolnić np. zadanie w tle.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return None
+    limit = int(os.getenv(f"CONCURRENCY_{name.upper()}", str(default)))
+    token = uuid.uuid4().hex
+    if not backend.acquire(_slot_bucket(name, key), limit, token, _now()):
+        raise _too_many(f"Too many concurrent {name} requests", retry_after)
+    return token
+
+
+def release_slot(name: str, token: str | None, key: str | None = None) -> None:
+    if token is not None:
+        backend.release(_slot_bucket(name, key), token)
+
+
+@contextmanager
+def concurrency_slot(name: str, default: int, retry_after: float = 5, key: str | None = None):
+    token = acquire_slot(name, default, retry_after, key)
+    try:
+        yield
+    finally:
+        release_slot(name, token, key)
+
+
+def concurrency_limit(name: str, default: int, retry_after: float = 5):
+    """
+    Dependency z yield: globalny limit równoległych wywołań trasy (wszyscy
+    klienci razem). Nadmiarowe żądania od razu dostają 429 zamiast zajmować
+    wątki threadpoola. Limit nadpisuje CONCURRENCY_<NAME>.
+    """
+    def dependency():
+        with concurrency_slot(name, default, retry_after):
+            yield
+
+    return dependency
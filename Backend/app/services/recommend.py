@@ -0,0 +1,344 @@
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import models
+from .change_tracking import current_seq
+from .makeable import IngredientKey, ingredient_key
+
+# ile najbliższych sąsiadów trzymać na drinka
+RECOMMEND_NEIGHBOURS = int(os.getenv("RECOMMEND_NEIGHBOURS", "30"))
+# waga podobieństwa przepisów vs. wspólnych ulubionych (0..1)
+RECOMMEND_INGREDIENT_WEIGHT = float(os.getenv("RECOMMEND_INGREDIENT_WEIGHT", "0.7"))
+# pełna przebudowa co tyle sekund — łapie ulubione dodane w innych workerach
+RECOMMEND_TTL = float(os.getenv("RECOMMEND_TTL", "900"))
+# wiersze macierzy podobieństwa liczone naraz (pamięć: BLOCK x liczba drinków x 4 B)
+RECOMMEND_BLOCK = int(os.getenv("RECOMMEND_BLOCK", "1024"))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class DrinkRecommender:
+    """
+    Item-to-item recommendations over public drinks.
+
+    Every drink is described by two L2-normalised vectors: its recipe
+    (ingredient -> share of the total volume) and the set of users who
+    favourited it. Similarity is a weighted sum of both cosines. For each
+    drink only the top RECOMMEND_NEIGHBOURS neighbours are kept, computed
+    with NumPy in row blocks, so serving a user is a merge of the neighbour
+    lists of their favourites.
+
+    Recipe changes are picked up through drinks.change_seq (also from other
+    workers), favourites through mark_dirty(); only the changed rows and the
+    rows whose neighbour lists they touch are recomputed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._built_at: float | None = None
+        self._seq = 0
+        self._dirty: set[int] = set()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._row_of: dict[int, int] = {}
+        self._drink_ids = np.zeros(0, dtype=np.int64)
+        self._active = np.zeros(0, dtype=bool)
+        self._ingredient_cols: dict[IngredientKey, int] = {}
+        self._user_cols: dict[int, int] = {}
+        self._recipes = np.zeros((0, 0), dtype=np.float32)
+        self._fans = np.zeros((0, 0), dtype=np.float32)
+        self._favorite_counts = np.zeros(0, dtype=np.int64)
+        self._neighbours = np.zeros((0, 0), dtype=np.int64)
+        self._scores = np.zeros((0, 0), dtype=np.float32)
+        self._popular: list[int] | None = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def mark_dirty(self, drink_id: int) -> None:
+        """Zmiana ulubionych drinka — przeliczany przy następnym zapytaniu."""
+        with self._lock:
+            self._dirty.add(drink_id)
+
+    # ---------- budowa ----------
+
+    @staticmethod
+    def _load(db: Session, drink_ids: list[int] | None):
+        """(publiczne drinki, {drink: {składnik: ml}}, {drink: [user]}) — całość albo wybrane ID."""
+        drinks = db.query(models.Drink.id).filter(models.Drink.is_public == True)
+        recipes = db.query(
+            models.DrinkIngredient.drink_id,
+            models.DrinkIngredient.ingredient_type,
+            models.DrinkIngredient.ingredient_id,
+            models.DrinkIngredient.amount_ml,
+        )
+        fans = db.query(models.FavoriteDrink.drink_id, models.FavoriteDrink.user_id)
+        if drink_ids is not None:
+            drinks = drinks.filter(models.Drink.id.in_(drink_ids))
+            recipes = recipes.filter(models.DrinkIngredient.drink_id.in_(drink_ids))
+            fans = fans.filter(models.FavoriteDrink.drink_id.in_(drink_ids))
+
+        public = {drink_id for (drink_id,) in drinks.all()}
+        ingredients: dict[int, dict[IngredientKey, float]] = {}
+        for drink_id, ingredient_type, ingredient_id, amount_ml in recipes.all():
+            if drink_id in public:
+                amounts = ingredients.setdefault(drink_id, {})
+                key = ingredient_key(ingredient_type, ingredient_id)
+                amounts[key] = amounts.get(key, 0.0) + float(amount_ml or 0)
+        users: dict[int, list[int]] = {}
+        for drink_id, user_id in fans.all():
+            if drink_id in public:
+                users.setdefault(drink_id, []).append(user_id)
+        return public, ingredients, users
+
+    def _grow(self, rows: int, ingredient_cols: int, user_cols: int) -> None:
+        """Powiększa macierze (nowe drinki/składniki/użytkownicy) z zapasem 25%."""
+        def capacity(current: int, needed: int) -> int:
+            return current if current >= needed else needed + needed // 4
+
+        row_cap = capacity(self._recipes.shape[0], rows)
+
+        def grown(matrix: np.ndarray, cols: int) -> np.ndarray:
+            shape = (row_cap, capacity(matrix.shape[1], cols))
+            if matrix.shape == shape:
+                return matrix
+            bigger = np.zeros(shape, dtype=matrix.dtype)
+            bigger[:matrix.shape[0], :matrix.shape[1]] = matrix
+            return bigger
+
+        self._recipes = grown(self._recipes, ingredient_cols)
+        self._fans = grown(self._fans, user_cols)
+        extra = row_cap - len(self._drink_ids)
+        if extra > 0:
+            k = max(RECOMMEND_NEIGHBOURS, 1)
+            self._drink_ids = np.concatenate([self._drink_ids, np.full(extra, -1, dtype=np.int64)])
+            self._active = np.concatenate([self._active, np.zeros(extra, dtype=bool)])
+            self._favorite_counts = np.concatenate([self._favorite_counts, np.zeros(extra, dtype=np.int64)])
+            self._neighbours = np.concatenate([
+                self._neighbours.reshape(-1, k), np.full((extra, k), -1, dtype=np.int64)
+            ])
+            self._scores = np.concatenate([
+                self._scores.reshape(-1, k), np.zeros((extra, k), dtype=np.float32)
+            ])
+
+    def _set_vectors(self, drink_id: int, amounts: dict[IngredientKey, float] | None, users: list[int] | None) -> int:
+        row = self._row_of.get(drink_id)
+        if row is None:
+            row = len(self._row_of)
+            self._row_of[drink_id] = row
+        for key in amounts or ():
+            self._ingredient_cols.setdefault(key, len(self._ingredient_cols))
+        for user_id in users or ():
+            self._user_cols.setdefault(user_id, len(self._user_cols))
+        self._grow(len(self._row_of), len(self._ingredient_cols), len(self._user_cols))
+
+        self._drink_ids[row] = drink_id
+        self._active[row] = True
+        self._recipes[row] = 0.0
+        self._fans[row] = 0.0
+        total = sum((amounts or {}).values())
+        for key, amount in (amounts or {}).items():
+            self._recipes[row, self._ingredient_cols[key]] = amount / total if total else 1.0
+        for user_id in users or ():
+            self._fans[row, self._user_cols[user_id]] = 1.0
+        self._favorite_counts[row] = len(users or ())
+        _normalize_rows(self._recipes[row:row + 1])
+        _normalize_rows(self._fans[row:row + 1])
+        return row
+
+    def _drop(self, drink_id: int) -> int | None:
+        row = self._row_of.get(drink_id)
+        if row is not None:
+            self._active[row] = False
+            self._recipes[row] = 0.0
+            self._fans[row] = 0.0
+            self._favorite_counts[row] = 0
+            self._neighbours[row] = -1
+            self._scores[row] = 0.0
+        return row
+
+    def _similarities(self, rows: np.ndarray) -> np.ndarray:
+        """Wiersze macierzy podobieństwa dla `rows` względem wszystkich drinków."""
+        n = len(self._row_of)
+        weight = RECOMMEND_INGREDIENT_WEIGHT
+        sims = weight * (self._recipes[rows] @ self._recipes[:n].T)
+        sims += (1.0 - weight) * (self._fans[rows] @ self._fans[:n].T)
+        sims[:, ~self._active[:n]] = -np.inf
+        sims[np.arange(len(rows)), rows] = -np.inf
+        return sims
+
+    def _compute_neighbours(self, rows: np.ndarray) -> None:
+        k = self._neighbours.shape[1]
+        for start in range(0, len(rows), RECOMMEND_BLOCK):
+            block = rows[start:start + RECOMMEND_BLOCK]
+            sims = self._similarities(block)
+            width = min(k, sims.shape[1])
+            if width == 0:
+                continue
+            # próg = width-ty wynik w wierszu; remisy na progu rozstrzyga niższy numer
+            # wiersza, żeby przyrostowe przeliczenie dawało to samo co pełne
+            threshold = -np.partition(-sims, width - 1, axis=1)[:, width - 1:width]
+            above = sims > threshold
+            ties = sims == threshold
+            room = width - above.sum(axis=1, keepdims=True)
+            chosen = above | (ties & (np.cumsum(ties, axis=1) <= room))
+            top = np.nonzero(chosen)[1].reshape(len(block), width)
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.lexsort((top, -top_scores), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            # tylko drinki z czymkolwiek wspólnym
+            keep = top_scores > 0
+            self._neighbours[block] = -1
+            self._scores[block] = 0.0
+            self._neighbours[block, :width] = np.where(keep, top, -1)
+            self._scores[block, :width] = np.where(keep, top_scores, 0.0)
+
+    def rebuild(self, db: Session) -> None:
+        seq = current_seq(db)
+        public, ingredients, users = self._load(db, None)
+        with self._lock:
+            self._dirty.clear()
+            self._reset()
+            for drink_id in sorted(public):
+                self._set_vectors(drink_id, ingredients.get(drink_id), users.get(drink_id))
+            self._compute_neighbours(np.flatnonzero(self._active[:len(self._row_of)]))
+            self._seq = seq
+            self._built_at = time.monotonic()
+
+    def _refresh(self, db: Session, drink_ids: set[int], seq: int) -> None:
+        """Przelicza tylko zmienione drinki i listy sąsiadów, na które wpływają."""
+        public, ingredients, users = self._load(db, sorted(drink_ids))
+        with self._lock:
+            n_before = len(self._row_of)
+            old_neighbours = self._neighbours[:n_before].copy()
+            old_scores = self._scores[:n_before].copy()
+
+            changed = []
+            for drink_id in drink_ids:
+                if drink_id in public:
+                    changed.append(self._set_vectors(drink_id, ingredients.get(drink_id), users.get(drink_id)))
+                else:
+                    row = self._drop(drink_id)
+                    if row is not None:
+                        changed.append(row)
+            if not changed:
+                self._seq = seq
+                return
+            changed_rows = np.array(sorted(set(changed)), dtype=np.int64)
+            self._compute_neighbours(changed_rows[self._active[changed_rows]])
+
+            # podobieństwo zmienionych drinków do pozostałych (macierz jest symetryczna)
+            n = len(self._row_of)
+            k_th = np.where(old_neighbours[:, -1] >= 0, old_scores[:, -1], np.finfo(np.float32).tiny)
+            affected = np.zeros(n, dtype=bool)
+            for start in range(0, len(changed_rows), RECOMMEND_BLOCK):
+                block = changed_rows[start:start + RECOMMEND_BLOCK]
+                sims = self._similarities(block)[:, :n_before].T
+                # zmieniony drink może wejść do listy sąsiadów (także remisem z ostatnim)...
+                affected[:n_before] |= (sims >= k_th[:, None]).any(axis=1)
+            # ...albo był na niej i jego wynik się zmienił
+            affected[:n_before] |= np.isin(old_neighbours, changed_rows).any(axis=1)
+            affected[changed_rows] = False
+            affected &= self._active[:n]
+            self._compute_neighbours(np.flatnonzero(affected))
+            self._popular = None
+            self._seq = seq
+
+    def _ensure_fresh(self, db: Session) -> None:
+        seq = current_seq(db)
+        with self._lock:
+            built_at, last_seq = self._built_at, self._seq
+            dirty, self._dirty = self._dirty, set()
+        if built_at is None or time.monotonic() - built_at > RECOMMEND_TTL:
+            self.rebuild(db)
+            return
+
+        changed = set(dirty)
+        if seq != last_seq:
+            changed |= {
+                drink_id for (drink_id,) in
+                db.query(models.Drink.id).filter(models.Drink.change_seq > last_seq).all()
+            }
+            changed |= {
+                entity_id for (entity_id,) in
+                db.query(models.SyncTombstone.entity_id)
+                .filter(models.SyncTombstone.entity == "drinks", models.SyncTombstone.change_seq > last_seq)
+                .all()
+            }
+        if not changed:
+            return
+        if len(changed) > max(len(self._row_of) // 4, RECOMMEND_BLOCK):
+            self.rebuild(db)
+        else:
+            self._refresh(db, changed, seq)
+
+    # ---------- zapytania ----------
+
+    def _popular_ids(self) -> list[int]:
+        if self._popular is None:
+            n = len(self._row_of)
+            rows = np.flatnonzero(self._active[:n])
+            # najwięcej ulubionych, przy remisie starsze ID
+            order = np.lexsort((self._drink_ids[rows], -self._favorite_counts[rows]))
+            self._popular = self._drink_ids[rows[order]].tolist()
+        return self._popular
+
+    def recommend(
+        self,
+        db: Session,
+        user_id: int,
+        limit: int = 20,
+        allowed: set[int] | None = None,
+    ) -> list[tuple[int, float]]:
+        """
+        [(ID drinka, wynik)] dla użytkownika: suma podobieństw do jego
+        ulubionych; braki uzupełniane najpopularniejszymi (wynik 0).
+        `allowed` zawęża wynik (np. do drinków możliwych do zrobienia).
+        """
+        self._ensure_fresh(db)
+        favorites = {
+            drink_id for (drink_id,) in
+            db.query(models.FavoriteDrink.drink_id).filter(models.FavoriteDrink.user_id == user_id).all()
+        }
+
+        def wanted(drink_id: int) -> bool:
+            return drink_id not in favorites and (allowed is None or drink_id in allowed)
+
+        with self._lock:
+            rows = [self._row_of[d] for d in favorites if d in self._row_of]
+            ranked: list[tuple[int, float]] = []
+            if rows:
+                neighbours = self._neighbours[rows].ravel()
+                scores = self._scores[rows].ravel()
+                mask = neighbours >= 0
+                candidates, inverse = np.unique(neighbours[mask], return_inverse=True)
+                totals = np.zeros(len(candidates), dtype=np.float64)
+                np.add.at(totals, inverse, scores[mask])
+                for position in np.argsort(-totals, kind="stable"):
+                    drink_id = int(self._drink_ids[candidates[position]])
+                    if wanted(drink_id):
+                        ranked.append((drink_id, round(float(totals[position]), 4)))
+                        if len(ranked) >= limit:
+                            return ranked
+
+            seen = {drink_id for drink_id, _ in ranked}
+            for drink_id in self._popular_ids():
+                if len(ranked) >= limit:
+                    break
+                if drink_id not in seen and wanted(drink_id):
+                    ranked.append((drink_id, 0.0))
+            return ranked
+
+
+drink_recommender = DrinkRecommender()
@@ -0,0 +1,224 @@
+import bisect
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy.orm import Session, joinedload
+
+from .. import models
+
+# Wagi pól: trafienie w nazwie liczy się bardziej niż w składniku czy opisie
+NAME_WEIGHT = 3.0
+INGREDIENT_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.4
+
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "300"))
+
+_TOKEN_RE = re.compile(r"\w+")
+# znaki, których NFKD nie rozkłada na literę bazową
+_TRANSLATE = str.maketrans({"ł": "l", "Ł": "l", "ß": "ss"})
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.translate(_TRANSLATE).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+def _max_distance(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    if len(term) < 8:
+        return 1
+    return 2
+
+
+def _within_distance(a: str, b: str, max_dist: int) -> bool:
+    """Levenshtein z wczesnym przerwaniem, gdy cały wiersz przekroczy max_dist."""
+    if abs(len(a) - len(b)) > max_dist:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > max_dist:
+            return False
+        previous = current
+    return previous[-1] <= max_dist
+
+
+class DrinkSearchIndex:
+    """
+    In-process inverted index over public drinks: token -> {drink_id: weight}.
+    Built lazily from the DB and kept in sync by the drink/ingredient write
+    endpoints; a TTL rebuild picks up writes made by other workers.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[int, float]] = {}
+        self._docs: dict[int, dict[str, float]] = {}
+        self._names: dict[int, str] = {}
+        self._ingredient_names: dict[tuple[str, int], str] = {}
+        self._vocab: list[str] = []
+        self._vocab_dirty = False
+        self._built_at: float | None = None
+
+    # ---------- utrzymanie indeksu ----------
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def rebuild(self, db: Session) -> None:
+        ingredients = db.query(models.Ingredient).all()
+        drinks = (
+            db.query(models.Drink)
+            .options(joinedload(models.Drink.ingredients))
+            .filter(models.Drink.is_public == True)
+            .all()
+        )
+        with self._lock:
+            self._postings = {}
+            self._docs = {}
+            self._names = {}
+            self._ingredient_names = {ing.key: ing.name for ing in ingredients}
+            for drink in drinks:
+                self._add(drink)
+            self._vocab_dirty = True
+            self._built_at = time.monotonic()
+
+    def upsert(self, drink: models.Drink) -> None:
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(drink.id)
+            if not drink.is_public:
+                return
+            for ing in drink.ingredients:
+                if self._ingredient_key(ing) not in self._ingredient_names:
+                    # składnik spoza znanej mapy nazw (np. dodany w innym workerze)
+                    self._built_at = None
+                    return
+            self._add(drink)
+
+    def remove(self, drink_id: int) -> None:
+        with self._lock:
+            self._remove(drink_id)
+
+    def _ensure_fresh(self, db: Session) -> None:
+        with self._lock:
+            built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > SEARCH_INDEX_TTL:
+            self.rebuild(db)
+
+    @staticmethod
+    def _ingredient_key(ing: models.DrinkIngredient) -> tuple[str, int]:
+        type_value = ing.ingredient_type.value if hasattr(ing.ingredient_type, "value") else ing.ingredient_type
+        return type_value, ing.ingredient_id
+
+    def _add(self, drink: models.Drink) -> None:
+        weights: dict[str, float] = {}
+
+        def put(text: str | None, weight: float) -> None:
+            for token in tokenize(text):
+                if weights.get(token, 0.0) < weight:
+                    weights[token] = weight
+
+        put(drink.description, DESCRIPTION_WEIGHT)
+        for ing in drink.ingredients:
+            put(self._ingredient_names.get(self._ingredient_key(ing)), INGREDIENT_WEIGHT)
+        put(drink.name, NAME_WEIGHT)
+
+        self._docs[drink.id] = weights
+        self._names[drink.id] = drink.name or ""
+        for token, weight in weights.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                self._vocab_dirty = True
+            self._postings[token][drink.id] = weight
+
+    def _remove(self, drink_id: int) -> None:
+        weights = self._docs.pop(drink_id, None)
+        self._names.pop(drink_id, None)
+        if not weights:
+            return
+        for token in weights:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(drink_id, None)
+            if not posting:
+                del self._postings[token]
+                self._vocab_dirty = True
+
+    # ---------- wyszukiwanie ----------
+
+    def _candidates(self, term: str) -> dict[str, float]:
+        """Tokeny słownika pasujące do termu -> jakość dopasowania."""
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+
+        matches: dict[str, float] = {}
+        if term in self._postings:
+            matches[term] = EXACT_MATCH
+
+        start = bisect.bisect_left(self._vocab, term)
+        for token in self._vocab[start:]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, PREFIX_MATCH)
+
+        max_dist = _max_distance(term)
+        if max_dist:
+            for token in self._vocab:
+                if token not in matches and _within_distance(term, token, max_dist):
+                    matches[token] = FUZZY_MATCH
+        return matches
+
+    def search(self, db: Session, query: str, limit: int = 20) -> list[int]:
+        """Zwraca ID drinków posortowane wg trafności; każdy term musi coś dopasować."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        self._ensure_fresh(db)
+
+        with self._lock:
+            scores: dict[int, float] | None = None
+            for term in terms:
+                term_scores: dict[int, float] = {}
+                for token, quality in self._candidates(term).items():
+                    for drink_id, weight in self._postings[token].items():
+                        score = weight * quality
+                        if term_scores.get(drink_id, 0.0) < score:
+                            term_scores[drink_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        drink_id: score + term_scores[drink_id]
+                        for drink_id, score in scores.items()
+                        if drink_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], self._names.get(item[0], "")))
+            return [drink_id for drink_id, _ in ranked[:limit]]
+
+
+drink_index = DrinkSearchIndex()
@@ -0,0 +1,81 @@
+import hashlib
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# maszyna, do której należą sloty sprzed wprowadzenia rejestru maszyn
+DEFAULT_MACHINE_ID = 1
+
+
+def load_slot_states(
+    db: Session,
+    machine_ids: list[int] | None = None,
+) -> dict[int, tuple[dict[tuple[str, int], int], str]]:
+    """
+    Zwraca {machine_id: (mapa składnik -> slot, wersja konfiguracji maszyny)}
+    dla podanych maszyn (None = wszystkie) — dwoma zapytaniami niezależnie od
+    liczby maszyn. Maszyny bez slotów dostają pustą mapę.
+
+    Mapa: (ingredient_type, ingredient_id) -> slot_number dla aktywnych slotów.
+    Alkohol: sloty 1–6; mixer: najpierw filler 7–10, potem slot 1–6.
+    Przy kilku slotach z tym samym składnikiem wygrywa najniższy numer.
+    Wersja to skrót zawartości obu tabel slotów — zmienia się przy każdej
+    zmianie przypisań, niezależnie od tego, który worker ją zapisał. Maszyny
+    o identycznej konfiguracji mają tę samą wersję (i te same ramki).
+    """
+    slot_maps: dict[int, dict[tuple[str, int], int]] = defaultdict(dict)
+    digests = defaultdict(hashlib.sha1)
+
+    fillers = db.query(models.MachineFiller)
+    slots = db.query(models.MachineSlot)
+    if machine_ids is not None:
+        fillers = fillers.filter(models.MachineFiller.machine_id.in_(machine_ids))
+        slots = slots.filter(models.MachineSlot.machine_id.in_(machine_ids))
+
+    for filler in fillers.order_by(models.MachineFiller.slot_number).all():
+        digests[filler.machine_id].update(
+            f"F{filler.slot_number}:{filler.mixer_id}:{bool(filler.active)};".encode()
+        )
+        if filler.active and filler.mixer_id is not None:
+            slot_maps[filler.machine_id].setdefault(("mixer", filler.mixer_id), filler.slot_number)
+
+    for slot in slots.order_by(models.MachineSlot.slot_number).all():
+        type_value = slot.ingredient_type.value if hasattr(slot.ingredient_type, "value") else slot.ingredient_type
+        digests[slot.machine_id].update(
+            f"S{slot.slot_number}:{type_value}:{slot.ingredient_id}:{bool(slot.active)};".encode()
+        )
+        if slot.active:
+            slot_maps[slot.machine_id].setdefault((type_value, slot.ingredient_id), slot.slot_number)
+
+    ids = machine_ids if machine_ids is not None else set(slot_maps) | set(digests)
+    return {
+        machine_id: (dict(slot_maps.get(machine_id, {})), digests[machine_id].hexdigest()[:16])
+        for machine_id in ids
+    }
+
+
+def load_slot_state(
+    db: Session,
+    machine_id: int = DEFAULT_MACHINE_ID,
+) -> tuple[dict[tuple[str, int], int], str]:
+    """Mapa slotów i wersja konfiguracji jednej maszyny (patrz load_slot_states)."""
+    return load_slot_states(db, [machine_id])[machine_id]
+
+
+def load_slot_map(db: Session, machine_id: int = DEFAULT_MACHINE_ID) -> dict[tuple[str, int], int]:
+    return load_slot_state(db, machine_id)[0]
+
+
+def missing_ingredients(
+    requirements: Iterable[tuple[str, int]],
+    slot_map: dict[tuple[str, int], int],
+) -> list[tuple[str, int]]:
+    """
+    Składniki przepisu (typ, id), których maszyna nie ma w aktywnym slocie —
+    bez powtórzeń, w kolejności przepisu. Pusta lista = maszyna zrobi drinka
+    w całości. Tę samą regułę stosują /drinks/available i wybór maszyny do nalania.
+    """
+    return list(dict.fromkeys(key for key in requirements if key not in slot_map))
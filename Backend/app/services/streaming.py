@@ -0,0 +1,68 @@
+import json
+import os
+from typing import Callable, Iterator, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Query, Session, noload, selectinload
+
+from .. import models
+from ..database import SessionLocal
+from .drink_payload import render_drinks
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "200"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(accept: str) -> bool:
+    return NDJSON_MEDIA_TYPE in (accept or "")
+
+
+def _batches(query: Query) -> Iterator[list[models.Drink]]:
+    # yield_per -> kursor po stronie serwera (PostgreSQL) / leniwe pobieranie (SQLite);
+    # identity map trzyma obiekty słabo, więc przetworzone partie są zwalniane
+    batch = []
+    for drink in query.yield_per(STREAM_BATCH_SIZE):
+        batch.append(drink)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_drinks(
+    build_query: Callable[[Session], Query],
+    expand: set[str],
+    fields: Optional[set[str]],
+    ndjson: bool,
+) -> StreamingResponse:
+    """
+    Strumieniuje listę drinków partiami po STREAM_BATCH_SIZE: jako NDJSON
+    (jeden drink w linii) albo jako tablicę JSON wysyłaną kawałkami.
+    build_query dostaje własną sesję generatora — sesja z get_db jest
+    zamykana, zanim odpowiedź zacznie być wysyłana.
+    """
+    with_ingredients = fields is None or "ingredients" in fields
+
+    def chunks() -> Iterator[bytes]:
+        with SessionLocal() as db:
+            query = build_query(db).options(
+                selectinload(models.Drink.ingredients) if with_ingredients else noload(models.Drink.ingredients)
+            )
+            first = True
+            if not ndjson:
+                yield b"["
+            for batch in _batches(query):
+                items = [
+                    json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+                    for item in render_drinks(db, batch, expand, fields)
+                ]
+                if ndjson:
+                    yield ("\n".join(items) + "\n").encode("utf-8")
+                else:
+                    yield (("" if first else ",") + ",".join(items)).encode("utf-8")
+                first = False
+            if not ndjson:
+                yield b"]"
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json")
@@ -0,0 +1,248 @@
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# odsetek requestów śledzonych (0 = wyłączone, 1 = wszystkie)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# ile ostatnich śladów trzyma bufor w pamięci (per worker) dla /traces
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# dodatkowo zapis do pliku JSONL z rotacją; pusty = tylko bufor w pamięci
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "3"))
+# zabezpieczenie przed śladami z tysiącami zapytań (np. strumieniowane listy)
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+SQL_STATEMENT_CHARS = 300
+
+
+class Trace:
+    def __init__(self, name: str) -> None:
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.spans: list[dict] = []
+        self.dropped = 0
+        self.attrs: dict = {}
+        self._lock = threading.Lock()
+
+    def add(self, span: dict) -> None:
+        # spany przychodzą też z wątków threadpoola (zależności, generatory odpowiedzi)
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def to_dict(self, duration: float) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 2),
+            **self.attrs,
+            "spans": spans,
+            "dropped_spans": self.dropped,
+        }
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[str | None] = ContextVar("current_span", default=None)
+
+
+def _add_span(
+    trace: Trace,
+    name: str,
+    start: float,
+    end: float,
+    parent: str | None,
+    attrs: dict,
+    span_id: str | None = None,
+) -> None:
+    trace.add({
+        "span_id": span_id or uuid.uuid4().hex[:8],
+        "parent_id": parent,
+        "name": name,
+        "start_ms": round((start - trace.start) * 1000, 2),
+        "duration_ms": round((end - start) * 1000, 2),
+        **({"attrs": attrs} if attrs else {}),
+    })
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Span wokół bloku kodu; poza śledzonym requestem nic nie robi."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = uuid.uuid4().hex[:8]
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as exc:
+        attrs["error"] = f"{type(exc).__name__}: {exc}"[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        _add_span(trace, name, start, time.perf_counter(), parent, attrs, span_id)
+
+
+def record_span(name: str, duration: float, **attrs) -> None:
+    """Span kończący się teraz, gdy znany jest tylko czas trwania (np. oczekiwanie w pętli)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    end = time.perf_counter()
+    _add_span(trace, name, end - max(duration, 0.0), end, _current_span.get(), attrs)
+
+
+def traced(name: str):
+    """Dekorator: cała funkcja jako jeden span."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceStore:
+    """
+    Ring buffer of finished traces (per worker) plus an optional rotating
+    JSON-lines file shared by all workers.
+    """
+
+    def __init__(self, size: int = TRACE_BUFFER_SIZE, path: str = TRACE_FILE) -> None:
+        self._lock = threading.Lock()
+        self._traces: deque[dict] = deque(maxlen=size)
+        self._logger = None
+        if path:
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=TRACE_FILE_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger("drinkmachine.traces")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def export(self, trace: dict) -> None:
+        with self._lock:
+            self._traces.append(trace)
+        if self._logger is not None:
+            self._logger.info(json.dumps(trace, ensure_ascii=False, separators=(",", ":")))
+
+    def recent(self, limit: int = 50, min_ms: float = 0.0, path: str | None = None) -> list[dict]:
+        """Najnowsze ślady (bez spanów), od najnowszego."""
+        with self._lock:
+            traces = list(self._traces)
+        result = []
+        for trace in reversed(traces):
+            if trace["duration_ms"] < min_ms or (path and path not in trace["name"]):
+                continue
+            result.append({k: v for k, v in trace.items() if k != "spans"} | {"span_count": len(trace["spans"])})
+            if len(result) >= limit:
+                break
+        return result
+
+    def get(self, trace_id: str) -> dict | None:
+        with self._lock:
+            return next((t for t in self._traces if t["trace_id"] == trace_id), None)
+
+
+trace_store = TraceStore()
+
+
+class TracingMiddleware:
+    """
+    Czysty middleware ASGI: losuje requesty do śledzenia (TRACE_SAMPLE_RATE),
+    otwiera ślad ze spanem głównym obejmującym całą odpowiedź (także
+    strumieniowaną) i oddaje go do trace_store. Śledzone odpowiedzi
+    dostają nagłówek X-Trace-Id.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            route = scope.get("route")
+            if route is not None and getattr(route, "path", None):
+                trace.name = f"{scope['method']} {route.path}"
+            trace.attrs.update({"path": scope["path"], "status": status_code})
+            trace_store.export(trace.to_dict(time.perf_counter() - trace.start))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_trace.get() is not None:
+        conn.info.setdefault("trace_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    starts = conn.info.get("trace_query_start")
+    if trace is None or not starts:
+        return
+    start = starts.pop()
+    attrs = {"statement": " ".join(statement.split())[:SQL_STATEMENT_CHARS]}
+    if executemany:
+        attrs["executemany"] = True
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        attrs["rows"] = cursor.rowcount
+    _add_span(trace, "sql", start, time.perf_counter(), _current_span.get(), attrs)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    starts = conn.info.get("trace_query_start") if conn is not None else None
+    if starts:
+        starts.pop()
+
+
+def install_sql(engine: Engine) -> None:
+    """Span na każde zapytanie SQL wykonane w śledzonym requeście."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
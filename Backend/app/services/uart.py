@@ -1,17 +1,51 @@
 import os
 import time
+from typing import NamedTuple
+
 import serial
 from serial import SerialException
 
+from .frame_codec import frame_crc, parse_ack
+from .machine_lock import get_machine_lock
+from .tracing import record_span, span, traced
+
+
+class UartTiming(NamedTuple):
+    """Seconds from the end of the write to each ESP confirmation."""
+    received_after: float
+    done_after: float | None
+    lock_waited: float = 0.0
+
+
+class UartError(RuntimeError):
+    """
+    Failed exchange with the ESP. `timing` is set when the ESP had already
+    acknowledged the frame (`received`) but never reported `done`.
+    """
+
+    def __init__(self, message: str, timing: UartTiming | None = None) -> None:
+        super().__init__(message)
+        self.timing = timing
+
 
-def _wait_for_confirmations(ser: serial.Serial, deadline: float) -> None:
+def _wait_for_confirmations(
+    ser: serial.Serial,
+    received_deadline: float,
+    done_timeout: float,
+    expected_crc: int | None = None,
+) -> UartTiming:
     """
     Wait for ESP confirmations in order:
-    1) received
-    2) done
+    1) received (before received_deadline)
+    2) done (within done_timeout seconds after received)
+    Protocol v2 acks carry the frame CRC: acks for another frame are
+    skipped and a NAK (corrupted frame) fails immediately.
     Any other UART lines are ignored as debug logs.
     """
+    started = time.monotonic()
     got_received = False
+    received_at = 0.0
+    deadline = received_deadline
     recent_lines: list[str] = []
 
     while time.monotonic() < deadline:
@@ -27,43 +61,88 @@ def _wait_for_confirmations(ser: serial.Serial, deadline: float) -> None:
         if len(recent_lines) > 10:
             recent_lines.pop(0)
 
-        low = line.lower()
+        ack = parse_ack(line)
+        if ack is None or (expected_crc is not None and ack.crc is not None and ack.crc != expected_crc):
+            continue
+        if ack.kind == "nak":
+            raise UartError(
+                f"ESP32 rejected the frame ({ack.detail or 'bad CRC/length'}). "
+                f"Last UART lines: {recent_lines}",
+                UartTiming(received_at - started, None) if got_received else None,
+            )
         if not got_received:
-            if low == "received":
+            if ack.kind == "received":
                 got_received = True
+                received_at = time.monotonic()
+                deadline = received_at + done_timeout
+                record_span("uart.wait_received", received_at - started)
             continue
 
-        if low == "done":
-            return
+        if ack.kind == "done":
+            done_at = time.monotonic()
+            record_span("uart.pour", done_at - received_at)
+            return UartTiming(received_at - started, done_at - started)
 
     if not got_received:
-        raise RuntimeError(
+        raise UartError(
             "Did not receive 'received' confirmation from ESP32. "
             f"Last UART lines: {recent_lines}"
         )
 
-    raise RuntimeError(
-        "Did not receive 'done' confirmation from ESP32 after 'received'. "
-        f"Last UART lines: {recent_lines}"
+    raise UartError(
+        f"Did not receive 'done' confirmation from ESP32 within {done_timeout:.0f}s after 'received'. "
+        f"Last UART lines: {recent_lines}",
+        UartTiming(received_at - started, None),
     )
 
 
-def send_frame(frame: bytes) -> None:
-    port = os.getenv("UART_PORT")
+@traced("uart.send_frame")
+def send_frame(
+    frame: bytes,
+    done_timeout: float | None = None,
+    holder: str = "",
+    port: str | None = None,
+    baudrate: int | None = None,
+) -> UartTiming:
+    """
+    Send a frame and block until the ESP reports `done`.
+    done_timeout: per-frame deadline for `done` (seconds after `received`);
+    falls back to UART_DONE_TIMEOUT when the caller has no estimate.
+    port/baudrate select the machine; default to UART_PORT / UART_BAUD.
+    The port is guarded by a cross-process FIFO lock (MachineBusyError when
+    it cannot be taken within UART_LOCK_TIMEOUT); holder labels the caller.
+    """
+    port = port or os.getenv("UART_PORT")
     if not port:
         raise RuntimeError("UART_PORT is not set")
 
-    baudrate = int(os.getenv("UART_BAUD", "115200"))
+    baudrate = baudrate or int(os.getenv("UART_BAUD", "115200"))
     timeout = float(os.getenv("UART_TIMEOUT", "1"))
-    done_timeout = float(os.getenv("UART_DONE_TIMEOUT", "60"))
+    response_timeout = float(os.getenv("UART_RESPONSE_TIMEOUT", "10"))
+    if done_timeout is None:
+        done_timeout = float(os.getenv("UART_DONE_TIMEOUT", "60"))
 
-    try:
-        with serial.Serial(port=port, baudrate=baudrate, timeout=timeout) as ser:
-            ser.write(frame)
-            ser.flush()
+    with get_machine_lock(port).acquire(label=holder) as waited:
+        record_span("uart.lock_wait", waited, port=port)
+        try:
+            with span("uart.open", port=port, baudrate=baudrate):
+                ser = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
+            with ser:
+                with span("uart.write", bytes=len(frame)):
+                    ser.write(frame)
+                    ser.flush()
 
-            deadline = time.monotonic() + done_timeout
-            _wait_for_confirmations(ser, deadline=deadline)
+                timing = _wait_for_confirmations(
+                    ser,
+                    received_deadline=time.monotonic() + response_timeout,
+                    done_timeout=done_timeout,
+                    expected_crc=frame_crc(frame),
+                )
+                return timing._replace(lock_waited=waited)
 
-    except SerialException as exc:
-        raise RuntimeError(f"UART error: {exc}") from exc
+        except UartError as exc:
+            if exc.timing is not None:
+                exc.timing = exc.timing._replace(lock_waited=waited)
+            raise
+        except SerialException as exc:
+            raise UartError(f"UART error: {exc}") from exc
@@ -0,0 +1,264 @@
+import asyncio
+import os
+import re
+import shutil
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from .. import models, schemas
+from ..database import SessionLocal
+from .rate_limit import release_slot
+
+# po tylu sekundach od połączenia WiFi jest rozłączane (dostęp tymczasowy)
+WIFI_DISCONNECT_AFTER = int(os.getenv("WIFI_DISCONNECT_AFTER", str(60 * 60 * 12)))
+# limit czasu jednego wywołania `nmcli dev wifi connect`
+WIFI_CONNECT_TIMEOUT = float(os.getenv("WIFI_CONNECT_TIMEOUT", "45"))
+WIFI_SCAN_TIMEOUT = float(os.getenv("WIFI_SCAN_TIMEOUT", "15"))
+# jak często (s) każdy worker sprawdza wspólny termin rozłączenia
+WIFI_SCHEDULE_POLL = float(os.getenv("WIFI_SCHEDULE_POLL", "30"))
+# zadanie dłuższe niż skan + dwie próby połączenia przerwał restart workera
+WIFI_JOB_STALE = WIFI_SCAN_TIMEOUT + 2 * WIFI_CONNECT_TIMEOUT + 60
+
+FINISHED = (models.WifiJobStatus.connected, models.WifiJobStatus.failed)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value: datetime | None) -> datetime | None:
+    """Data z bazy jako UTC ze strefą (SQLite oddaje daty bez strefy, zapisujemy zawsze UTC)."""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def parse_nmcli_networks(stdout: str) -> list[schemas.WifiNetwork]:
+    """Wyjście `nmcli -t -f SSID,SIGNAL,SECURITY,BSSID,FREQ dev wifi` -> lista sieci."""
+    networks: list[schemas.WifiNetwork] = []
+    for line in stdout.splitlines():
+        if not line.strip():
+            continue
+        parts = re.split(r"(?<!\\):", line)
+        if len(parts) < 5:
+            continue
+        ssid, signal, security, bssid, freq = parts[:5]
+        ssid = ssid.replace("\\:", ":").replace("\\\\", "\\")
+        networks.append(
+            schemas.WifiNetwork(
+                ssid=ssid,
+                signal=int(signal) if signal.isdigit() else None,
+                security=security or None,
+                bssid=bssid or None,
+                frequency=int(freq) if freq.isdigit() else None,
+            )
+        )
+    return networks
+
+
+def choose_key_mgmt(security: str | None) -> str | None:
+    if not security:
+        return None
+    sec = security.upper()
+    if "SAE" in sec or "WPA3" in sec:
+        return "sae"
+    if "WPA" in sec:
+        return "wpa-psk"
+    return None
+
+
+def connect_supported() -> bool:
+    return os.name == "posix" and shutil.which("nmcli") is not None
+
+
+async def _nmcli(args: list[str], timeout: float) -> tuple[int, str, str]:
+    """nmcli bez blokowania pętli zdarzeń; po przekroczeniu czasu proces jest zabijany."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "nmcli", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        return 127, "", "nmcli not found"
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -1, "", f"nmcli timed out after {timeout:.0f} s"
+    return (
+        proc.returncode,
+        stdout.decode("utf-8", errors="ignore"),
+        stderr.decode("utf-8", errors="ignore"),
+    )
+
+
+async def _disconnect() -> None:
+    code, stdout, _ = await _nmcli(["-t", "-f", "DEVICE,TYPE,STATE", "device"], WIFI_SCAN_TIMEOUT)
+    if code != 0:
+        return
+    for line in stdout.splitlines():
+        parts = line.split(":")
+        if len(parts) >= 3 and parts[1] == "wifi":
+            await _nmcli(["device", "disconnect", parts[0]], WIFI_CONNECT_TIMEOUT)
+            return
+
+
+def job_out(job: models.WifiJob, schedule: models.WifiSchedule | None = None) -> schemas.WifiJobOut:
+    expires_in = None
+    if job.status == models.WifiJobStatus.connected and schedule is not None and schedule.ssid == job.ssid:
+        disconnect_at = as_utc(schedule.disconnect_at)
+        if disconnect_at is not None:
+            expires_in = max(0, int((disconnect_at - _utcnow()).total_seconds()))
+    return schemas.WifiJobOut(
+        id=job.id,
+        ssid=job.ssid,
+        status=job.status.value,
+        error=job.error,
+        created_at=as_utc(job.created_at),
+        finished_at=as_utc(job.finished_at),
+        expires_in_seconds=expires_in,
+    )
+
+
+def create_job(ssid: str, user_id: int | None) -> models.WifiJob:
+    with SessionLocal() as db:
+        job = models.WifiJob(ssid=ssid, user_id=user_id, status=models.WifiJobStatus.pending, created_at=_utcnow())
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        db.expunge(job)
+        return job
+
+
+def _set_status(job_id: int, status: models.WifiJobStatus, error: str | None = None) -> None:
+    with SessionLocal() as db:
+        values = {"status": status, "error": error}
+        if status in FINISHED:
+            values["finished_at"] = _utcnow()
+        db.execute(update(models.WifiJob).where(models.WifiJob.id == job_id).values(**values))
+        if status == models.WifiJobStatus.connected:
+            ssid = db.get(models.WifiJob, job_id).ssid
+            # nowe połączenie zastępuje poprzedni termin rozłączenia
+            db.execute(
+                update(models.WifiSchedule)
+                .where(models.WifiSchedule.id == 1)
+                .values(ssid=ssid, disconnect_at=_utcnow() + timedelta(seconds=WIFI_DISCONNECT_AFTER))
+            )
+        db.commit()
+
+
+def _claim_due() -> bool:
+    """
+    Zabiera termin rozłączenia, jeśli minął. UPDATE ... WHERE disconnect_at <= now
+    jest atomowy, więc przy wielu workerach rozłącza dokładnie jeden.
+    Przy okazji zamyka zadania osierocone przez restart workera.
+    """
+    now = _utcnow()
+    with SessionLocal() as db:
+        claimed = db.execute(
+            update(models.WifiSchedule)
+            .where(models.WifiSchedule.id == 1, models.WifiSchedule.disconnect_at <= now)
+            .values(ssid=None, disconnect_at=None)
+        ).rowcount
+        db.execute(
+            update(models.WifiJob)
+            .where(
+                models.WifiJob.status.in_([models.WifiJobStatus.pending, models.WifiJobStatus.running]),
+                models.WifiJob.created_at < now - timedelta(seconds=WIFI_JOB_STALE),
+            )
+            .values(status=models.WifiJobStatus.failed, error="Interrupted (worker restarted)", finished_at=now)
+        )
+        db.commit()
+    return claimed == 1
+
+
+def _seconds_until_due() -> float | None:
+    with SessionLocal() as db:
+        schedule = db.get(models.WifiSchedule, 1)
+        disconnect_at = as_utc(schedule.disconnect_at) if schedule is not None else None
+    if disconnect_at is None:
+        return None
+    return (disconnect_at - _utcnow()).total_seconds()
+
+
+class WifiJobRunner:
+    """
+    Łączenie z WiFi jako zadania asyncio (nmcli przez create_subprocess_exec) —
+    request dostaje od razu id zadania, stan jest w tabeli wifi_jobs, więc
+    odpyta go dowolny worker. Termin rozłączenia leży w wifi_schedule;
+    każdy worker co WIFI_SCHEDULE_POLL s próbuje go zabrać, rozłącza ten,
+    któremu się uda — także po restarcie.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: set[asyncio.Task] = set()
+        self._watcher: asyncio.Task | None = None
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        # pętla trzyma tylko słabe referencje do zadań
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def submit(self, job_id: int, ssid: str, password: str | None, slot_token: str | None) -> None:
+        self._spawn(self._run(job_id, ssid, password, slot_token))
+
+    async def _connect(self, ssid: str, password: str | None) -> tuple[int, str]:
+        code, stdout, _ = await _nmcli(
+            ["-t", "-f", "SSID,SIGNAL,SECURITY,BSSID,FREQ", "dev", "wifi"], WIFI_SCAN_TIMEOUT
+        )
+        security = None
+        if code == 0:
+            security = next((n.security for n in parse_nmcli_networks(stdout) if n.ssid == ssid), None)
+
+        args = ["dev", "wifi", "connect", ssid]
+        if password:
+            args += ["password", password]
+        key_mgmt = choose_key_mgmt(security)
+        code, _, stderr = await _nmcli(args + (["wifi-sec.key-mgmt", key_mgmt] if key_mgmt else []), WIFI_CONNECT_TIMEOUT)
+        if code != 0 and key_mgmt:
+            # ponowna próba bez wymuszania key-mgmt — NetworkManager sam dobierze
+            code, _, stderr = await _nmcli(args, WIFI_CONNECT_TIMEOUT)
+        return code, stderr.strip()
+
+    async def _run(self, job_id: int, ssid: str, password: str | None, slot_token: str | None) -> None:
+        try:
+            await asyncio.to_thread(_set_status, job_id, models.WifiJobStatus.running)
+            code, error = await self._connect(ssid, password)
+            if code == 0:
+                await asyncio.to_thread(_set_status, job_id, models.WifiJobStatus.connected)
+            else:
+                await asyncio.to_thread(
+                    _set_status, job_id, models.WifiJobStatus.failed, error or "WiFi connection failed"
+                )
+        except Exception as exc:
+            await asyncio.to_thread(_set_status, job_id, models.WifiJobStatus.failed, f"{type(exc).__name__}: {exc}")
+        finally:
+            await asyncio.to_thread(release_slot, "wifi", slot_token)
+
+    async def _watch_schedule(self) -> None:
+        while True:
+            try:
+                if await asyncio.to_thread(_claim_due):
+                    await _disconnect()
+                remaining = await asyncio.to_thread(_seconds_until_due)
+            except Exception:
+                remaining = None
+            delay = WIFI_SCHEDULE_POLL if remaining is None else min(WIFI_SCHEDULE_POLL, max(remaining, 0.5))
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.get_running_loop().create_task(self._watch_schedule())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+wifi_jobs = WifiJobRunner()
@@ -0,0 +1,166 @@
+"""
+Benchmark bazy dla typowego obciążenia jednej maszyny.
+
+    python benchmarks/bench_db.py                                 # SQLite (WAL) w pliku tymczasowym
+    python benchmarks/bench_db.py --url postgresql://u:p@host/bench_db
+
+Skrypt zakłada tabele i wypełnia bazę syntetycznym katalogiem — używaj
+osobnej, pustej bazy, nie produkcyjnej.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="SQLAlchemy URL (domyślnie nowy plik SQLite)")
+    parser.add_argument("--drinks", type=int, default=500)
+    parser.add_argument("--reps", type=int, default=50)
+    parser.add_argument("--pours", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0, help="czas testu współbieżnego")
+    return parser.parse_args()
+
+
+args = parse_args()
+if args.url:
+    os.environ["DATABASE_URL"] = args.url
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.routers.drink_frame import _drink_segments, _encode_frame  # noqa: E402
+from app.services.pour_history import record_pour  # noqa: E402
+from app.services.slots import load_slot_state  # noqa: E402
+from app.services.uart import UartTiming  # noqa: E402
+
+
+def seed(n_drinks: int) -> list[int]:
+    rng = random.Random(42)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username=f"bench-{time.time_ns()}", password_hash="x")
+    db.add(user)
+    alcohols = [models.Alcohol(name=f"Alcohol {i}", abv=rng.choice([37.5, 40, 45])) for i in range(30)]
+    mixers = [models.Mixer(name=f"Mixer {i}") for i in range(30)]
+    db.add_all(alcohols + mixers)
+    db.flush()
+    for i in range(n_drinks):
+        drink = models.Drink(name=f"Drink {i}", description="Lorem ipsum " * 10, author_id=user.id, is_public=True)
+        for order, _ in enumerate(range(rng.randint(2, 4))):
+            if rng.random() < 0.5:
+                drink.ingredients.append(models.DrinkIngredient(
+                    ingredient_type="alcohol", ingredient_id=rng.choice(alcohols).id,
+                    amount_ml=rng.choice([20, 40, 50]), order_index=order))
+            else:
+                drink.ingredients.append(models.DrinkIngredient(
+                    ingredient_type="mixer", ingredient_id=rng.choice(mixers).id,
+                    amount_ml=rng.choice([50, 100, 150]), order_index=order))
+        db.add(drink)
+    if not db.query(models.MachineSlot).count():
+        for n in range(1, 7):
+            db.add(models.MachineSlot(slot_number=n, ingredient_type="alcohol", ingredient_id=alcohols[n].id, active=True))
+        for n in range(7, 11):
+            db.add(models.MachineFiller(slot_number=n, mixer_id=mixers[n].id, active=True))
+    db.commit()
+    ids = [d for (d,) in db.query(models.Drink.id).filter(models.Drink.author_id == user.id)]
+    db.close()
+    return ids
+
+
+def timed(label: str, reps: int, fn) -> None:
+    samples = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<38} {statistics.mean(samples):>9.2f} ms avg {p95:>9.2f} ms p95")
+
+
+def main() -> None:
+    print(f"backend: {engine.dialect.name}, drinks: {args.drinks}")
+    drink_ids = seed(args.drinks)
+    rng = random.Random(7)
+
+    def list_catalog():
+        with SessionLocal() as db:
+            db.query(models.Drink).options(joinedload(models.Drink.ingredients)) \
+                .filter(models.Drink.is_public == True).all()
+
+    def get_one():
+        with SessionLocal() as db:
+            db.query(models.Drink).options(joinedload(models.Drink.ingredients)) \
+                .filter(models.Drink.id == rng.choice(drink_ids)).first()
+
+    def build_frame():
+        with SessionLocal() as db:
+            slot_map, _ = load_slot_state(db)
+            drink = db.query(models.Drink).options(joinedload(models.Drink.ingredients)) \
+                .filter(models.Drink.id == rng.choice(drink_ids)).first()
+            _encode_frame(_drink_segments(drink, slot_map))
+
+    def pour():
+        with SessionLocal() as db:
+            record_pour(db, drink_id=rng.choice(drink_ids), user_id=None, frame=[1, 50, 255, 255],
+                        started_at=datetime.now(timezone.utc), outcome=models.PourOutcome.done,
+                        timing=UartTiming(0.01, 30.0))
+
+    timed("full catalog (joinedload)", args.reps, list_catalog)
+    timed("single drink", args.reps * 10, get_one)
+    timed("slot state + frame build", args.reps * 10, build_frame)
+    timed("pour record + rollups (commit)", args.pours, pour)
+
+    # Czytelnicy + jeden pisarz równolegle (jak kiosk i telefony podczas nalewania)
+    stop = time.monotonic() + args.seconds
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        while time.monotonic() < stop:
+            try:
+                get_one()
+                key = "reads"
+            except Exception:
+                key = "errors"
+            with lock:
+                counts[key] += 1
+
+    def writer():
+        while time.monotonic() < stop:
+            try:
+                pour()
+                key = "writes"
+            except Exception:
+                key = "errors"
+            with lock:
+                counts[key] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.threads)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(
+        f"{args.threads} readers + 1 writer for {args.seconds:.0f}s: "
+        f"{counts['reads'] / args.seconds:.0f} reads/s, {counts['writes'] / args.seconds:.0f} writes/s, "
+        f"{counts['errors']} errors"
+    )
+
+
+if __name__ == "__main__":
+    main()
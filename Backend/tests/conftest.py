@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import Base
+from app.services import drink_stats, ingredients as ingredient_refs
+
+
+@pytest.fixture
+def db():
+    """Sesja na bazie SQLite w pamięci z hookami jak w main.py (bez change_tracking)."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    ingredient_refs.install(factory)
+    drink_stats.install(factory)
+    session = factory()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def add_drink(db, name: str, recipe: list[tuple[str, int, int]], *, is_public: bool = True,
+              description: str | None = None) -> models.Drink:
+    """recipe: [(ingredient_type, ingredient_id, amount_ml)] w kolejności nalewania."""
+    drink = models.Drink(name=name, description=description, is_public=is_public)
+    drink.ingredients = [
+        models.DrinkIngredient(ingredient_type=kind, ingredient_id=ingredient_id, amount_ml=ml, order_index=i)
+        for i, (kind, ingredient_id, ml) in enumerate(recipe)
+    ]
+    db.add(drink)
+    db.commit()
+    return drink
+
+
+@pytest.fixture
+def catalog(db):
+    """Rum, gin, cola, mięta: trzy publiczne drinki i jeden prywatny."""
+    rum = models.Alcohol(name="Rum", abv=40)
+    gin = models.Alcohol(name="Gin", abv=37.5)
+    cola = models.Mixer(name="Cola", type=models.MixerType.soda)
+    mint = models.Mixer(name="Syrop miętowy", type=models.MixerType.syrup)
+    db.add_all([rum, gin, cola, mint])
+    db.commit()
+    drinks = {
+        "cuba": add_drink(db, "Cuba Libre", [("alcohol", rum.id, 50), ("mixer", cola.id, 150)],
+                          description="Klasyk z limonką"),
+        "mojito": add_drink(db, "Mojito", [("alcohol", rum.id, 40), ("mixer", mint.id, 20), ("mixer", cola.id, 100)]),
+        "gin_cola": add_drink(db, "Gin z colą", [("alcohol", gin.id, 40), ("mixer", cola.id, 120)]),
+        "private": add_drink(db, "Mojito babci", [("alcohol", rum.id, 60)], is_public=False),
+    }
+    return {"rum": rum, "gin": gin, "cola": cola, "mint": mint, **drinks}
@@ -0,0 +1,68 @@
+import pytest
+
+from app import models
+from app.services.catalog_snapshot import CatalogSnapshotStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CatalogSnapshotStore(str(tmp_path / "catalog.snap"))
+
+
+def test_snapshot_reused_until_seq_changes(db, catalog, store):
+    first = store.get(db)
+    assert store.get(db) is first
+    index = first.find(catalog["cuba"].id)
+    assert first.drink(index)["name"] == "Cuba Libre"
+
+    db.query(models.SyncState).update({models.SyncState.last_seq: models.SyncState.last_seq + 1})
+    db.commit()
+    assert store.get(db) is not first
+
+
+def test_snapshot_of_another_database_rejected(db, catalog, store, tmp_path):
+    first = store.get(db)
+    # ta sama ścieżka i ten sam seq, ale inna (np. odtworzona) baza
+    db.query(models.SyncState).update({models.SyncState.instance_id: "0" * 32})
+    db.commit()
+
+    rebuilt = CatalogSnapshotStore(str(tmp_path / "catalog.snap")).get(db)
+    assert rebuilt.seq == first.seq
+    assert rebuilt.database != first.database
+
+
+def test_new_database_gets_instance_id(db):
+    state = db.get(models.SyncState, 1)
+    assert state is not None and len(state.instance_id) == 32
+
+
+@pytest.fixture
+def default_machine_slots(db, catalog):
+    """Maszyna domyślna ma rum (slot 1) i colę (filler 7) — wystarczy na Cuba Libre."""
+    db.add_all([
+        models.MachineSlot(machine_id=1, slot_number=1, ingredient_type="alcohol", ingredient_id=catalog["rum"].id),
+        models.MachineFiller(machine_id=1, slot_number=7, mixer_id=catalog["cola"].id),
+    ])
+    db.commit()
+
+
+def _available_ids(snapshot) -> list[int]:
+    return [snapshot.drink(index)["id"] for index in snapshot.available_indexes()]
+
+
+def test_available_without_serial_port_uses_default_machine(db, catalog, default_machine_slots, store, monkeypatch):
+    monkeypatch.delenv("UART_PORT", raising=False)
+    assert _available_ids(store.get(db)) == [catalog["cuba"].id]
+
+
+def test_available_only_on_machines_with_port(db, catalog, default_machine_slots, store, monkeypatch):
+    monkeypatch.delenv("UART_PORT", raising=False)
+    # jedyna maszyna z portem nie ma składników — maszyna domyślna bez portu się nie liczy
+    db.add(models.Machine(name="bar", port="/dev/ttyUSB1"))
+    db.commit()
+    assert _available_ids(store.get(db)) == []
+
+    monkeypatch.setenv("UART_PORT", "/dev/ttyUSB0")
+    db.query(models.SyncState).update({models.SyncState.last_seq: models.SyncState.last_seq + 1})
+    db.commit()
+    assert _available_ids(store.get(db)) == [catalog["cuba"].id]
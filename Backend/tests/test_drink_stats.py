@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import models
+from app.services.drink_stats import compute_stats
+
+
+def _line(kind: str, ingredient_id: int, ml: int | None):
+    return SimpleNamespace(ingredient_type=kind, ingredient_id=ingredient_id, amount_ml=ml)
+
+
+def test_compute_stats():
+    stats = compute_stats([_line("alcohol", 1, 40), _line("mixer", 1, 60)], {1: 40.0})
+    assert stats == {"total_ml": 100, "alcohol_ml": 16.0, "abv": 16.0, "standard_drinks": 1.26}
+
+
+def test_compute_stats_empty_and_unknown_abv():
+    assert compute_stats([], {}) == {"total_ml": 0, "alcohol_ml": 0.0, "abv": 0.0, "standard_drinks": 0.0}
+    assert compute_stats([_line("alcohol", 2, 50), _line("mixer", 1, None)], {})["total_ml"] == 50
+
+
+def test_stats_follow_recipe_and_abv(db, catalog):
+    cuba = catalog["cuba"]
+    assert (cuba.total_ml, cuba.alcohol_ml, cuba.abv) == (200, 20.0, 10.0)
+
+    catalog["rum"].abv = 50
+    db.commit()
+    db.refresh(cuba)
+    assert cuba.alcohol_ml == pytest.approx(25.0)
+
+    cuba.ingredients.append(models.DrinkIngredient(
+        ingredient_type="mixer", ingredient_id=catalog["cola"].id, amount_ml=50, order_index=2,
+    ))
+    db.commit()
+    db.refresh(cuba)
+    assert (cuba.total_ml, cuba.abv) == (250, 10.0)
@@ -0,0 +1,19 @@
+from app.services.frame_cache import FrameCache
+
+
+def test_lru_eviction():
+    cache = FrameCache(max_size=2)
+    cache.put((1, 1, "a"), [1])
+    cache.put((2, 1, "a"), [2])
+    assert cache.get((1, 1, "a")) == [1]  # (1, ...) staje się najświeższy
+    cache.put((3, 1, "a"), [3])
+    assert cache.get((2, 1, "a")) is None
+    assert cache.get((1, 1, "a")) == [1]
+    assert cache.get((3, 1, "a")) == [3]
+
+
+def test_version_is_part_of_key():
+    cache = FrameCache(max_size=4)
+    cache.put((1, 1, "slots-a"), [1, 35, 0xFF, 0xFF])
+    assert cache.get((1, 2, "slots-a")) is None
+    assert cache.get((1, 1, "slots-b")) is None
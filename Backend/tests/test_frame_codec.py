@@ -0,0 +1,138 @@
+import time
+
+import pytest
+
+from app.services import uart
+from app.services.frame_codec import (
+    Ack,
+    FrameError,
+    V1_MAX_SEGMENTS,
+    crc16,
+    decode_frame,
+    encode_frame,
+    frame_crc,
+    frame_version,
+    parse_ack,
+    split_volume,
+)
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_round_trip(version):
+    segments = [(1, 35), (3, 70), (7, 120), (10, 15)]
+    frame = encode_frame(segments, version=version)
+    assert frame_version(frame) == version
+    assert decode_frame(frame) == segments
+    assert decode_frame(bytes(frame)) == segments
+
+
+def test_v2_keeps_large_volumes_in_one_segment():
+    frame = encode_frame([(7, 1000), (2, 490)], version=2)
+    assert decode_frame(frame) == [(7, 1000), (2, 490)]
+    assert frame_crc(frame) == crc16(frame[2:-2])
+
+
+def test_optic_volume_split_into_whole_cycles():
+    # 245 ml = 7 pełnych cykli po 35 ml; reszta w ostatnim kawałku
+    assert split_volume(1, 500, 255) == [245, 245, 10]
+    assert decode_frame(encode_frame([(1, 500)], version=1)) == [(1, 245), (1, 245), (1, 10)]
+
+
+def test_pump_volume_split_at_field_limit():
+    assert split_volume(7, 500, 255) == [255, 245]
+
+
+def test_v1_255_ml_byte_equal_to_separator():
+    frame = encode_frame([(7, 255), (8, 20)], version=1)
+    assert frame == [7, 255, 0xFF, 8, 20, 0xFF, 0xFF]
+    assert decode_frame(frame) == [(7, 255), (8, 20)]
+
+
+def test_crc16_ccitt_false_check_value():
+    assert crc16(b"123456789") == 0x29B1
+    assert crc16([]) == 0xFFFF
+
+
+def test_v2_corrupted_frame_rejected():
+    frame = encode_frame([(1, 35), (7, 100)], version=2)
+    frame[5] ^= 0x01
+    with pytest.raises(FrameError, match="CRC"):
+        decode_frame(frame)
+
+
+def test_v2_truncated_frame_rejected():
+    frame = encode_frame([(1, 35)], version=2)
+    with pytest.raises(FrameError):
+        decode_frame(frame[:-1])
+
+
+def test_v1_segment_limit():
+    ten = [(slot, 20) for slot in range(1, 11)]
+    assert len(decode_frame(encode_frame(ten, version=1))) == V1_MAX_SEGMENTS
+    with pytest.raises(FrameError, match="firmware accepts 10"):
+        encode_frame(ten + [(1, 20)], version=1)
+    # jeden składnik, ale po podziale 13 kawałków po 245 ml
+    with pytest.raises(FrameError):
+        encode_frame([(1, 3000)], version=1)
+
+
+def test_invalid_slot_rejected():
+    with pytest.raises(FrameError, match="Invalid slot"):
+        encode_frame([(11, 20)], version=1)
+
+
+def test_parse_ack():
+    assert parse_ack("received") == Ack("received")
+    assert parse_ack("Done\r\n") == Ack("done")
+    assert parse_ack("ACK 29b1") == Ack("received", 0x29B1)
+    assert parse_ack("DONE 29B1") == Ack("done", 0x29B1)
+    assert parse_ack("NAK 29b1 bad crc") == Ack("nak", 0x29B1, "bad crc")
+    assert parse_ack("ACK zz") is None
+    assert parse_ack("X: 120 mm") is None
+    assert parse_ack("") is None
+
+
+class FakeSerial:
+    def __init__(self, lines: list[str]) -> None:
+        self._lines = [f"{line}\n".encode() for line in lines]
+
+    def readline(self) -> bytes:
+        return self._lines.pop(0) if self._lines else b""
+
+
+def _wait(lines: list[str], expected_crc: int, timeout: float = 0.2) -> uart.UartTiming:
+    return uart._wait_for_confirmations(
+        FakeSerial(lines),
+        received_deadline=time.monotonic() + timeout,
+        done_timeout=timeout,
+        expected_crc=expected_crc,
+    )
+
+
+def test_ack_with_corrupted_crc_is_ignored():
+    crc = frame_crc(encode_frame([(1, 35)], version=2))
+    bad = crc ^ 0x0100
+    with pytest.raises(uart.UartError, match="'received'"):
+        _wait([f"ACK {bad:04x}", f"DONE {bad:04x}"], crc)
+
+
+def test_matching_acks_after_foreign_ones():
+    crc = frame_crc(encode_frame([(1, 35)], version=2))
+    bad = crc ^ 0x0001
+    timing = _wait([f"ACK {bad:04x}", f"ACK {crc:04x}", "debug", f"DONE {bad:04x}", f"DONE {crc:04x}"], crc)
+    assert 0 <= timing.received_after <= timing.done_after
+
+
+def test_nak_fails_immediately():
+    crc = frame_crc(encode_frame([(1, 35)], version=2))
+    with pytest.raises(uart.UartError, match="rejected") as exc:
+        _wait([f"NAK {crc:04x} length"], crc, timeout=5)
+    assert exc.value.timing is None
+
+
+def test_missing_done_keeps_received_timing():
+    crc = frame_crc(encode_frame([(1, 35)], version=2))
+    with pytest.raises(uart.UartError, match="'done'") as exc:
+        _wait([f"ACK {crc:04x}"], crc)
+    assert exc.value.timing is not None
+    assert exc.value.timing.done_after is None
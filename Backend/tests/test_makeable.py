@@ -0,0 +1,33 @@
+from app.services.makeable import MakeableIndex, ingredient_key
+
+
+def test_makeable_and_almost(db, catalog):
+    rum = ingredient_key("alcohol", catalog["rum"].id)
+    gin = ingredient_key("alcohol", catalog["gin"].id)
+    cola = ingredient_key("mixer", catalog["cola"].id)
+    mint = ingredient_key("mixer", catalog["mint"].id)
+
+    makeable, almost = MakeableIndex().query(db, {rum, cola})
+    assert makeable == [catalog["cuba"].id]
+    # drinki z jednym brakiem w kolejności ID; prywatne nie są brane pod uwagę
+    assert almost == [(catalog["mojito"].id, [mint]), (catalog["gin_cola"].id, [gin])]
+
+
+def test_max_missing(db, catalog):
+    cola = ingredient_key("mixer", catalog["cola"].id)
+    index = MakeableIndex()
+    makeable, almost = index.query(db, {cola}, max_missing=1)
+    assert makeable == []
+    assert sorted(drink_id for drink_id, _ in almost) == sorted([catalog["cuba"].id, catalog["gin_cola"].id])
+
+    _, almost = index.query(db, {cola}, max_missing=2)
+    assert (catalog["mojito"].id, sorted([
+        ingredient_key("alcohol", catalog["rum"].id),
+        ingredient_key("mixer", catalog["mint"].id),
+    ])) in almost
+
+
+def test_nothing_available(db, catalog):
+    makeable, almost = MakeableIndex().query(db, set(), max_missing=2)
+    assert makeable == []
+    assert {drink_id for drink_id, _ in almost} == {catalog["cuba"].id, catalog["gin_cola"].id}
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.routers import photos as photos_router
+from app.services import photos
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(photos, "DRINK_PHOTOS_DIR", str(tmp_path))
+    monkeypatch.setattr(photos, "PHOTO_CACHE_DIR", str(tmp_path / ".thumbs"))
+    Image.new("RGB", (1280, 720), (200, 40, 40)).save(tmp_path / "mojito.jpg", format="JPEG")
+    app = FastAPI()
+    app.include_router(photos_router.router)
+    return TestClient(app)
+
+
+def test_thumbnail_etag_is_stable(client):
+    first = client.get("/drinkPhotos/mojito.jpg?w=300")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/jpeg"
+    assert Image.open(photos.thumbnail_path(photos.photo_path("mojito.jpg"), 320)).width == 320
+
+    second = client.get("/drinkPhotos/mojito.jpg?w=300")
+    assert second.headers["etag"] == first.headers["etag"]
+
+    cached = client.get("/drinkPhotos/mojito.jpg?w=310", headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == first.headers["etag"]
+
+
+def test_etag_differs_per_width_and_changes_with_photo(client, tmp_path):
+    small = client.get("/drinkPhotos/mojito.jpg?w=160").headers["etag"]
+    original = client.get("/drinkPhotos/mojito.jpg").headers["etag"]
+    assert small != original
+
+    stat = os.stat(tmp_path / "mojito.jpg")
+    os.utime(tmp_path / "mojito.jpg", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    replaced = client.get("/drinkPhotos/mojito.jpg?w=160", headers={"If-None-Match": small})
+    assert replaced.status_code == 200
+    assert replaced.headers["etag"] != small
+
+
+def test_cache_evicts_least_recently_used(client, monkeypatch):
+    source = photos.photo_path("mojito.jpg")
+    paths = [photos.thumbnail_path(source, width) for width in (160, 320, 480)]
+    for path in paths:
+        os.utime(path, ns=(1_000_000_000, os.stat(path).st_mtime_ns))
+    # trafienia odświeżają atime; 320 pozostaje najdawniej używana
+    photos.thumbnail_path(source, 160)
+    photos.thumbnail_path(source, 480)
+
+    sizes = [os.path.getsize(path) for path in paths]
+    # limit, przy którym wystarczy usunąć jedną miniaturę
+    monkeypatch.setattr(photos, "PHOTO_CACHE_MAX_BYTES", int((sum(sizes) - sizes[1]) / 0.9) + 1)
+    photos._enforce_cache_limit()
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
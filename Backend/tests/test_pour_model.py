@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from app.services.pour_model import MAX_FACTOR, PourModel
+
+FRAME = [7, 100, 0xFF, 0xFF]  # 100 ml pompą ze slotu 7
+
+
+def test_estimate_grows_with_volume(tmp_path):
+    model = PourModel(str(tmp_path / "pour_model.json"))
+    assert model.estimate([7, 200, 0xFF, 0xFF]) > model.estimate(FRAME) > 0
+    assert model.estimate([1, 70, 0xFF, 0xFF]) > model.estimate([1, 35, 0xFF, 0xFF])
+
+
+def test_observe_moves_factor_and_persists(tmp_path):
+    path = tmp_path / "pour_model.json"
+    model = PourModel(str(path))
+    before = model.estimate(FRAME)
+    model.observe(FRAME, before * 3)
+    assert model.estimate(FRAME) > before
+
+    data = json.loads(path.read_text())
+    assert data["samples"] == 1
+    assert 1.0 < data["factors"]["7"] <= MAX_FACTOR
+    assert PourModel(str(path)).estimate(FRAME) == pytest.approx(model.estimate(FRAME))
+
+
+def test_workers_merge_observations(tmp_path):
+    path = str(tmp_path / "pour_model.json")
+    first, second = PourModel(path), PourModel(path)
+    first.observe(FRAME, 20.0)
+    second.observe(FRAME, 20.0)
+    # drugi worker liczył krok od współczynnika zapisanego przez pierwszego
+    assert second.status()["samples"] == 2
+    assert first.status()["samples"] == 2
+    assert first.estimate(FRAME) == pytest.approx(second.estimate(FRAME))
+    assert not list(tmp_path.glob(".pour_model-*"))
+
+
+def test_max_wait_covers_deadline(tmp_path):
+    model = PourModel(str(tmp_path / "pour_model.json"))
+    eta = model.estimate(FRAME)
+    assert model.max_wait(eta) > model.deadline(eta) > eta
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException
+
+from app.services import rate_limit
+from app.services.rate_limit import CONCURRENCY_LEASE, MemoryBackend, SqliteBackend, parse_budget
+
+
+def test_parse_budget():
+    assert parse_budget("6/60") == (6, 60.0)
+    assert parse_budget("5") == (5, 1.0)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    return SqliteBackend(str(tmp_path / "rate_limit.db"))
+
+
+def test_token_bucket(backend):
+    capacity, rate = 2, 1 / 60
+    assert backend.take("pour:1", capacity, rate, now=0.0) == 0.0
+    assert backend.take("pour:1", capacity, rate, now=0.0) == 0.0
+    assert backend.take("pour:1", capacity, rate, now=0.0) == pytest.approx(60.0)
+    assert backend.take("pour:2", capacity, rate, now=0.0) == 0.0
+    assert backend.take("pour:1", capacity, rate, now=30.0) == pytest.approx(30.0)
+    assert backend.take("pour:1", capacity, rate, now=60.0) == 0.0
+
+
+def test_concurrency_limit(backend):
+    assert backend.acquire("pour", 1, "a", now=0.0)
+    assert not backend.acquire("pour", 1, "b", now=1.0)
+    backend.release("pour", "a")
+    assert backend.acquire("pour", 1, "b", now=2.0)
+
+
+def test_concurrency_lease_expires(backend):
+    assert backend.acquire("pour", 1, "dead", now=0.0)
+    assert backend.acquire("pour", 1, "next", now=CONCURRENCY_LEASE + 1)
+
+
+def test_concurrency_slot_per_key(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "backend", MemoryBackend())
+    monkeypatch.delenv("CONCURRENCY_POUR", raising=False)
+    with rate_limit.concurrency_slot("pour", 1, retry_after=42, key="machine:1"):
+        with pytest.raises(HTTPException) as exc:
+            rate_limit.acquire_slot("pour", 1, retry_after=42, key="machine:1")
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "42"
+        # zajęta maszyna nie blokuje innych
+        with rate_limit.concurrency_slot("pour", 1, key="machine:2"):
+            pass
+    with rate_limit.concurrency_slot("pour", 1, key="machine:1"):
+        pass
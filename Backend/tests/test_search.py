@@ -0,0 +1,52 @@
+from app.services.search import DrinkSearchIndex, _within_distance, tokenize
+
+
+def test_tokenize_folds_case_and_diacritics():
+    assert tokenize("Żubrówka z Łodzi, 40%!") == ["zubrowka", "z", "lodzi", "40"]
+    assert tokenize(None) == []
+
+
+def test_within_distance():
+    assert _within_distance("mojito", "mojto", 1)
+    assert not _within_distance("mojito", "mohiot", 1)
+    assert not _within_distance("gin", "ginger", 2)
+
+
+def test_search_name_prefix_and_fuzzy(db, catalog):
+    index = DrinkSearchIndex()
+    assert index.search(db, "mojito") == [catalog["mojito"].id]
+    assert index.search(db, "MOJ") == [catalog["mojito"].id]
+    assert index.search(db, "mojtio") == []  # przestawione litery to 2 edycje
+    assert index.search(db, "mojto") == [catalog["mojito"].id]
+
+
+def test_search_ranks_name_above_ingredient(db, catalog):
+    index = DrinkSearchIndex()
+    # "gin" jest w nazwie drinka z ginem, "cola" w nazwie tylko jego
+    assert index.search(db, "cola")[0] == catalog["gin_cola"].id
+    ranked = index.search(db, "rum")
+    assert set(ranked) == {catalog["cuba"].id, catalog["mojito"].id}
+
+
+def test_search_requires_every_term(db, catalog):
+    index = DrinkSearchIndex()
+    assert index.search(db, "rum limonka") == [catalog["cuba"].id]
+    assert index.search(db, "gin limonka") == []
+    assert index.search(db, "   ") == []
+
+
+def test_private_drinks_are_not_indexed(db, catalog):
+    index = DrinkSearchIndex()
+    assert catalog["private"].id not in index.search(db, "mojito babci")
+
+
+def test_upsert_and_remove(db, catalog):
+    index = DrinkSearchIndex()
+    index.search(db, "rum")
+    drink = catalog["gin_cola"]
+    drink.name = "Negroni"
+    db.commit()
+    index.upsert(drink)
+    assert index.search(db, "negroni") == [drink.id]
+    index.remove(drink.id)
+    assert index.search(db, "negroni") == []
@@ -5,3 +5,13 @@ export interface WifiNetwork {
   bssid?: string | null;
   frequency?: number | null;
 }
+
+export interface WifiJob {
+  id: number;
+  ssid: string;
+  status: "pending" | "running" | "connected" | "failed";
+  error?: string | null;
+  created_at: string;
+  finished_at?: string | null;
+  expires_in_seconds?: number | null;
+}
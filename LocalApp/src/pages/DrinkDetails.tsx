@@ -10,6 +10,24 @@ interface IngredientLookup {
   mixers: Record<number, string>;
 }
 
+// /send czeka w kolejce do maszyny i do konca nalewania - gorna granice podaje serwer
+// (max_wait_seconds z modelu nalewania); zapas na narzut sieci i inna maszyne z trasy
+const POUR_TIMEOUT_SLACK_S = 15;
+// gdy estymacja jest niedostepna: kolejka 120 s + received 10 s + deadline dlugiego drinka
+const POUR_FALLBACK_TIMEOUT_MS = 300000;
+
+const pourTimeoutMs = async (drinkId: number): Promise<number> => {
+  try {
+    const { max_wait_seconds } = await api.get<{ max_wait_seconds: number }>(
+      `/frame/drink_frame/${drinkId}`,
+      { silentError: true }
+    );
+    return (max_wait_seconds + POUR_TIMEOUT_SLACK_S) * 1000;
+  } catch {
+    return POUR_FALLBACK_TIMEOUT_MS;
+  }
+};
+
 const DrinkDetails: React.FC = () => {
   const { state } = useLocation();
   const navigate = useNavigate();
@@ -74,7 +92,7 @@ const DrinkDetails: React.FC = () => {
     try {
       await api.post(`/frame/drink_frame/${drink.id}/send`, undefined, {
         silentError: true,
-        timeout: 70000,
+        timeout: await pourTimeoutMs(drink.id),
       });
 
       // Backend zwraca blad 500, gdy UART nie potwierdzi, wiec 2xx traktujemy jako sukces.
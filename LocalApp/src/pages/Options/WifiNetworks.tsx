@@ -3,7 +3,7 @@ import api from "@/lib/axios";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Skeleton } from "@/components/ui/skeleton";
-import type { WifiNetwork } from "@/interface/IWifiNetwork";
+import type { WifiJob, WifiNetwork } from "@/interface/IWifiNetwork";
 import { sanitizeVirtualKeyboardInput } from "@/lib/inputSanitizer";
 
 const WifiNetworks: React.FC = () => {
@@ -63,10 +63,18 @@ const WifiNetworks: React.FC = () => {
     setConnecting(true);
     setConnectMessage(null);
     try {
-      await api.post("/wifi/connect", {
+      let job = await api.post<WifiJob>("/wifi/connect", {
         ssid: selectedNetwork.ssid,
         password: normalizedPassword || undefined,
       });
+      // laczenie trwa w tle - odpytujemy stan zadania
+      while (job.status === "pending" || job.status === "running") {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = await api.get<WifiJob>(`/wifi/jobs/${job.id}`);
+      }
+      if (job.status !== "connected") {
+        throw new Error(job.error ?? "WiFi connection failed");
+      }
       setConnectMessage("Polaczono. Siec bedzie zapamietana przez 12h.");
     } catch (err) {
       console.error(err);
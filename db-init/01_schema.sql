@@ -18,7 +18,9 @@ CREATE TABLE IF NOT EXISTS alcohols (
   name VARCHAR(255) NOT NULL,
   abv DECIMAL(4,1),
   available BOOLEAN DEFAULT TRUE,
-  volume_ml INTEGER
+  volume_ml INTEGER,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
 );
 
 -- ========================
@@ -29,7 +31,28 @@ CREATE TABLE IF NOT EXISTS mixers (
   name VARCHAR(255) NOT NULL,
   type VARCHAR(10) CHECK (type IN ('soda','juice','syrup','other')) DEFAULT 'other',
   available BOOLEAN DEFAULT TRUE,
-  volume_ml INTEGER
+  volume_ml INTEGER,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ========================
+--  INGREDIENTS (wspolny rejestr alkoholi i mixerow)
+-- ========================
+-- Przepisy i sloty wskazuja skladnik kluczem obcym (ingredient_ref_id).
+-- name/abv/mixer_type utrzymuje backend przy zapisie alkoholu/mixera.
+CREATE TABLE IF NOT EXISTS ingredients (
+  id SERIAL PRIMARY KEY,
+  ingredient_type VARCHAR(10) CHECK (ingredient_type IN ('alcohol','mixer')) NOT NULL,
+  alcohol_id INTEGER UNIQUE REFERENCES alcohols(id) ON DELETE CASCADE,
+  mixer_id INTEGER UNIQUE REFERENCES mixers(id) ON DELETE CASCADE,
+  name VARCHAR(255) NOT NULL,
+  abv DOUBLE PRECISION,
+  mixer_type VARCHAR(10) CHECK (mixer_type IN ('soda','juice','syrup','other')),
+  CONSTRAINT ck_ingredients_source CHECK (
+    (ingredient_type = 'alcohol' AND alcohol_id IS NOT NULL AND mixer_id IS NULL)
+    OR (ingredient_type = 'mixer' AND mixer_id IS NOT NULL AND alcohol_id IS NULL)
+  )
 );
 
 -- ========================
@@ -41,7 +64,14 @@ CREATE TABLE IF NOT EXISTS drinks (
   description TEXT,
   author_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
   is_public BOOLEAN DEFAULT FALSE,
-  image_url TEXT
+  image_url TEXT,
+  version INTEGER NOT NULL DEFAULT 1,
+  total_ml INTEGER NOT NULL DEFAULT 0,
+  alcohol_ml DOUBLE PRECISION NOT NULL DEFAULT 0,
+  abv DOUBLE PRECISION NOT NULL DEFAULT 0,
+  standard_drinks DOUBLE PRECISION NOT NULL DEFAULT 0,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
 );
 
 -- ========================
@@ -52,10 +82,12 @@ CREATE TABLE IF NOT EXISTS drink_ingredients (
   drink_id INTEGER REFERENCES drinks(id) ON DELETE CASCADE,
   ingredient_type VARCHAR(10) CHECK (ingredient_type IN ('alcohol','mixer')) NOT NULL,
   ingredient_id INTEGER NOT NULL,
+  ingredient_ref_id INTEGER NOT NULL REFERENCES ingredients(id),
   amount_ml INTEGER NOT NULL,
   order_index INTEGER,
   note TEXT
 );
+CREATE INDEX IF NOT EXISTS ix_drink_ingredients_ingredient_ref_id ON drink_ingredients (ingredient_ref_id);
 
 -- ========================
 --  FAVORITE DRINKS
@@ -66,27 +98,150 @@ CREATE TABLE IF NOT EXISTS favorite_drinks (
   PRIMARY KEY (user_id, drink_id)
 );
 
+-- ========================
+--  MACHINES (jedna maszyna = jeden ESP32 na wlasnym porcie)
+-- ========================
+CREATE TABLE IF NOT EXISTS machines (
+  id SERIAL PRIMARY KEY,
+  name VARCHAR(255) UNIQUE NOT NULL,
+  port VARCHAR(255) UNIQUE,
+  baudrate INTEGER,
+  active BOOLEAN DEFAULT TRUE,
+  note TEXT,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+-- maszyna domyslna (id=1, port z UART_PORT)
+INSERT INTO machines (name, active) VALUES ('default', TRUE) ON CONFLICT (name) DO NOTHING;
+
 -- ========================
 --  MACHINE SLOTS (ALCOHOL/SYRUP)
 -- ========================
 CREATE TABLE IF NOT EXISTS machine_slots (
   id SERIAL PRIMARY KEY,
-  slot_number INTEGER UNIQUE NOT NULL,
+  machine_id INTEGER NOT NULL DEFAULT 1 REFERENCES machines(id) ON DELETE CASCADE,
+  slot_number INTEGER NOT NULL,
   ingredient_type VARCHAR(10) CHECK (ingredient_type IN ('alcohol','mixer')) NOT NULL,
   ingredient_id INTEGER NOT NULL,
+  -- NULL tylko dla nieaktywnego, pustego slotu
+  ingredient_ref_id INTEGER REFERENCES ingredients(id),
   volume_ml INTEGER,
   active BOOLEAN DEFAULT TRUE,
-  note TEXT
+  note TEXT,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT uq_machine_slots_machine_slot UNIQUE (machine_id, slot_number),
+  CONSTRAINT ck_machine_slots_active_ref CHECK (NOT active OR ingredient_ref_id IS NOT NULL)
 );
+CREATE INDEX IF NOT EXISTS ix_machine_slots_ingredient_ref_id ON machine_slots (ingredient_ref_id);
 
 -- ========================
 --  MACHINE FILLERS (MIXERS)
 -- ========================
 CREATE TABLE IF NOT EXISTS machine_fillers (
   id SERIAL PRIMARY KEY,
-  slot_number INTEGER UNIQUE NOT NULL,
+  machine_id INTEGER NOT NULL DEFAULT 1 REFERENCES machines(id) ON DELETE CASCADE,
+  slot_number INTEGER NOT NULL,
   mixer_id INTEGER REFERENCES mixers(id) ON DELETE CASCADE,
+  ingredient_ref_id INTEGER REFERENCES ingredients(id),
   volume_ml INTEGER,
   active BOOLEAN DEFAULT TRUE,
-  note TEXT
+  note TEXT,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT uq_machine_fillers_machine_slot UNIQUE (machine_id, slot_number)
+);
+CREATE INDEX IF NOT EXISTS ix_machine_fillers_ingredient_ref_id ON machine_fillers (ingredient_ref_id);
+
+-- ========================
+--  POUR HISTORY
+-- ========================
+CREATE TABLE IF NOT EXISTS pour_events (
+  id SERIAL PRIMARY KEY,
+  drink_id INTEGER REFERENCES drinks(id) ON DELETE SET NULL,
+  user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+  machine_id INTEGER REFERENCES machines(id) ON DELETE SET NULL,
+  frame TEXT,
+  started_at TIMESTAMPTZ NOT NULL,
+  received_at TIMESTAMPTZ,
+  done_at TIMESTAMPTZ,
+  outcome VARCHAR(10) CHECK (outcome IN ('done','failed','busy')) NOT NULL,
+  error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_pour_events_started_at ON pour_events (started_at);
+
+-- agregaty godzinowe/dzienne aktualizowane przy kazdym nalaniu
+CREATE TABLE IF NOT EXISTS pour_rollups (
+  id SERIAL PRIMARY KEY,
+  period VARCHAR(10) CHECK (period IN ('hour','day')) NOT NULL,
+  bucket_start TIMESTAMPTZ NOT NULL,
+  drink_id INTEGER NOT NULL,
+  pours INTEGER NOT NULL DEFAULT 0,
+  failures INTEGER NOT NULL DEFAULT 0,
+  busy INTEGER NOT NULL DEFAULT 0,
+  total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+  CONSTRAINT uq_pour_rollups_bucket UNIQUE (period, bucket_start, drink_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_drink_stats (
+  user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+  drink_id INTEGER REFERENCES drinks(id) ON DELETE CASCADE,
+  pour_count INTEGER NOT NULL DEFAULT 0,
+  last_poured_at TIMESTAMPTZ NOT NULL,
+  PRIMARY KEY (user_id, drink_id)
+);
+CREATE INDEX IF NOT EXISTS ix_user_drink_stats_recent ON user_drink_stats (user_id, last_poured_at);
+
+-- ========================
+--  SYNC (licznik zmian + tombstones dla GET /sync)
+-- ========================
+CREATE TABLE IF NOT EXISTS sync_state (
+  id INTEGER PRIMARY KEY,
+  last_seq BIGINT NOT NULL DEFAULT 0,
+  -- losowy identyfikator bazy (tozsamosc snapshotu katalogu)
+  instance_id VARCHAR(32)
+);
+INSERT INTO sync_state (id, last_seq, instance_id)
+VALUES (1, 0, md5(random()::TEXT || clock_timestamp()::TEXT)) ON CONFLICT (id) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+  id SERIAL PRIMARY KEY,
+  entity VARCHAR(32) NOT NULL,
+  entity_id INTEGER NOT NULL,
+  change_seq BIGINT NOT NULL,
+  deleted_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_sync_tombstones_change_seq ON sync_tombstones (change_seq);
+CREATE INDEX IF NOT EXISTS ix_alcohols_change_seq ON alcohols (change_seq);
+CREATE INDEX IF NOT EXISTS ix_mixers_change_seq ON mixers (change_seq);
+CREATE INDEX IF NOT EXISTS ix_drinks_change_seq ON drinks (change_seq);
+CREATE INDEX IF NOT EXISTS ix_drinks_total_ml ON drinks (total_ml);
+CREATE INDEX IF NOT EXISTS ix_drinks_alcohol_ml ON drinks (alcohol_ml);
+CREATE INDEX IF NOT EXISTS ix_drinks_abv ON drinks (abv);
+CREATE INDEX IF NOT EXISTS ix_machine_slots_change_seq ON machine_slots (change_seq);
+CREATE INDEX IF NOT EXISTS ix_machine_fillers_change_seq ON machine_fillers (change_seq);
+CREATE INDEX IF NOT EXISTS ix_machines_change_seq ON machines (change_seq);
+CREATE INDEX IF NOT EXISTS ix_machine_slots_machine_id ON machine_slots (machine_id);
+CREATE INDEX IF NOT EXISTS ix_machine_fillers_machine_id ON machine_fillers (machine_id);
+
+-- ========================
+--  WIFI (zadania laczenia w tle + termin rozlaczenia)
+-- ========================
+CREATE TABLE IF NOT EXISTS wifi_jobs (
+  id SERIAL PRIMARY KEY,
+  ssid VARCHAR NOT NULL,
+  user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+  status VARCHAR(10) CHECK (status IN ('pending','running','connected','failed')) NOT NULL,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS ix_wifi_jobs_status ON wifi_jobs (status);
+
+-- jeden wiersz: termin automatycznego rozlaczenia WiFi (wspolny dla workerow)
+CREATE TABLE IF NOT EXISTS wifi_schedule (
+  id INTEGER PRIMARY KEY,
+  ssid VARCHAR,
+  disconnect_at TIMESTAMPTZ
 );
+INSERT INTO wifi_schedule (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
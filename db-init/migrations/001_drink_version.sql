@@ -0,0 +1,3 @@
+-- Wersja przepisu drinka (klucz cache ramek UART).
+-- Dla baz zalozonych przed dodaniem kolumny do 01_schema.sql.
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,37 @@
+-- Historia nalan i agregaty popularnosci.
+-- ========================
+--  POUR HISTORY
+-- ========================
+CREATE TABLE IF NOT EXISTS pour_events (
+  id SERIAL PRIMARY KEY,
+  drink_id INTEGER REFERENCES drinks(id) ON DELETE SET NULL,
+  user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+  frame TEXT,
+  started_at TIMESTAMPTZ NOT NULL,
+  received_at TIMESTAMPTZ,
+  done_at TIMESTAMPTZ,
+  outcome VARCHAR(10) CHECK (outcome IN ('done','failed','busy')) NOT NULL,
+  error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_pour_events_started_at ON pour_events (started_at);
+
+-- agregaty godzinowe/dzienne aktualizowane przy kazdym nalaniu
+CREATE TABLE IF NOT EXISTS pour_rollups (
+  id SERIAL PRIMARY KEY,
+  period VARCHAR(10) CHECK (period IN ('hour','day')) NOT NULL,
+  bucket_start TIMESTAMPTZ NOT NULL,
+  drink_id INTEGER NOT NULL,
+  pours INTEGER NOT NULL DEFAULT 0,
+  failures INTEGER NOT NULL DEFAULT 0,
+  total_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+  CONSTRAINT uq_pour_rollups_bucket UNIQUE (period, bucket_start, drink_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_drink_stats (
+  user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+  drink_id INTEGER REFERENCES drinks(id) ON DELETE CASCADE,
+  pour_count INTEGER NOT NULL DEFAULT 0,
+  last_poured_at TIMESTAMPTZ NOT NULL,
+  PRIMARY KEY (user_id, drink_id)
+);
+CREATE INDEX IF NOT EXISTS ix_user_drink_stats_recent ON user_drink_stats (user_id, last_poured_at);
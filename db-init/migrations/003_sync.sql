@@ -0,0 +1,30 @@
+-- Sledzenie zmian dla GET /sync: licznik, znaczniki czasu i tombstones.
+ALTER TABLE alcohols ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE alcohols ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE mixers ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE mixers ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE machine_slots ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE machine_slots ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE machine_fillers ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE machine_fillers ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP;
+CREATE TABLE IF NOT EXISTS sync_state (
+  id INTEGER PRIMARY KEY,
+  last_seq BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO sync_state (id, last_seq) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+  id SERIAL PRIMARY KEY,
+  entity VARCHAR(32) NOT NULL,
+  entity_id INTEGER NOT NULL,
+  change_seq BIGINT NOT NULL,
+  deleted_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_sync_tombstones_change_seq ON sync_tombstones (change_seq);
+CREATE INDEX IF NOT EXISTS ix_alcohols_change_seq ON alcohols (change_seq);
+CREATE INDEX IF NOT EXISTS ix_mixers_change_seq ON mixers (change_seq);
+CREATE INDEX IF NOT EXISTS ix_drinks_change_seq ON drinks (change_seq);
+CREATE INDEX IF NOT EXISTS ix_machine_slots_change_seq ON machine_slots (change_seq);
+CREATE INDEX IF NOT EXISTS ix_machine_fillers_change_seq ON machine_fillers (change_seq);
@@ -0,0 +1,29 @@
+-- Rejestr maszyn: kazda maszyna ma wlasny port i zestaw slotow.
+-- Istniejace sloty trafiaja do maszyny domyslnej (id=1, port z UART_PORT).
+CREATE TABLE IF NOT EXISTS machines (
+  id SERIAL PRIMARY KEY,
+  name VARCHAR(255) UNIQUE NOT NULL,
+  port VARCHAR(255) UNIQUE,
+  baudrate INTEGER,
+  active BOOLEAN DEFAULT TRUE,
+  note TEXT,
+  change_seq BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO machines (id, name, active) VALUES (1, 'default', TRUE) ON CONFLICT DO NOTHING;
+SELECT setval(pg_get_serial_sequence('machines', 'id'), GREATEST((SELECT MAX(id) FROM machines), 1));
+CREATE INDEX IF NOT EXISTS ix_machines_change_seq ON machines (change_seq);
+
+ALTER TABLE machine_slots ADD COLUMN IF NOT EXISTS machine_id INTEGER NOT NULL DEFAULT 1 REFERENCES machines(id) ON DELETE CASCADE;
+ALTER TABLE machine_slots DROP CONSTRAINT IF EXISTS machine_slots_slot_number_key;
+ALTER TABLE machine_slots DROP CONSTRAINT IF EXISTS uq_machine_slots_machine_slot;
+ALTER TABLE machine_slots ADD CONSTRAINT uq_machine_slots_machine_slot UNIQUE (machine_id, slot_number);
+CREATE INDEX IF NOT EXISTS ix_machine_slots_machine_id ON machine_slots (machine_id);
+
+ALTER TABLE machine_fillers ADD COLUMN IF NOT EXISTS machine_id INTEGER NOT NULL DEFAULT 1 REFERENCES machines(id) ON DELETE CASCADE;
+ALTER TABLE machine_fillers DROP CONSTRAINT IF EXISTS machine_fillers_slot_number_key;
+ALTER TABLE machine_fillers DROP CONSTRAINT IF EXISTS uq_machine_fillers_machine_slot;
+ALTER TABLE machine_fillers ADD CONSTRAINT uq_machine_fillers_machine_slot UNIQUE (machine_id, slot_number);
+CREATE INDEX IF NOT EXISTS ix_machine_fillers_machine_id ON machine_fillers (machine_id);
+
+ALTER TABLE pour_events ADD COLUMN IF NOT EXISTS machine_id INTEGER REFERENCES machines(id) ON DELETE SET NULL;
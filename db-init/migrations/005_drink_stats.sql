@@ -0,0 +1,20 @@
+-- Denormalizowane statystyki drinkow (objetosc, etanol, ABV, porcje standardowe 10 g)
+-- dla filtrowania i sortowania GET /drinks/. Dalej utrzymywane przez backend przy zapisie.
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS total_ml INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS alcohol_ml DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS abv DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE drinks ADD COLUMN IF NOT EXISTS standard_drinks DOUBLE PRECISION NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS ix_drinks_total_ml ON drinks (total_ml);
+CREATE INDEX IF NOT EXISTS ix_drinks_alcohol_ml ON drinks (alcohol_ml);
+CREATE INDEX IF NOT EXISTS ix_drinks_abv ON drinks (abv);
+
+UPDATE drinks SET
+  total_ml = COALESCE((SELECT SUM(di.amount_ml) FROM drink_ingredients di WHERE di.drink_id = drinks.id), 0),
+  alcohol_ml = COALESCE((
+    SELECT ROUND(CAST(SUM(di.amount_ml * a.abv / 100.0) AS NUMERIC), 1)
+    FROM drink_ingredients di JOIN alcohols a ON a.id = di.ingredient_id
+    WHERE di.drink_id = drinks.id AND di.ingredient_type = 'alcohol'
+  ), 0);
+UPDATE drinks SET
+  abv = CASE WHEN total_ml > 0 THEN ROUND(CAST(alcohol_ml * 100.0 / total_ml AS NUMERIC), 1) ELSE 0 END,
+  standard_drinks = ROUND(CAST(alcohol_ml * 0.789 / 10 AS NUMERIC), 2);
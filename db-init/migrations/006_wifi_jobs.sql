@@ -0,0 +1,19 @@
+-- Zadania laczenia z WiFi w tle i trwaly termin rozlaczenia (zamiast threading.Timer w procesie).
+CREATE TABLE IF NOT EXISTS wifi_jobs (
+  id SERIAL PRIMARY KEY,
+  ssid VARCHAR NOT NULL,
+  user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+  status VARCHAR(10) CHECK (status IN ('pending','running','connected','failed')) NOT NULL,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS ix_wifi_jobs_status ON wifi_jobs (status);
+
+-- jeden wiersz: termin automatycznego rozlaczenia WiFi (wspolny dla workerow)
+CREATE TABLE IF NOT EXISTS wifi_schedule (
+  id INTEGER PRIMARY KEY,
+  ssid VARCHAR,
+  disconnect_at TIMESTAMPTZ
+);
+INSERT INTO wifi_schedule (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,132 @@
+-- Wspolny rejestr skladnikow: przepisy i sloty dostaja prawdziwy klucz obcy
+-- (ingredient_ref_id) zamiast pary (ingredient_type, ingredient_id) bez FK.
+-- Para zostaje w tabelach i w API; nazwe/ABV/typ czyta sie jednym joinem.
+CREATE TABLE IF NOT EXISTS ingredients (
+  id SERIAL PRIMARY KEY,
+  ingredient_type VARCHAR(10) CHECK (ingredient_type IN ('alcohol','mixer')) NOT NULL,
+  alcohol_id INTEGER UNIQUE REFERENCES alcohols(id) ON DELETE CASCADE,
+  mixer_id INTEGER UNIQUE REFERENCES mixers(id) ON DELETE CASCADE,
+  name VARCHAR(255) NOT NULL,
+  abv DOUBLE PRECISION,
+  mixer_type VARCHAR(10) CHECK (mixer_type IN ('soda','juice','syrup','other')),
+  CONSTRAINT ck_ingredients_source CHECK (
+    (ingredient_type = 'alcohol' AND alcohol_id IS NOT NULL AND mixer_id IS NULL)
+    OR (ingredient_type = 'mixer' AND mixer_id IS NOT NULL AND alcohol_id IS NULL)
+  )
+);
+
+INSERT INTO ingredients (ingredient_type, alcohol_id, name, abv)
+SELECT 'alcohol', a.id, a.name, a.abv FROM alcohols a
+ON CONFLICT (alcohol_id) DO NOTHING;
+INSERT INTO ingredients (ingredient_type, mixer_id, name, mixer_type)
+SELECT 'mixer', m.id, m.name, m.type FROM mixers m
+ON CONFLICT (mixer_id) DO NOTHING;
+
+ALTER TABLE drink_ingredients ADD COLUMN IF NOT EXISTS ingredient_ref_id INTEGER;
+ALTER TABLE machine_slots ADD COLUMN IF NOT EXISTS ingredient_ref_id INTEGER;
+ALTER TABLE machine_fillers ADD COLUMN IF NOT EXISTS ingredient_ref_id INTEGER;
+
+UPDATE drink_ingredients di SET ingredient_ref_id = i.id
+FROM ingredients i
+WHERE i.ingredient_type = di.ingredient_type
+  AND di.ingredient_id = COALESCE(i.alcohol_id, i.mixer_id);
+UPDATE machine_slots s SET ingredient_ref_id = i.id
+FROM ingredients i
+WHERE i.ingredient_type = s.ingredient_type
+  AND s.ingredient_id = COALESCE(i.alcohol_id, i.mixer_id);
+UPDATE machine_fillers f SET ingredient_ref_id = i.id
+FROM ingredients i
+WHERE i.mixer_id = f.mixer_id;
+
+-- Wiersze wskazujace nieistniejacy skladnik: z przepisu znikaja (i tak byly
+-- pomijane przy nalewaniu), slot z takim skladnikiem zostaje wylaczony.
+-- Dotkniete drinki i sloty sa wypisywane (NOTICE) i dostaja nowy change_seq,
+-- zeby /sync i snapshot katalogu nie podawaly dalej starych przepisow.
+CREATE TEMP TABLE migration_007_drinks AS
+SELECT DISTINCT drink_id FROM drink_ingredients WHERE ingredient_ref_id IS NULL;
+CREATE TEMP TABLE migration_007_slots AS
+SELECT id FROM machine_slots WHERE ingredient_ref_id IS NULL AND active;
+
+DO $$
+DECLARE
+  drink_ids TEXT;
+  slot_ids TEXT;
+BEGIN
+  SELECT string_agg(drink_id::TEXT, ', ' ORDER BY drink_id) INTO drink_ids FROM migration_007_drinks;
+  SELECT string_agg(id::TEXT, ', ' ORDER BY id) INTO slot_ids FROM migration_007_slots;
+  IF drink_ids IS NOT NULL THEN
+    RAISE NOTICE '007_ingredients: usuniete wiersze przepisu bez skladnika w drinkach (id): %', drink_ids;
+  END IF;
+  IF slot_ids IS NOT NULL THEN
+    RAISE NOTICE '007_ingredients: wylaczone sloty bez skladnika (machine_slots.id): %', slot_ids;
+  END IF;
+END $$;
+
+-- jeden nowy numer zmiany dla wszystkiego, co zmienia ta migracja
+UPDATE sync_state SET last_seq = last_seq + 1 WHERE id = 1;
+
+DELETE FROM drink_ingredients WHERE ingredient_ref_id IS NULL;
+UPDATE machine_slots SET
+  active = FALSE,
+  change_seq = (SELECT last_seq FROM sync_state WHERE id = 1),
+  updated_at = CURRENT_TIMESTAMP
+WHERE id IN (SELECT id FROM migration_007_slots);
+
+ALTER TABLE drink_ingredients ALTER COLUMN ingredient_ref_id SET NOT NULL;
+ALTER TABLE drink_ingredients DROP CONSTRAINT IF EXISTS fk_drink_ingredients_ingredient;
+ALTER TABLE drink_ingredients ADD CONSTRAINT fk_drink_ingredients_ingredient
+  FOREIGN KEY (ingredient_ref_id) REFERENCES ingredients(id);
+ALTER TABLE machine_slots DROP CONSTRAINT IF EXISTS fk_machine_slots_ingredient;
+ALTER TABLE machine_slots ADD CONSTRAINT fk_machine_slots_ingredient
+  FOREIGN KEY (ingredient_ref_id) REFERENCES ingredients(id);
+ALTER TABLE machine_slots DROP CONSTRAINT IF EXISTS ck_machine_slots_active_ref;
+ALTER TABLE machine_slots ADD CONSTRAINT ck_machine_slots_active_ref
+  CHECK (NOT active OR ingredient_ref_id IS NOT NULL);
+ALTER TABLE machine_fillers DROP CONSTRAINT IF EXISTS fk_machine_fillers_ingredient;
+ALTER TABLE machine_fillers ADD CONSTRAINT fk_machine_fillers_ingredient
+  FOREIGN KEY (ingredient_ref_id) REFERENCES ingredients(id);
+
+CREATE INDEX IF NOT EXISTS ix_drink_ingredients_ingredient_ref_id ON drink_ingredients (ingredient_ref_id);
+CREATE INDEX IF NOT EXISTS ix_machine_slots_ingredient_ref_id ON machine_slots (ingredient_ref_id);
+CREATE INDEX IF NOT EXISTS ix_machine_fillers_ingredient_ref_id ON machine_fillers (ingredient_ref_id);
+
+-- Statystyki przeliczone z przepisow po czyszczeniu. Drinki z usunietymi
+-- wierszami albo ze zmienionymi statystykami dostaja nowa wersje i change_seq.
+CREATE TEMP TABLE migration_007_stats AS
+WITH sums AS (
+  SELECT d.id,
+    COALESCE(SUM(di.amount_ml), 0) AS total_ml,
+    COALESCE(ROUND(CAST(SUM(
+      CASE WHEN di.ingredient_type = 'alcohol' THEN di.amount_ml * i.abv / 100.0 END
+    ) AS NUMERIC), 1), 0) AS alcohol_ml
+  FROM drinks d
+  LEFT JOIN drink_ingredients di ON di.drink_id = d.id
+  LEFT JOIN ingredients i ON i.id = di.ingredient_ref_id
+  GROUP BY d.id
+)
+SELECT id,
+  total_ml,
+  CAST(alcohol_ml AS DOUBLE PRECISION) AS alcohol_ml,
+  CAST(CASE WHEN total_ml > 0 THEN ROUND(alcohol_ml * 100.0 / total_ml, 1) ELSE 0 END AS DOUBLE PRECISION) AS abv,
+  CAST(ROUND(alcohol_ml * 0.789 / 10, 2) AS DOUBLE PRECISION) AS standard_drinks
+FROM sums;
+
+UPDATE drinks d SET
+  total_ml = s.total_ml,
+  alcohol_ml = s.alcohol_ml,
+  abv = s.abv,
+  standard_drinks = s.standard_drinks,
+  version = d.version + 1,
+  change_seq = (SELECT last_seq FROM sync_state WHERE id = 1),
+  updated_at = CURRENT_TIMESTAMP
+FROM migration_007_stats s
+WHERE s.id = d.id
+  AND (
+    d.id IN (SELECT drink_id FROM migration_007_drinks)
+    OR (d.total_ml, d.alcohol_ml, d.abv, d.standard_drinks)
+       IS DISTINCT FROM (s.total_ml, s.alcohol_ml, s.abv, s.standard_drinks)
+  );
+
+DROP TABLE migration_007_stats;
+DROP TABLE migration_007_slots;
+DROP TABLE migration_007_drinks;
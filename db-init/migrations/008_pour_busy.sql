@@ -0,0 +1,26 @@
+-- Proby odrzucone, bo maszyna byla zajeta (outcome = 'busy'), dostaja wlasny
+-- licznik w pour_rollups zamiast zawyzac `failures`.
+ALTER TABLE pour_rollups ADD COLUMN IF NOT EXISTS busy INTEGER NOT NULL DEFAULT 0;
+
+-- Dotychczasowe proby 'busy' byly liczone jako awarie: przeniesienie ich
+-- z `failures` do `busy` na podstawie pour_events (kubelki w UTC, jak w aplikacji).
+CREATE TEMP TABLE migration_008_busy AS
+SELECT u.period,
+  date_trunc(u.period, e.started_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket_start,
+  e.drink_id,
+  COUNT(*) AS busy
+FROM pour_events e
+CROSS JOIN (VALUES ('hour'), ('day')) AS u(period)
+WHERE e.outcome = 'busy' AND e.drink_id IS NOT NULL
+GROUP BY 1, 2, 3;
+
+UPDATE pour_rollups r SET
+  busy = b.busy,
+  failures = GREATEST(r.failures - b.busy, 0)
+FROM migration_008_busy b
+WHERE r.period = b.period
+  AND r.bucket_start = b.bucket_start
+  AND r.drink_id = b.drink_id
+  AND r.busy = 0;
+
+DROP TABLE migration_008_busy;
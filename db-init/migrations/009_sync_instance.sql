@@ -0,0 +1,5 @@
+-- Losowy identyfikator bazy w sync_state: snapshot katalogu zapisany dla innej
+-- (albo odtworzonej od zera) bazy z tym samym licznikiem zmian jest odrzucany.
+ALTER TABLE sync_state ADD COLUMN IF NOT EXISTS instance_id VARCHAR(32);
+UPDATE sync_state SET instance_id = md5(random()::TEXT || clock_timestamp()::TEXT)
+WHERE instance_id IS NULL;
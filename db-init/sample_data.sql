@@ -25,6 +25,14 @@ VALUES
 ('Syrop malinowy', 'syrup', true, 1000),
 ('Woda gazowana', 'other', true, 3000);
 
+-- -------------------------------
+-- INGREDIENTS (rejestr dla kluczy obcych przepisow i slotow)
+-- -------------------------------
+INSERT INTO ingredients (ingredient_type, alcohol_id, name, abv)
+SELECT 'alcohol', id, name, abv FROM alcohols;
+INSERT INTO ingredients (ingredient_type, mixer_id, name, mixer_type)
+SELECT 'mixer', id, name, type FROM mixers;
+
 -- -------------------------------
 -- DRINKS
 -- -------------------------------
@@ -36,12 +44,19 @@ VALUES
 -- -------------------------------
 -- DRINK INGREDIENTS
 -- -------------------------------
-INSERT INTO drink_ingredients (drink_id, ingredient_type, ingredient_id, amount_ml, order_index, note)
-VALUES
-(1, 'alcohol', 1, 50, 1, 'Rum'),
-(1, 'mixer', 1, 100, 2, 'Cola'),
-(2, 'alcohol', 2, 50, 1, 'Whisky'),
-(2, 'mixer', 2, 30, 2, 'Sok jabłkowy');
+-- CTE z VALUES dziala w PostgreSQL i SQLite (init_db --sample-data)
+WITH v (drink_id, ingredient_type, ingredient_id, amount_ml, order_index, note) AS (
+  VALUES
+  (1, 'alcohol', 1, 50, 1, 'Rum'),
+  (1, 'mixer', 1, 100, 2, 'Cola'),
+  (2, 'alcohol', 2, 50, 1, 'Whisky'),
+  (2, 'mixer', 2, 30, 2, 'Sok jabłkowy')
+)
+INSERT INTO drink_ingredients (drink_id, ingredient_type, ingredient_id, ingredient_ref_id, amount_ml, order_index, note)
+SELECT v.drink_id, v.ingredient_type, v.ingredient_id, i.id, v.amount_ml, v.order_index, v.note
+FROM v
+JOIN ingredients i ON i.ingredient_type = v.ingredient_type
+  AND v.ingredient_id = COALESCE(i.alcohol_id, i.mixer_id);
 
 -- -------------------------------
 -- FAVORITE DRINKS
@@ -53,25 +68,54 @@ VALUES
 -- -------------------------------
 -- MACHINE SLOTS (ALCOHOLS/SYROP)
 -- -------------------------------
-INSERT INTO machine_slots (slot_number, ingredient_type, ingredient_id, volume_ml, active, note)
-VALUES
+-- puste sloty (ingredient_id 0) nie maja skladnika, wiec LEFT JOIN zostawia NULL;
+-- WHERE TRUE: bez niego SQLite myli ON CONFLICT z warunkiem JOIN-a
+WITH v (slot_number, ingredient_type, ingredient_id, volume_ml, active, note) AS (
+  VALUES
   (1, 'alcohol', 1, 1000, true, 'Rum slot'),
   (2, 'alcohol', 2, 500, true, 'Whisky slot'),
   (3, 'mixer', 3, 1000, true, 'Syrop malinowy slot'),
   (4, 'mixer', 0, 0, false, 'Empty slot'),
   (5, 'mixer', 0, 0, false, 'Empty slot'),
   (6, 'mixer', 0, 0, false, 'Empty slot')
-ON CONFLICT (slot_number) DO NOTHING;
+)
+INSERT INTO machine_slots (slot_number, ingredient_type, ingredient_id, ingredient_ref_id, volume_ml, active, note)
+SELECT v.slot_number, v.ingredient_type, v.ingredient_id, i.id, v.volume_ml, v.active, v.note
+FROM v
+LEFT JOIN ingredients i ON i.ingredient_type = v.ingredient_type
+  AND v.ingredient_id = COALESCE(i.alcohol_id, i.mixer_id)
+WHERE TRUE
+ON CONFLICT (machine_id, slot_number) DO NOTHING;
 
 
 -- -------------------------------
 -- MACHINE FILLERS (NAPOJE)
 -- -------------------------------
-INSERT INTO machine_fillers (slot_number, mixer_id, volume_ml, active, note)
-VALUES
-(7, 1, 2000, true, 'Cola slot'),
-(8, 2, 1500, true, 'Sok jabłkowy slot'),
-(9, 3, 1000, true, 'Syrop malinowy slot'),
-(10, 4, 3000, true, 'Woda gazowana slot')
-ON CONFLICT (slot_number) DO NOTHING;
+WITH v (slot_number, mixer_id, volume_ml, active, note) AS (
+  VALUES
+  (7, 1, 2000, true, 'Cola slot'),
+  (8, 2, 1500, true, 'Sok jabłkowy slot'),
+  (9, 3, 1000, true, 'Syrop malinowy slot'),
+  (10, 4, 3000, true, 'Woda gazowana slot')
+)
+INSERT INTO machine_fillers (slot_number, mixer_id, ingredient_ref_id, volume_ml, active, note)
+SELECT v.slot_number, v.mixer_id, i.id, v.volume_ml, v.active, v.note
+FROM v
+JOIN ingredients i ON i.mixer_id = v.mixer_id
+WHERE TRUE
+ON CONFLICT (machine_id, slot_number) DO NOTHING;
 
+
+-- -------------------------------
+-- STATYSTYKI DRINKOW (przy zapisie przez API liczy je backend)
+-- -------------------------------
+UPDATE drinks SET
+  total_ml = COALESCE((SELECT SUM(di.amount_ml) FROM drink_ingredients di WHERE di.drink_id = drinks.id), 0),
+  alcohol_ml = COALESCE((
+    SELECT ROUND(CAST(SUM(di.amount_ml * a.abv / 100.0) AS NUMERIC), 1)
+    FROM drink_ingredients di JOIN ingredients a ON a.id = di.ingredient_ref_id
+    WHERE di.drink_id = drinks.id AND di.ingredient_type = 'alcohol'
+  ), 0);
+UPDATE drinks SET
+  abv = CASE WHEN total_ml > 0 THEN ROUND(CAST(alcohol_ml * 100.0 / total_ml AS NUMERIC), 1) ELSE 0 END,
+  standard_drinks = ROUND(CAST(alcohol_ml * 0.789 / 10 AS NUMERIC), 2);